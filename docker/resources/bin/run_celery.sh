@@ -5,4 +5,4 @@ sleep 10
 
 # run Celery worker for our project myproject with Celery configuration stored in Celeryconf
 echo "Starting worker..."
-celery worker --app=config.celery:app --loglevel=INFO -S django -B
\ No newline at end of file
+celery worker --app=config.celery:app --loglevel=INFO -S django -B -Q default
\ No newline at end of file
@@ -0,0 +1,8 @@
+#!/usr/bin/env bash
+
+# wait for RabbitMQ server to start
+sleep 10
+
+# run Celery worker consuming the market events queue only, so that events are not delayed by crawls
+echo "Starting events worker..."
+celery worker --app=config.celery:app --loglevel=INFO -S django -Q events -n events@%h
@@ -7,5 +7,9 @@ sleep 10
 su -m myuser -c "python manage.py makemigrations"
 # migrate db, so we have the latest db schema
 su -m myuser -c "python manage.py migrate"
+# create the search extension, indexes and trigger, which migrations do not manage
+su -m myuser -c "python manage.py create_search_indexes"
+# backfill aggregates which are only refreshed incrementally afterwards
+su -m myuser -c "python manage.py compute_card_usages --if-empty"
 # start development server on public ip interface, on port 8000
 su -m myuser -c "python manage.py runserver 0.0.0.0:8000"
\ No newline at end of file
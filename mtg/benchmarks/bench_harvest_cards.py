@@ -0,0 +1,67 @@
+"""
+Benchmarks the parsing of a 100 cards page of the MTG API: loading the whole page and converting keys with regular
+expressions, against streaming it and converting keys with the memoized table.
+
+Run from the mtg directory: python -m benchmarks.bench_harvest_cards
+"""
+
+
+from io import BytesIO
+import json
+import os
+import re
+import timeit
+import tracemalloc
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.local')
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+django.setup()
+
+from cards.tasks import iter_cards, ijson  # noqa: E402
+from cards.tests.mtg_api_fixtures import cards_page  # noqa: E402
+
+
+def to_snake_case(name: str) -> str:
+    s1 = re.sub(r'(.)([A-Z][a-z]+)', r'\1_\2', name)
+    return re.sub(r'([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
+
+
+def load_page(page: bytes) -> list:
+    """Previous implementation: loads the whole page, then converts keys of every card.
+    """
+
+    cards = []
+    for card in json.loads(page.decode())['cards']:
+        formated_card = {}
+        for key, value in card.items():
+            formated_card[to_snake_case(key)] = value
+        cards.append(formated_card)
+    return cards
+
+
+def stream_page(page: bytes) -> int:
+    """Current implementation: streams the page, handling cards one at a time.
+    """
+
+    return sum(1 for _ in iter_cards(BytesIO(page)))
+
+
+def peak_memory(func, page: bytes) -> int:
+    tracemalloc.start()
+    func(page)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == '__main__':
+    page = cards_page()
+    number = 50
+
+    print('ijson backend: {}'.format(ijson.__name__))
+    for func in (load_page, stream_page):
+        duration = timeit.timeit(lambda: func(page), number=number) / number
+        print('{:12} {:8.2f} ms/page {:8.0f} KiB peak'.format(
+            func.__name__, duration * 1000, peak_memory(func, page) / 1024))
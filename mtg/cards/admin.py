@@ -12,7 +12,8 @@ from django.utils.translation import ugettext_lazy as _
 
 from stats.admin import PriceInline
 
-from .models import Card, CardName
+from .models import Card, CardName, MkmNameOverride, PrintingSummary
+from .utils import refresh_mkm_urls
 
 
 class CardInline(admin.TabularInline):
@@ -122,3 +123,33 @@ class CardAdmin(admin.ModelAdmin):
 class CardNameAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     inlines = [CardInline]
+
+
+@admin.register(PrintingSummary)
+class PrintingSummaryAdmin(admin.ModelAdmin):
+    list_display = ('card_name', 'first_release', 'last_release', 'rotation_date', 'reprints', 'last_reprint')
+    search_fields = ('card_name__name',)
+
+
+@admin.register(MkmNameOverride)
+class MkmNameOverrideAdmin(admin.ModelAdmin):
+    list_display = ('name', 'set_code', 'number', 'mkm_name')
+    search_fields = ('name', 'mkm_name')
+    actions = ('apply_to_cards',)
+
+    def apply_to_cards(self, request, queryset):
+        rows_updated = 0
+        for override in queryset:
+            cards = Card.objects.filter(name_id=override.name)
+            if override.set_code:
+                cards = cards.filter(set_id=override.set_code)
+            if override.number:
+                cards = cards.filter(number=override.number)
+            cards.update(mkm_name=override.mkm_name)
+            rows_updated += refresh_mkm_urls(cards)
+        if rows_updated == 1:
+            message = "1 card was"
+        else:
+            message = "{} cards were".format(rows_updated)
+        self.message_user(request, "{} successfully updated.".format(message))
+    apply_to_cards.short_description = _('Apply to stored cards')
@@ -11,3 +11,6 @@ from django.apps import AppConfig
 class CardsConfig(AppConfig):
     name = 'cards'
     verbose_name = "Cards"
+
+    def ready(self):
+        from . import signals  # noqa: F401
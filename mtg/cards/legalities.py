@@ -0,0 +1,134 @@
+"""
+@author: Thomas PERROT
+
+Contains the legality refresh for cards app.
+
+Only the banned and restricted lists of a format are compared with the stored legalities. A card which drops off these
+lists is not necessarily legal (e.g. a card banned in standard which rotates out), so its legality is confirmed from its
+current legalities before being changed. The card names whose legality changed are applied with a single UPDATE per
+format, so that ban announcements are reflected as soon as the MTG API lists them.
+"""
+
+
+from typing import Callable, Dict, List, Tuple
+
+from django.db import transaction
+from django.db.models import Case, CharField, QuerySet, Value, When
+from django.db.models.functions import Lower
+
+from .models import Card
+from tournaments.models import Legality
+
+
+LEGAL = 'legal'
+BANNED = 'banned'
+RESTRICTED = 'restricted'
+NOT_LEGAL = 'not_legal'
+
+
+def diff_legalities(stored: Dict[str, str], upstream: Dict[str, str], confirmed: Dict[str, str]=None) -> Dict[str, str]:
+    """Returns the card names whose legality changed, with their new legality.
+
+    Stored and upstream legalities map card names to their legality when they are banned or restricted. Card names
+    which dropped off the upstream lists only change to their confirmed legality (e.g. legal, or not legal once they
+    rotated out of the format), and are skipped if it is unknown, since absence from the lists does not mean legal.
+    """
+
+    confirmed = confirmed or {}
+    changes = {}
+    for name in set(stored) | set(upstream):
+        legality = upstream.get(name) or confirmed.get(name)
+        if legality and legality != stored.get(name, LEGAL):
+            changes[name] = legality
+    return changes
+
+
+def get_restrictions(format_id: str) -> Dict[str, str]:
+    """Returns the stored legality of the card names which are banned or restricted in the given format.
+
+    Legalities stored as given by the MTG API (e.g. `Banned`) are compared case insensitively.
+    """
+
+    return {name: Legality.parse(legality) for name, legality in Legality.objects.filter(
+        format_id=format_id,
+        legality__iregex=r'^({}|{})$'.format(BANNED, RESTRICTED)
+    ).values_list(
+        'card__name_id', 'legality'
+    ).distinct()}
+
+
+def apply_legalities(format_id: str, changes: Dict[str, str]) -> Tuple[int, int]:
+    """Stores the new legalities of the given card names in the given format.
+
+    Stored legalities of all the printings of a card name are updated with a single statement, and the missing ones are
+    created. Returns the number of updated and created legalities.
+    """
+
+    card_ids = {}  # type: Dict[str, List[str]]
+    for card_id, name in Card.objects.filter(name_id__in=list(changes)).values_list('id', 'name_id'):
+        card_ids.setdefault(changes[name], []).append(card_id)
+    if not card_ids:
+        return 0, 0
+
+    all_card_ids = [card_id for ids in card_ids.values() for card_id in ids]
+    with transaction.atomic():
+        updated = Legality.objects.filter(
+            format_id=format_id,
+            card_id__in=all_card_ids
+        ).update(
+            legality=Case(*[When(card_id__in=ids, then=Value(legality)) for legality, ids in card_ids.items()],
+                          output_field=CharField())
+        )
+
+        existing = set(Legality.objects.filter(format_id=format_id, card_id__in=all_card_ids).values_list(
+            'card_id', flat=True))
+        created = Legality.objects.bulk_create(
+            Legality(card_id=card_id, format_id=format_id, legality=legality)
+            for legality, ids in card_ids.items() if legality != LEGAL for card_id in ids if card_id not in existing
+        )
+
+    return updated, len(created)
+
+
+def refresh_legalities(format_id: str, upstream: Dict[str, str],
+                       confirm: Callable[[List[str]], Dict[str, str]]) -> Dict[str, Tuple[str, str]]:
+    """Applies the given banned and restricted card names of a format (as listed by the MTG API) to the stored
+    legalities, and returns the (previous, new) legalities of the card names whose legality changed.
+
+    The legality of the card names which dropped off the lists is given by `confirm`, from their current legalities in
+    the format (see diff_legalities).
+    """
+
+    stored = get_restrictions(format_id)
+    dropped = sorted(set(stored) - set(upstream))
+    changes = diff_legalities(stored, upstream, confirm(dropped) if dropped else {})
+    if changes:
+        apply_legalities(format_id, changes)
+    return {name: (stored.get(name, LEGAL), legality) for name, legality in changes.items()}
+
+
+def normalize_legalities() -> int:
+    """Converts the legalities stored as given by the MTG API (e.g. `Legal`) to Legality choices.
+
+    Returns the number of converted legalities.
+    """
+
+    return Legality.objects.exclude(
+        legality__in=[legality for legality, _ in Legality.LEGALITY]
+    ).update(
+        legality=Lower('legality')
+    )
+
+
+def filter_legal_cards(cards: QuerySet, format_id: str) -> QuerySet:
+    """Filters the given cards on their legality in the given format, restricted cards being legal.
+
+    Legalities are looked up in a subquery using the (format, legality) index, so that cards are not duplicated.
+    """
+
+    return cards.filter(id__in=Legality.objects.filter(
+        format_id=format_id,
+        legality__in=(LEGAL, RESTRICTED)
+    ).values(
+        'card_id'
+    ))
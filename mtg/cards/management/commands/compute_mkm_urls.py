@@ -0,0 +1,26 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to recompute the magiccardmarket.eu url of cards
+"""
+
+
+from django.core.management.base import BaseCommand
+
+from cards.models import Card
+from cards.utils import refresh_mkm_urls
+
+
+class Command(BaseCommand):
+    help = 'Recomputes and stores the magiccardmarket.eu url of cards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--set', dest='set_id', help='Only recomputes urls of the cards of the given set.')
+
+    def handle(self, *args, **options):
+        cards = Card.objects.all()
+        if options['set_id']:
+            cards = cards.filter(set_id=options['set_id'])
+
+        updated = refresh_mkm_urls(cards)
+        self.stdout.write('Updated {} card urls'.format(updated))
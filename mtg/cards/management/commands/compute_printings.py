@@ -0,0 +1,21 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to rebuild the printing summaries of card names
+"""
+
+
+from django.core.management.base import BaseCommand
+
+from cards.printings import refresh_printing_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the printing summaries (releases, standard rotation date and reprints) of card names.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Only rebuilds the summaries of the given card names.')
+
+    def handle(self, *args, **options):
+        count = refresh_printing_summaries(options['names'] or None)
+        self.stdout.write('Refreshed {} printing summaries'.format(count))
@@ -0,0 +1,19 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to create the card search indexes
+"""
+
+
+from django.core.management.base import BaseCommand
+
+from cards.search import create_search_indexes
+
+
+class Command(BaseCommand):
+    help = 'Creates the pg_trgm extension, the full-text and trigram indexes used by card search, and the trigger ' \
+           'keeping card search vectors up to date. Safe to run several times.'
+
+    def handle(self, *args, **options):
+        filled = create_search_indexes()
+        self.stdout.write('Created search indexes, and filled the search vector of {} cards'.format(filled))
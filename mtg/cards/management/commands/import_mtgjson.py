@@ -0,0 +1,60 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to import sets and cards from a MTGJSON dump
+"""
+
+
+import gzip
+import lzma
+
+from django.core.management.base import BaseCommand
+
+from cards.models import Set
+from cards.tasks import (iter_mtgjson_sets, parse_set, post_process_set, store_boosters, format_card,
+                         post_process_cards, store_cards, store_printings)
+
+
+class Command(BaseCommand):
+    help = 'Imports sets, boosters and cards from a MTGJSON AllSets.json file (optionally .gz or .xz compressed), ' \
+           'without network access. Existing sets and cards are skipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path.endswith('.gz'):
+            f = gzip.open(path, 'rb')
+        elif path.endswith('.xz'):
+            f = lzma.open(path, 'rb')
+        else:
+            f = open(path, 'rb')
+
+        missing_printings = []
+        new_boosters = []
+
+        with f:
+            for set_dict in iter_mtgjson_sets(f):
+                cards = set_dict.pop('cards', [])
+
+                parsed_set = parse_set(set_dict)
+                post_process_set(parsed_set)
+                set_id = parsed_set.pop('id')
+                set_, created = Set.objects.get_or_create(id=set_id, defaults=parsed_set)
+                if created and set_.has_booster:
+                    new_boosters.append({'code': set_id, 'booster': set_dict['booster']})
+
+                formated_cards = [format_card(dict(card, set=set_id)) for card in cards]
+                post_process_cards(formated_cards)
+                created_cards, set_missing_printings = store_cards(formated_cards)
+                missing_printings += set_missing_printings
+
+                self.stdout.write('Imported set {} ({} new cards)'.format(set_dict['name'], created_cards))
+
+        store_boosters(new_boosters)
+
+        # Printings in sets that were not imported yet when their cards were stored
+        unknown_printings = store_printings(missing_printings)
+        if unknown_printings:
+            self.stderr.write('{} printings reference unknown sets'.format(len(unknown_printings)))
@@ -0,0 +1,32 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to refresh the legalities of cards from the banned and restricted lists of the MTG API
+"""
+
+
+from django.core.management.base import BaseCommand
+
+from cards.legalities import normalize_legalities, refresh_legalities
+from cards.tasks import fetch_legalities, fetch_restrictions
+from stats.events import record_legality_changes
+from stats.tasks import emit_market_events
+from tournaments.models import Format
+
+
+class Command(BaseCommand):
+    help = 'Converts stored legalities to lower case, and applies the banned and restricted lists of the MTG API ' \
+           'to the legalities of constructed formats.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='format_ids', action='append',
+                            help='Only refreshes the legalities of the given format (can be repeated).')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Normalized {} legalities'.format(normalize_legalities()))
+
+        for format_id in options['format_ids'] or [format_id for format_id, _ in Format.FORMATS]:
+            changes = refresh_legalities(format_id, fetch_restrictions(format_id),
+                                         lambda names: fetch_legalities(format_id, names))
+            emit_market_events(record_legality_changes(format_id, changes))
+            self.stdout.write('{} legality changes in {}'.format(len(changes), format_id))
@@ -5,9 +5,11 @@ Contains models for cards app
 """
 
 
+from typing import Iterable, List, Tuple
 from datetime import date, timedelta
 from urllib.parse import quote_plus
 
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core import validators
 
@@ -33,6 +35,9 @@ class Color(models.Model):
         ('G', 'Green'),
     )
 
+    # Bits of the colors in Card.colors_mask
+    MASKS = {color_id: 1 << i for i, (color_id, _) in enumerate(COLORS_ID)}
+
     color_id = models.CharField(max_length=1, primary_key=True, choices=COLORS_ID)
 
     def __str__(self) -> str:
@@ -42,6 +47,21 @@ class Color(models.Model):
     def name(self) -> str:
         return self.get_color_id_display().lower()
 
+    @classmethod
+    def parse(cls, color: str) -> str:
+        """Returns the color id of the given color name or id (e.g. `Blue` or `U` gives `U`).
+        """
+
+        return dict((name, color_id) for color_id, name in cls.COLORS_ID).get(color.capitalize(), color.upper())
+
+    @classmethod
+    def to_mask(cls, color_ids: Iterable[str]) -> int:
+        return sum(cls.MASKS.get(color_id, 0) for color_id in set(color_ids))
+
+    @classmethod
+    def from_mask(cls, mask: int) -> List[str]:
+        return [color_id for color_id, _ in cls.COLORS_ID if mask & cls.MASKS[color_id]]
+
 
 class Type(models.Model):
     """Class which represents a card type (e.g creature, sorcery, etc.).
@@ -58,11 +78,24 @@ class Type(models.Model):
         ('planeswalker', 'Planeswalker'),
     )
 
+    # Bits of the types in Card.types_mask
+    MASKS = {name: 1 << i for i, (name, _) in enumerate(TYPES)}
+    # Order of the types in a type line (e.g. `Artifact Creature`)
+    LINE_ORDER = ('tribal', 'enchantment', 'artifact', 'land', 'creature', 'planeswalker', 'instant', 'sorcery')
+
     name = models.CharField(max_length=50, primary_key=True, choices=TYPES)
 
     def __str__(self) -> str:
         return self.get_name_display()
 
+    @classmethod
+    def to_mask(cls, names: Iterable[str]) -> int:
+        return sum(cls.MASKS.get(name, 0) for name in set(names))
+
+    @classmethod
+    def from_mask(cls, mask: int) -> List[str]:
+        return [name for name, _ in cls.TYPES if mask & cls.MASKS[name]]
+
 
 class SuperType(models.Model):
     """Class which represents a card supertype  (Basic, Legendary, Snow, World, Ongoing, etc.).
@@ -111,6 +144,29 @@ class CardName(models.Model):
         ordering = ['name']
 
 
+class MkmNameOverride(models.Model):
+    """Class which represents the name of a card on magiccardmarket.eu, when it differs from the card name
+    (e.g. `Æther Vial`, `Dusk // Dawn` or `Kaya, Ghost Assassin (Version 2)`).
+
+    An override can be restricted to a set and to a card number. The most specific override applies.
+    Initial overrides are shipped in the `mkm_name_overrides` fixture, which is loaded after migrations if the table
+    is empty.
+    """
+
+    name = models.CharField(max_length=150)
+    set_code = models.CharField(max_length=25, blank=True)
+    number = models.CharField(max_length=25, blank=True)
+    mkm_name = models.CharField(max_length=100)
+
+    def __str__(self) -> str:
+        return '{} -> {}'.format(self.name, self.mkm_name)
+
+    class Meta:
+        verbose_name = 'MKM name override'
+        ordering = ['name']
+        unique_together = ('name', 'set_code', 'number')
+
+
 class Card(models.Model):
     """Class which represents a card. It has the following attributes (from docs.magicthegathering.io):
 
@@ -266,6 +322,7 @@ class Card(models.Model):
     # Optional meta fields
     multiverse_id = models.PositiveIntegerField(blank=True, null=True)
     mkm_name = models.CharField(max_length=100, blank=True)
+    mkm_url = models.CharField(max_length=300, blank=True, db_index=True)  # computed from names, mkm_name and set
     image_url = models.CharField(max_length=100, blank=True, validators=[validators.URLValidator])
     original_text = models.CharField(max_length=1000, blank=True)
     original_type = models.CharField(max_length=1000, blank=True)
@@ -283,6 +340,14 @@ class Card(models.Model):
 
     # Additional fields for app behavior
     is_relevant = models.BooleanField(default=False)
+    crawl_interval = models.PositiveSmallIntegerField(default=1)  # days between two price crawls
+    next_crawl_at = models.DateTimeField(blank=True, null=True)
+    search_vector = SearchVectorField(null=True, editable=False)  # filled by a database trigger, see cards.search
+
+    # Denormalized from supertypes, types, subtypes and colors, to filter and render cards without joins
+    type_line = models.CharField(max_length=200, blank=True)
+    types_mask = models.PositiveSmallIntegerField(default=0)  # bits of Type.MASKS
+    colors_mask = models.PositiveSmallIntegerField(default=0)  # bits of Color.MASKS
 
     def __str__(self) -> str:
         return '{} - {}'.format(self.name.name, self.set.id)
@@ -294,34 +359,71 @@ class Card(models.Model):
     def type(self) -> str:
         """Returns the complete type a the card.
 
-        e.g. `Legendary Echantment Creature — God`
+        e.g. `Legendary Enchantment Creature — God`
         """
 
-        result = ''
-        if self.super_types:
-            result += ' '.join([t.name for t in self.super_types])
-        result += ' '.join(sorted([t.name for t in self.types]))
-        if self.sub_types:
-            result += ' — ' + ' '.join(sorted([t.name for t in self.sub_types]))
+        return self.type_line
+
+    @staticmethod
+    def build_type_line(super_types: Iterable[str], types: Iterable[str], sub_types: Iterable[str]) -> str:
+        """Builds the type line of a card from the names of its supertypes, types and subtypes.
+        """
+
+        order = {name: i for i, name in enumerate(Type.LINE_ORDER)}
+        types = sorted(types, key=lambda t: (order.get(t, len(order)), t))
+        result = ' '.join(t.capitalize() for t in list(super_types) + types)
+        sub_types = sorted(t.capitalize() for t in sub_types)
+        if sub_types:
+            result += ' — ' + ' '.join(sub_types)
         return result
 
-    @property
-    def mkm_url(self) -> str:
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        card = super().from_db(db, field_names, values)
+        card._loaded_mkm_url_fields = card.get_mkm_url_fields()
+        return card
+
+    def get_mkm_url_fields(self) -> Tuple:
+        """Returns the values of the fields `mkm_url` is computed from, apart from names and set names which are
+        handled by signals. Deferred fields are None.
+        """
+
+        return tuple(self.__dict__.get(field) for field in ('name_id', 'set_id', 'mkm_name', 'layout'))
+
+    def save(self, *args, **kwargs) -> None:
+        mkm_url_fields = self.get_mkm_url_fields()
+        loaded_mkm_url_fields = getattr(self, '_loaded_mkm_url_fields', None)
+        if not self.mkm_url or (loaded_mkm_url_fields is not None and mkm_url_fields != loaded_mkm_url_fields):
+            self.mkm_url = self.get_mkm_url()
+        super().save(*args, **kwargs)
+        self._loaded_mkm_url_fields = mkm_url_fields
+
+    def get_mkm_url(self) -> str:
         """Returns the magiccardmarket.eu url for this card.
+
+        It is stored in `mkm_url` when the card is saved without url or with a new name, set, mkm_name or layout, and
+        when its names or its set change.
         """
 
-        if self.mkm_name:
-            card_name = self.mkm_name
-        elif self.layout in ('double-faced', 'meld'):
-            card_name = ' / '.join(n.name for n in self.names.all())
-        elif self.layout in ('aftermath', 'split'):
-            card_name = ' // '.join(n.name for n in self.names.all())
-        else:
-            card_name = self.name.name
+        return self.build_mkm_url(self.name_id, self.layout, [n.name for n in self.names.all()], self.mkm_name,
+                                  self.set.mkm_name or self.set.name)
 
-        set_name = self.set.mkm_name or self.set.name
+    @classmethod
+    def build_mkm_url(cls, name: str, layout: str, names: Iterable[str], mkm_name: str, set_name: str) -> str:
+        """Returns the magiccardmarket.eu url of a card from its fields, so that it can be computed before the card
+        and its names are stored.
+        """
 
-        url = self.MKM_BASE_CARD_URL.format(
+        if mkm_name:
+            card_name = mkm_name
+        elif layout in ('double-faced', 'meld'):
+            card_name = ' / '.join(sorted(names))
+        elif layout in ('aftermath', 'split'):
+            card_name = ' // '.join(sorted(names))
+        else:
+            card_name = name
+
+        url = cls.MKM_BASE_CARD_URL.format(
             set=quote_plus(set_name),
             card_name=quote_plus(card_name)
         )
@@ -338,3 +440,25 @@ class Card(models.Model):
                 if deck_position.tournament.event_date > date.today() - timedelta(days=60):
                     return True
         return False
+
+
+class PrintingSummary(models.Model):
+    """Class which stores the precomputed printing history of a card name (see cards.printings): its first and last
+    releases, its last release in a standard legal set and the date it rotates out of standard, and its reprints.
+    """
+
+    card_name = models.OneToOneField(CardName, on_delete=models.CASCADE, primary_key=True,
+                                     related_name='printing_summary')
+    first_release = models.DateField()
+    last_release = models.DateField()
+    last_standard_release = models.DateField(blank=True, null=True)  # last core set or expansion
+    rotation_date = models.DateField(blank=True, null=True)
+    reprints = models.PositiveSmallIntegerField()  # number of sets but the first one
+    last_reprint = models.DateField(blank=True, null=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return self.card_name_id
+
+    class Meta:
+        verbose_name_plural = 'Printing summaries'
@@ -0,0 +1,85 @@
+"""
+@author: Thomas PERROT
+
+Contains the printing summaries for cards app.
+
+The release dates of the sets a card name is printed in are aggregated in a single query, into one PrintingSummary per
+card name, so that features such as the standard rotation date or the reprints of a card are a join away.
+"""
+
+
+from typing import Dict, Iterable, Optional, Tuple
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, DateField, F, Max, Min, When
+
+from .models import Card, PrintingSummary
+
+
+# Sets whose cards are legal in standard format.
+STANDARD_SET_TYPES = ('core', 'expansion')
+# There are 2 sets every year, and only the last 3 sets are legal at the same time in standard format. To be exact, it
+# is 575 days: Battle for Zendikar was released on October 2, 2015 and became illegal for Amonkhet release on
+# April 28, 2017.
+STANDARD_ROTATION_DAYS = 575
+
+# (sets, first release, last release, last standard release) of a card name.
+Releases = Tuple[int, date, date, Optional[date]]
+
+
+def summarize_printings(releases: Releases) -> Dict:
+    """Returns the PrintingSummary fields of a card name from the releases of its sets.
+    """
+
+    sets, first_release, last_release, last_standard_release = releases
+    return {
+        'first_release': first_release,
+        'last_release': last_release,
+        'last_standard_release': last_standard_release,
+        'rotation_date': last_standard_release + timedelta(days=STANDARD_ROTATION_DAYS)
+        if last_standard_release else None,
+        'reprints': sets - 1,
+        'last_reprint': last_release if sets > 1 else None,
+    }
+
+
+def build_printing_summaries(card_names: Iterable[str]=None) -> Dict[str, Dict]:
+    """Returns the printing summary fields of the given card names (or of every card name).
+    """
+
+    cards = Card.objects.all()
+    if card_names is not None:
+        cards = cards.filter(name_id__in=list(card_names))
+
+    releases = cards.values_list(
+        'name_id'
+    ).annotate(
+        sets=Count('set_id', distinct=True),
+        first_release=Min('set__release_date'),
+        last_release=Max('set__release_date'),
+        last_standard_release=Max(Case(
+            When(set__type__in=STANDARD_SET_TYPES, then=F('set__release_date')),
+            output_field=DateField()
+        ))
+    ).order_by()
+
+    return {card_name: summarize_printings(card_releases) for card_name, *card_releases in releases}
+
+
+def refresh_printing_summaries(card_names: Iterable[str]=None) -> int:
+    """Builds and stores (or replaces) the printing summaries of the given card names (or of every card name).
+
+    Returns the number of stored summaries.
+    """
+
+    summaries = build_printing_summaries(card_names)
+    with transaction.atomic():
+        stored = PrintingSummary.objects.all()
+        if card_names is not None:
+            stored = stored.filter(card_name_id__in=summaries)
+        stored.delete()
+        PrintingSummary.objects.bulk_create(
+            PrintingSummary(card_name_id=card_name, **summary) for card_name, summary in summaries.items()
+        )
+    return len(summaries)
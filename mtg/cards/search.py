@@ -0,0 +1,175 @@
+"""
+@author: Thomas PERROT
+
+Contains the card search for cards app.
+
+Cards are searched with PostgreSQL full-text search on their name, type line and text, and with pg_trgm trigram
+similarity on their name, so that typos still match. Indexes, and the trigger keeping Card.search_vector up to date,
+are created by the create_search_indexes command, which runs at deploy.
+"""
+
+
+from typing import Dict, Iterable
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, Q, QuerySet
+
+from .models import Card, CardName
+
+
+SEARCH_CONFIG = 'english'
+# Minimum similarity between a card name and an unknown name for the latter to be resolved to the former.
+FUZZY_NAME_THRESHOLD = 0.5
+
+# Whether pg_trgm is installed. Only a positive answer is kept, so that the extension is picked up once created.
+_has_trigram_extension = False
+
+# Search vector of a card row, whose columns are prefixed by `{row}`. Name weighs more than type line (or the printed
+# type, for cards stored before type lines), which weighs more than text.
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('{config}', coalesce({{row}}name_id, '')), 'A') ||
+    setweight(to_tsvector('{config}', coalesce(nullif({{row}}type_line, ''), {{row}}original_type, '')), 'B') ||
+    setweight(to_tsvector('{config}', coalesce({{row}}text, '')), 'C')
+""".format(config=SEARCH_CONFIG)
+
+SEARCH_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+
+    """
+    CREATE OR REPLACE FUNCTION cards_card_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {vector};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """.format(vector=SEARCH_VECTOR_SQL.format(row='NEW.')),
+    'DROP TRIGGER IF EXISTS cards_card_search_vector ON cards_card',
+    """
+    CREATE TRIGGER cards_card_search_vector BEFORE INSERT OR UPDATE OF name_id, type_line, original_type, text
+    ON cards_card FOR EACH ROW EXECUTE PROCEDURE cards_card_search_vector()
+    """,
+
+    'CREATE INDEX IF NOT EXISTS cards_card_search_vector_gin ON cards_card USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS cards_cardname_name_trgm ON cards_cardname USING gin (name gin_trgm_ops)',
+    # icontains lookups compare UPPER(name::text) with LIKE '%...%'
+    'CREATE INDEX IF NOT EXISTS cards_cardname_upper_name_trgm ON cards_cardname '
+    'USING gin (UPPER(name::text) gin_trgm_ops)',
+    # istartswith lookups compare UPPER(name) with LIKE
+    'CREATE INDEX IF NOT EXISTS cards_cardname_upper_name_like ON cards_cardname (UPPER(name) varchar_pattern_ops)',
+]
+
+# Fills the search vectors which are missing or outdated (e.g. computed by a previous version of the trigger).
+FILL_SEARCH_VECTORS_SQL = """
+    UPDATE cards_card SET search_vector = {vector}
+    WHERE search_vector IS DISTINCT FROM {vector}
+""".format(vector=SEARCH_VECTOR_SQL.format(row=''))
+
+# Most similar card name of each given name. `%%` (pg_trgm similarity operator, escaped) uses the trigram index.
+FUZZY_RESOLVE_SQL = """
+    SELECT q.name, m.name
+    FROM unnest(%s::text[]) AS q(name)
+    CROSS JOIN LATERAL (
+        SELECT c.name
+        FROM cards_cardname c
+        WHERE c.name %% q.name AND similarity(c.name, q.name) >= %s
+        ORDER BY similarity(c.name, q.name) DESC, c.name
+        LIMIT 1
+    ) m
+"""
+
+
+def has_trigram_extension() -> bool:
+    """Returns whether the pg_trgm extension is installed (see create_search_indexes), which trigram similarity needs.
+    """
+
+    global _has_trigram_extension
+
+    if not _has_trigram_extension:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _has_trigram_extension = cursor.fetchone() is not None
+    return _has_trigram_extension
+
+
+def create_search_indexes() -> int:
+    """Creates the search indexes and trigger, and fills the search vector of existing cards when it is missing or
+    outdated.
+
+    Returns the number of cards whose search vector has been filled.
+    """
+
+    with connection.cursor() as cursor:
+        for sql in SEARCH_SQL:
+            cursor.execute(sql)
+        cursor.execute(FILL_SEARCH_VECTORS_SQL)
+        return cursor.rowcount
+
+
+def search_cards(query: str) -> QuerySet:
+    """Returns the cards matching the given query, from the most to the least relevant.
+
+    Cards match if their name, type line or text contain the words of the query, or if their name is similar to the
+    query (e.g. `Tarmogoyfe` matches `Tarmogoyf`), or contains it if pg_trgm is not installed.
+    """
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG)
+    if not has_trigram_extension():
+        return Card.objects.filter(
+            Q(search_vector=search_query) | Q(name__name__icontains=query)
+        ).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by(
+            '-rank', 'name', 'id'
+        )
+
+    return Card.objects.filter(
+        Q(search_vector=search_query) | Q(name__name__trigram_similar=query)
+    ).annotate(
+        rank=SearchRank(F('search_vector'), search_query),
+        similarity=TrigramSimilarity('name__name', query)
+    ).order_by(
+        '-rank', '-similarity', 'name', 'id'
+    )
+
+
+def search_card_names(query: str) -> QuerySet:
+    """Returns the card names similar to the given query or containing it (e.g. `bolt` matches `Lightning Bolt`), from
+    the most to the least similar (or by name if pg_trgm is not installed).
+    """
+
+    if not has_trigram_extension():
+        return CardName.objects.filter(name__icontains=query).order_by('name')
+
+    return CardName.objects.filter(
+        Q(name__trigram_similar=query) | Q(name__icontains=query)
+    ).annotate(
+        similarity=TrigramSimilarity('name', query)
+    ).order_by(
+        '-similarity', 'name'
+    )
+
+
+def autocomplete_card_names(prefix: str) -> QuerySet:
+    """Returns the card names starting with the given prefix, case insensitively.
+    """
+
+    return CardName.objects.filter(name__istartswith=prefix).order_by('name')
+
+
+def fuzzy_resolve_card_names(names: Iterable[str]) -> Dict[str, str]:
+    """Resolves the given card names to the most similar stored card names (i.e. CardName primary keys), with a single
+    query using the trigram index.
+
+    This is meant for names which cannot be resolved by cards.utils.resolve_card_names (exact or normalized matching),
+    such as misspelled names. Names without a similar enough card name are missing from the result, as well as all the
+    names if pg_trgm is not installed.
+    """
+
+    names = sorted(set(names))
+    if not names or not has_trigram_extension():
+        return {}
+
+    with connection.cursor() as cursor:
+        cursor.execute(FUZZY_RESOLVE_SQL, [names, FUZZY_NAME_THRESHOLD])
+        return dict(cursor.fetchall())
@@ -10,12 +10,6 @@ from rest_framework import serializers
 from .models import CardName, Card
 
 
-class CardTypeSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Card
-        fields = ('types',)
-
-
 class PrintingSerializer(serializers.ModelSerializer):
     set_name = serializers.ReadOnlyField(source='set.name')
     set_id = serializers.ReadOnlyField(source='set.id')
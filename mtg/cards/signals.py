@@ -0,0 +1,55 @@
+"""
+@author: Thomas PERROT
+
+Contains signal handlers for cards app
+"""
+
+
+from django.core.management import call_command
+from django.db.models.signals import m2m_changed, post_migrate, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Card, Set, MkmNameOverride
+from .utils import refresh_mkm_urls, get_mkm_name_overrides
+
+
+@receiver(m2m_changed, sender=Card.names.through)
+def update_mkm_url_on_names_change(sender, instance, action, reverse, **kwargs) -> None:
+    """Recomputes the magiccardmarket.eu url of cards whose names changed.
+    """
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        refresh_mkm_urls(Card.objects.filter(names=instance))
+    else:
+        refresh_mkm_urls(Card.objects.filter(id=instance.id))
+
+
+@receiver(post_save, sender=Set)
+def update_mkm_url_on_set_change(sender, instance, created, **kwargs) -> None:
+    """Recomputes the magiccardmarket.eu url of the cards of a set that changed.
+    """
+
+    if not created:
+        refresh_mkm_urls(Card.objects.filter(set=instance))
+
+
+@receiver(post_save, sender=MkmNameOverride)
+@receiver(post_delete, sender=MkmNameOverride)
+def refresh_mkm_name_overrides(sender, **kwargs) -> None:
+    """Rebuilds the index of magiccardmarket.eu name overrides of this process when an override changes.
+    """
+
+    get_mkm_name_overrides(refresh=True)
+
+
+@receiver(post_migrate)
+def load_mkm_name_overrides(sender, **kwargs) -> None:
+    """Loads the initial magiccardmarket.eu name overrides (shipped in the `mkm_name_overrides` fixture) once the cards
+    app is migrated, unless overrides were already stored.
+    """
+
+    if sender.name == 'cards' and not MkmNameOverride.objects.exists():
+        call_command('loaddata', 'mkm_name_overrides', verbosity=kwargs.get('verbosity', 1))
@@ -5,72 +5,81 @@ Contains tasks for cards app
 """
 
 
-from typing import Dict
+from typing import Dict, List, Iterator, Iterable, Tuple, BinaryIO
 import re
 from collections import Counter
+from itertools import count
 from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from urllib.parse import quote
 
 import requests
+try:
+    # C backend (needs libyajl2), much faster than the pure python one
+    import ijson.backends.yajl2_cffi as ijson
+except ImportError:
+    import ijson
+from ijson.common import ObjectBuilder
 from celery import shared_task
 from celery.exceptions import SoftTimeLimitExceeded
 from celery.utils.log import get_task_logger
+from django.db import transaction
 from django.utils import timezone
 
 from .models import Set, CardName, Card, Color, Type, SubType, SuperType
+from .utils import apply_mkm_name_overrides
+from .printings import refresh_printing_summaries
+from .legalities import NOT_LEGAL, refresh_legalities
 from sets.models import Rarity, Slot, Booster
 from tournaments.models import Format, Legality
+from stats.events import record_legality_changes
+from stats.tasks import emit_market_events
 
 logger = get_task_logger(__name__)
 
 MTG_URL_CARDS = 'https://api.magicthegathering.io/v1/cards?page={page}&pageSize={page_size}'
 MTG_URL_SETS = 'https://api.magicthegathering.io/v1/sets'
+MTG_URL_LEGALITIES = 'https://api.magicthegathering.io/v1/cards?gameFormat={format}&legality={legality}&page={page}' \
+                     '&pageSize={page_size}'
+MTG_URL_CARD_NAME = 'https://api.magicthegathering.io/v1/cards?name={name}&pageSize={page_size}'
+MTG_PAGE_SIZE = 100
 
 
+@lru_cache(maxsize=None)
 def to_snake_case(name: str) -> str:
+    """Converts a camel case key of the MTG API to snake case. Memoized, since API keys are a small fixed set.
+    """
+
     s1 = re.sub(r'(.)([A-Z][a-z]+)', r'\1_\2', name)
     return re.sub(r'([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
 
 
-def post_process_card(card: Dict) -> None:
-    """Add some attributes to the card before storing it.
+def format_card(card: Dict) -> Dict:
+    """Converts the keys of the given card to snake case, and the numbers parsed as decimals to int or float.
     """
 
-    # Char issues
-    if card['name'] == 'Aether Vial':
-        card['mkm_name'] = 'Æther Vial'
-
-    # Version issues
-    conditions = (
-        lambda x: x['name'] == "Atraxa, Praetors' Voice",
-        lambda x: x['name'] == 'Saskia the Unyielding',
-        lambda x: x['name'] == "Kaya, Ghost Assassin" and x['number'] == 75,
-        lambda x: x['name'] == "Meren of Clan Nel Toth" and x['set'].id == 'C15',
-        lambda x: x['name'] == "Derevi, Empyrial Tactician" and x['set'].id == 'C13'
-    )
-    if any(conditions):
-        card['mkm_name'] = card['name'] + ' (Version 1)'
+    formated_card = {}
+    for key, value in card.items():
+        if isinstance(value, Decimal):
+            value = int(value) if value == value.to_integral_value() else float(value)
+        formated_card[to_snake_case(key)] = value
+    return formated_card
 
-    conditions = (
-        lambda x: x['name'] == "Kaya, Ghost Assassin" and x['number'] == 222,
-    )
-    if any(conditions):
-        card['mkm_name'] = card['name'] + ' (Version 2)'
-
-    # Layout issue
-    mkm_names = (
-        "Mayor of Avabruck / Howlpack Alpha",
-        "Jace, Vryn's Prodigy // Jace, Telepath Unbound",
-        'Westvale Abbey / Ormendahl, Profane Prince',
-        'Thing in the Ice / Awoken Horror',
-        'Arlinn Kord / Arlinn, Embraced by the Moon',
-        'Dusk // Dawn',
-        'Heaven // Earth',
-        'Gisela, the Broken Blade / Brisela, Voice of Nightmares',
-        'Hanweir Battlements / Hanweir, the Writhing Township',
-        'Hanweir Garrison / Hanweir, the Writhing Township'
-    )
-    name_to_mkm_name = {subname.strip(): name for name in mkm_names for subname in name.split('/') if subname}
-    card['mkm_name'] = name_to_mkm_name.get(card['name'], '')
+
+def iter_cards(page: BinaryIO) -> Iterator[Dict]:
+    """Parses the given page of the MTG API cards endpoint, yielding formatted cards as the body arrives.
+    """
+
+    for card in ijson.items(page, 'cards.item'):
+        yield format_card(card)
+
+
+def post_process_cards(cards: List[Dict]) -> None:
+    """Add some attributes to the cards before storing them.
+    """
+
+    apply_mkm_name_overrides(cards)
 
 
 def post_process_set(set_: Dict) -> None:
@@ -117,37 +126,69 @@ def parse_rarity(rarity: str) -> Dict:
     return {'rarity': rarity[0].upper(), 'foil': foil}
 
 
-@shared_task(soft_time_limit=5,
+RarityKey = Tuple[str, bool]
+
+
+def build_booster_slots(booster: List) -> List[Tuple[Tuple[RarityKey, ...], int]]:
+    """Builds the slots of a booster from the `booster` array of a set.
+
+    Each slot is given as its sorted (rarity, foil) pairs, and the number of cards of the booster in this slot.
+    Identical slots are merged, e.g. `["rare", "common", "common", ["rare", "mythic rare"]]` gives
+    `[((('C', False),), 2), ((('M', False), ('R', False)), 1), ((('R', False),), 1)]`.
+    """
+
+    slots = Counter()
+    for slot in booster:
+        rarities = [slot] if isinstance(slot, str) else slot
+        keys = set()
+        for rarity in rarities:
+            rarity = parse_rarity(rarity)
+            keys.add((rarity['rarity'], rarity['foil']))
+        slots[tuple(sorted(keys))] += 1
+    return sorted(slots.items())
+
+
+def get_rarities(keys: Iterable[RarityKey]) -> Dict[RarityKey, int]:
+    """Returns the ids of the given rarities, creating the missing ones.
+    """
+
+    rarities = {(r, foil): id_ for id_, r, foil in Rarity.objects.values_list('id', 'rarity', 'foil')}
+    missing = set(keys) - set(rarities)
+    if missing:
+        created = Rarity.objects.bulk_create(Rarity(rarity=r, foil=foil) for r, foil in missing)
+        rarities.update({(rarity.rarity, rarity.foil): rarity.id for rarity in created})
+    return rarities
+
+
+@shared_task(soft_time_limit=60,
              autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
              default_retry_delay=3,
              retry_kwargs={'max_retries': 5},
-             name='Store booster',
+             name='Store boosters',
              ignore_result=True)
-def store_booster(set_dict: Dict) -> None:
-    """Fills boosters table from sets collection.
-    """
+def store_boosters(set_dicts: List[Dict]) -> None:
+    """Fills boosters table from sets collection (only `code` and `booster` keys are needed).
 
-    s = Set.objects.get(id=set_dict['code'])
-    booster = Booster.objects.get_or_create(set=s)[0]
-    booster_slots = []
+    Slots are built in memory, and stored with one transaction per set. Sets whose booster already has slots are
+    skipped.
+    """
 
-    single_slots = [s for s in set_dict['booster'] if isinstance(s, str)]
-    multi_slots = [s for s in set_dict['booster'] if isinstance(s, list)]
+    boosters = {set_dict['code']: build_booster_slots(set_dict['booster']) for set_dict in set_dicts}
+    rarities = get_rarities(key for slots in boosters.values() for rarity_keys, _ in slots for key in rarity_keys)
+    slot_rarities = Slot.rarities.through
 
-    for rarity, number in Counter(single_slots).items():
-        slot = Slot.objects.get_or_create(number=number, booster=booster)[0]
-        rarity = Rarity.objects.get_or_create(**parse_rarity(rarity))[0]
-        slot.rarities.add(rarity)
-        slot.save()
-        booster_slots.append(slot)
+    for set_id, slots in boosters.items():
+        with transaction.atomic():
+            booster = Booster.objects.get_or_create(set_id=set_id)[0]
+            if booster.slot_set.exists():
+                continue
 
-    for multi_slot in multi_slots:
-        slot = Slot.objects.get_or_create(number=1, booster=booster)[0]
-        for rarity in multi_slot:
-            rarity = Rarity.objects.get_or_create(**parse_rarity(rarity))[0]
-            slot.rarities.add(rarity)
-        slot.save()
-        booster_slots.append(slot)
+            # Primary keys of bulk created objects are set on PostgreSQL
+            created_slots = Slot.objects.bulk_create(Slot(booster=booster, number=number) for _, number in slots)
+            slot_rarities.objects.bulk_create(
+                slot_rarities(slot_id=slot.id, rarity_id=rarities[key])
+                for slot, (rarity_keys, _) in zip(created_slots, slots) for key in rarity_keys
+            )
 
 
 def parse_set(s: Dict) -> Dict:
@@ -162,7 +203,9 @@ def parse_set(s: Dict) -> Dict:
     d = datetime.strptime(formated_set.pop('release_date'), '%Y-%m-%d')
     formated_set['release_date'] = timezone.make_aware(d, timezone.get_current_timezone())
 
-    return formated_set
+    # Drops data that is not stored, such as cards or translations
+    set_fields = {field.name for field in Set._meta.get_fields()}
+    return {key: value for key, value in formated_set.items() if key in set_fields}
 
 
 @shared_task(soft_time_limit=5,
@@ -182,6 +225,7 @@ def harvest_sets() -> None:
     r = requests.get(MTG_URL_SETS)
     json_resp = r.json()
     sets = json_resp['sets']
+    new_boosters = []
 
     for set_dict in sets:
 
@@ -193,38 +237,56 @@ def harvest_sets() -> None:
 
         set_, created = Set.objects.get_or_create(id=set_id, defaults=parsed_set)
 
-        logger.info('Creating booster for set {}.'.format(set_dict['name']))
         if created and set_.has_booster:
-            store_booster.delay(set_dict)
+            new_boosters.append({'code': set_id, 'booster': set_dict['booster']})
 
+    if new_boosters:
+        logger.info('Creating boosters for {} sets.'.format(len(new_boosters)))
+        store_boosters.delay(new_boosters)
 
-@shared_task(soft_time_limit=5,
-             autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
-             default_retry_delay=3,
-             retry_kwargs={'max_retries': 5},
-             name='Store card',
-             ignore_result=True,)
-def store_card(card: Dict) -> None:
-    """Parse card and stores it in database.
+    refresh_printings.delay()
+
+
+@shared_task(name='Refresh printing summaries',
+             ignore_result=True)
+def refresh_printings() -> None:
+    """Rebuilds the printing summaries of every card name, e.g. once sets have been harvested.
     """
 
-    post_process_card(card)
+    refreshed = refresh_printing_summaries()
+    logger.info('Refreshed printing summaries of {} card names.'.format(refreshed))
+
+
+CARD_ATTRIBUTES = ('power', 'toughness', 'loyalty', 'mana_cost', 'cmc', 'text', 'flavor', 'border', 'multiverse_id',
+                   'image_url', 'original_text', 'original_type', 'number', 'source', 'timeshifted', 'hand', 'life',
+                   'starter', 'mkm_name')
+
+
+def parse_card(card: Dict) -> Dict:
+    """Parses the given card into Card fields.
+
+    Name and set are given by their id, and rarity as Rarity fields. Type line, types and colors are denormalized.
+    """
 
     c = {
         'id': card['id'],
-        'name': CardName.objects.get_or_create(name=card['name'])[0],
-        'rarity': Rarity.objects.get_or_create(**parse_rarity(card['rarity']))[0],
-        'set': Set.objects.get(id=card['set']),
-        'artist': card['artist'],
+        'name': card['name'],
+        'rarity': parse_rarity(card['rarity']),
+        'set': card['set'],
+        'artist': card.get('artist', ''),
         'layout': card['layout'],
     }
 
-    for attr in ['power', 'toughness', 'loyalty', 'mana_cost', 'cmc', 'text', 'flavor', 'border', 'multiverse_id',
-                 'image_url', 'original_text', 'original_type', 'number', 'source', 'timeshifted', 'hand', 'life',
-                 'starter', 'mkm_name']:
+    for attr in CARD_ATTRIBUTES:
         if attr in card:
             c[attr] = card[attr]
 
+    types = [t.lower() for t in card.get('types', [])]
+    c['type_line'] = card.get('type') or Card.build_type_line(
+        [t.lower() for t in card.get('supertypes', [])], types, [t.lower() for t in card.get('subtypes', [])])
+    c['types_mask'] = Type.to_mask(types)
+    c['colors_mask'] = Color.to_mask(Color.parse(color) for color in card.get('colors', []))
+
     if 'release_date' in card:
         d = None
         for f in ['%Y-%m-%d', '%Y-%m', '%Y']:
@@ -237,6 +299,26 @@ def store_card(card: Dict) -> None:
         if d:
             c['release_date'] = timezone.make_aware(d, timezone.get_current_timezone())
 
+    return c
+
+
+@shared_task(soft_time_limit=5,
+             autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
+             default_retry_delay=3,
+             retry_kwargs={'max_retries': 5},
+             name='Store card',
+             ignore_result=True,)
+def store_card(card: Dict) -> None:
+    """Parse card and stores it in database.
+    """
+
+    c = parse_card(card)
+    c['name'] = CardName.objects.get_or_create(name=card['name'])[0]
+    c['rarity'] = Rarity.objects.get_or_create(**c['rarity'])[0]
+    c['set'] = Set.objects.get(id=c['set'])
+    c['mkm_url'] = Card.build_mkm_url(card['name'], c['layout'], card.get('names', []), c.get('mkm_name', ''),
+                                      c['set'].mkm_name or c['set'].name)
+
     card_obj, created = Card.objects.get_or_create(id=c['id'], defaults=c)
 
     if not created:
@@ -252,10 +334,10 @@ def store_card(card: Dict) -> None:
         n = CardName.objects.get_or_create(name=name)[0]
         card_obj.names.add(n)
     for color in card.get('colors', []):
-        c = Color.objects.get_or_create(color_id=color[0].upper())[0]
+        c = Color.objects.get_or_create(color_id=Color.parse(color))[0]
         card_obj.colors.add(c)
     for color_identity in card.get('color_identity', []):
-        c = Color.objects.get_or_create(color_id=color_identity[0].upper())[0]
+        c = Color.objects.get_or_create(color_id=Color.parse(color_identity))[0]
         card_obj.colors_identity.add(c)
     for type_name in card.get('types', []):
         t = Type.objects.get_or_create(name=type_name.lower())[0]
@@ -268,13 +350,13 @@ def store_card(card: Dict) -> None:
         card_obj.super_types.add(t)
     for legality in card.get('legalities', []):
         f = Format.objects.get_or_create(name=legality['format'].lower())[0]
-        l = Legality(card=card_obj, format=f, legality=legality['legality'])
+        l = Legality(card=card_obj, format=f, legality=Legality.parse(legality['legality']))
         l.save()
 
     card_obj.save()
 
 
-@shared_task(soft_time_limit=5,
+@shared_task(soft_time_limit=60,
              autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
              default_retry_delay=3,
              retry_kwargs={'max_retries': 5},
@@ -283,24 +365,215 @@ def store_card(card: Dict) -> None:
              ignore_result=True)
 def harvest_cards(page: int=1) -> None:
     """Harvests card from MTG API, and stores them in database.
+
+    Pages are harvested one after the other, and the cards of a page are stored at once with store_cards, which also
+    refreshes their printing summaries.
     """
 
     logger.info('Starting to harvest cards.')
 
-    r = requests.get(MTG_URL_CARDS.format(page=page, page_size=100))
+    r = requests.get(MTG_URL_CARDS.format(page=page, page_size=100), stream=True)
     r.raise_for_status()
+    r.raw.decode_content = True
+
+    cards = []
+    for card in iter_cards(r.raw):
+        if not cards:
+            harvest_cards.delay(page + 1)
+        cards.append(card)
 
-    cards = r.json()['cards']
     if not cards:
         return
 
-    harvest_cards.delay(page + 1)
+    post_process_cards(cards)
+
+    created, missing_printings = store_cards(cards)
+    logger.info('Stored {} new cards out of {} from page {}.'.format(created, len(cards), page))
+    if missing_printings:
+        logger.warning('{} printings reference sets which are not harvested yet.'.format(len(missing_printings)))
+
+
+def fetch_restrictions(format_id: str) -> Dict[str, str]:
+    """Returns the names of the cards banned or restricted in the given format according to the MTG API, with their
+    legality.
+    """
+
+    restrictions = {}
+    for legality in ('Banned', 'Restricted'):
+        for page in count(1):
+            r = requests.get(MTG_URL_LEGALITIES.format(format=format_id.capitalize(), legality=legality, page=page,
+                                                       page_size=MTG_PAGE_SIZE), stream=True)
+            r.raise_for_status()
+            r.raw.decode_content = True
+
+            cards = list(iter_cards(r.raw))
+            restrictions.update((card['name'], Legality.parse(legality)) for card in cards)
+            if len(cards) < MTG_PAGE_SIZE:
+                break
+
+    return restrictions
+
+
+def fetch_legalities(format_id: str, names: Iterable[str]) -> Dict[str, str]:
+    """Returns the current legality in the given format of the given card names according to the MTG API, which is
+    NOT_LEGAL for cards which are not part of the format (e.g. rotated out of standard).
+
+    Card names unknown by the MTG API are missing from the result.
+    """
+
+    legalities = {}
+    for name in names:
+        r = requests.get(MTG_URL_CARD_NAME.format(name=quote('"{}"'.format(name)), page_size=MTG_PAGE_SIZE),
+                         stream=True)
+        r.raise_for_status()
+        r.raw.decode_content = True
+
+        for card in iter_cards(r.raw):
+            if card['name'] == name:
+                legalities[name] = next((Legality.parse(legality['legality']) for legality in card.get('legalities', [])
+                                         if legality['format'].lower() == format_id), NOT_LEGAL)
+                break
+
+    return legalities
+
+
+@shared_task(soft_time_limit=60,
+             autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
+             default_retry_delay=3,
+             retry_kwargs={'max_retries': 5},
+             name='Refresh legalities',
+             ignore_result=True)
+def refresh_format_legalities(format_id: str) -> None:
+    """Applies the banned and restricted lists of the given format from the MTG API to the stored legalities, the
+    legality of cards which dropped off the lists being confirmed by the MTG API.
+    """
+
+    changes = refresh_legalities(format_id, fetch_restrictions(format_id),
+                                 lambda names: fetch_legalities(format_id, names))
+    for name, (previous, legality) in sorted(changes.items()):
+        logger.info('{} is now {} in {} (was {}).'.format(name, legality, format_id, previous))
+
+    emit_market_events(record_legality_changes(format_id, changes))
+
+
+@shared_task(name='Refresh all legalities',
+             ignore_result=True)
+def refresh_all_legalities() -> None:
+    """Refreshes the legalities of every constructed format, e.g. every few minutes around ban announcements.
+    """
+
+    for format_id, _ in Format.FORMATS:
+        refresh_format_legalities.delay(format_id)
+
+
+def bulk_get_or_create(model, field: str, values: Iterable[str]) -> None:
+    """Creates the objects of the given model whose key field does not match any of the given values.
+    """
+
+    values = set(values)
+    existing = set(model.objects.filter(**{field + '__in': values}).values_list(field, flat=True))
+    model.objects.bulk_create(model(**{field: value}) for value in values - existing)
 
-    for card in cards:
-        logger.info('Storing card {}...'.format(card['name']))
-        formated_card = {}
-        for key, value in card.items():
-            formated_card[to_snake_case(key)] = value
-        store_card.delay(formated_card)
 
-        logger.info('Trying to query page {}'.format(page))
+def store_printings(printings: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Stores the given (card id, set id) printings, and returns the ones whose set does not exist yet.
+    """
+
+    printings = list(printings)
+    set_ids = set(Set.objects.filter(id__in={set_id for _, set_id in printings}).values_list('id', flat=True))
+
+    Card.printings.through.objects.bulk_create(
+        Card.printings.through(card_id=card_id, set_id=set_id)
+        for card_id, set_id in printings if set_id in set_ids
+    )
+    return [(card_id, set_id) for card_id, set_id in printings if set_id not in set_ids]
+
+
+def store_cards(cards: List[Dict]) -> Tuple[int, List[Tuple[str, str]]]:
+    """Parses cards and stores them in database with bulk writes, as store_card does for a single card.
+
+    Cards that already exist are skipped. Returns the number of created cards, and the printings that could not be
+    stored because their set does not exist yet (see store_printings).
+    """
+
+    with transaction.atomic():
+        existing_ids = set(Card.objects.filter(id__in=[c['id'] for c in cards]).values_list('id', flat=True))
+        cards = list({c['id']: c for c in cards if c['id'] not in existing_ids}.values())
+        if not cards:
+            return 0, []
+
+        bulk_get_or_create(CardName, 'name', [c['name'] for c in cards] +
+                           [name for c in cards for name in c.get('names', [])])
+        bulk_get_or_create(Color, 'color_id', [Color.parse(color) for c in cards
+                                               for color in c.get('colors', []) + c.get('color_identity', [])])
+        bulk_get_or_create(Type, 'name', [t.lower() for c in cards for t in c.get('types', [])])
+        bulk_get_or_create(SubType, 'name', [t.lower() for c in cards for t in c.get('subtypes', [])])
+        bulk_get_or_create(SuperType, 'name', [t.lower() for c in cards for t in c.get('supertypes', [])])
+        bulk_get_or_create(Format, 'name', [l['format'].lower() for c in cards for l in c.get('legalities', [])])
+        rarities = {(r.rarity, r.foil): r for r in Rarity.objects.all()}
+        set_names = {set_id: mkm_name or name for set_id, mkm_name, name in Set.objects.filter(
+            id__in={c['set'] for c in cards}).values_list('id', 'mkm_name', 'name')}
+
+        card_objs = []
+        for card in cards:
+            c = parse_card(card)
+            rarity = c.pop('rarity')
+            if (rarity['rarity'], rarity['foil']) not in rarities:
+                rarities[(rarity['rarity'], rarity['foil'])] = Rarity.objects.create(**rarity)
+            c['rarity'] = rarities[(rarity['rarity'], rarity['foil'])]
+            c['mkm_url'] = Card.build_mkm_url(c['name'], c['layout'], card.get('names', []), c.get('mkm_name', ''),
+                                              set_names.get(c['set'], ''))
+            c['name_id'] = c.pop('name')
+            c['set_id'] = c.pop('set')
+            card_objs.append(Card(**c))
+        Card.objects.bulk_create(card_objs)
+
+        relations = (
+            (Card.names.through, 'cardname_id', lambda c: c.get('names', [])),
+            (Card.colors.through, 'color_id', lambda c: {Color.parse(color) for color in c.get('colors', [])}),
+            (Card.colors_identity.through, 'color_id',
+             lambda c: {Color.parse(color) for color in c.get('color_identity', [])}),
+            (Card.types.through, 'type_id', lambda c: {t.lower() for t in c.get('types', [])}),
+            (Card.sub_types.through, 'subtype_id', lambda c: {t.lower() for t in c.get('subtypes', [])}),
+            (Card.super_types.through, 'supertype_id', lambda c: {t.lower() for t in c.get('supertypes', [])}),
+        )
+        for through, field, get_values in relations:
+            through.objects.bulk_create(
+                through(card_id=card['id'], **{field: value}) for card in cards for value in get_values(card)
+            )
+
+        Legality.objects.bulk_create(
+            Legality(card_id=card['id'], format_id=legality['format'].lower(),
+                     legality=Legality.parse(legality['legality']))
+            for card in cards for legality in card.get('legalities', [])
+        )
+
+        missing_printings = store_printings(
+            (card['id'], set_id) for card in cards for set_id in card.get('printings', [])
+        )
+
+        refresh_printing_summaries({card['name'] for card in cards})
+
+    return len(cards), missing_printings
+
+
+def iter_mtgjson_sets(f: BinaryIO) -> Iterator[Dict]:
+    """Parses the given MTGJSON AllSets file, yielding sets (with their cards) one at a time.
+    """
+
+    builder, depth = None, 0
+
+    for prefix, event, value in ijson.parse(f):
+        if builder is None:
+            if prefix == '' and event == 'map_key':
+                builder = ObjectBuilder()
+            continue
+
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+        if depth == 0:
+            yield builder.value
+            builder = None
@@ -0,0 +1,62 @@
+import json
+
+
+card = {
+    'name': 'Archangel Avacyn',
+    'names': ['Archangel Avacyn', 'Avacyn, the Purifier'],
+    'manaCost': '{3}{W}{W}',
+    'cmc': 5,
+    'colors': ['White'],
+    'colorIdentity': ['W', 'R'],
+    'type': 'Legendary Creature — Angel',
+    'supertypes': ['Legendary'],
+    'types': ['Creature'],
+    'subtypes': ['Angel'],
+    'rarity': 'Mythic Rare',
+    'set': 'SOI',
+    'setName': 'Shadows over Innistrad',
+    'text': 'Flash\nFlying, vigilance\nWhen Archangel Avacyn enters the battlefield, creatures you control gain '
+            'indestructible until end of turn.\nWhen a non-Angel creature you control dies, transform Archangel '
+            'Avacyn at the beginning of the next upkeep.',
+    'artist': 'James Ryman',
+    'number': '5a',
+    'power': '4',
+    'toughness': '4',
+    'layout': 'double-faced',
+    'multiverseid': 409741,
+    'imageUrl': 'http://gatherer.wizards.com/Handlers/Image.ashx?multiverseid=409741&type=card',
+    'rulings': [
+        {'date': '2016-04-08', 'text': 'Archangel Avacyn’s delayed triggered ability triggers at the beginning of '
+                                       'the next upkeep regardless of whose turn it is.'},
+        {'date': '2016-04-08', 'text': 'Archangel Avacyn’s delayed triggered ability won’t cause it to transform '
+                                       'back into Archangel Avacyn if it has already transformed.'},
+    ],
+    'foreignNames': [
+        {'name': 'Erzengel Avacyn', 'language': 'German', 'multiverseid': 410071},
+        {'name': 'Arcángel Avacyn', 'language': 'Spanish', 'multiverseid': 410401},
+        {'name': 'Archange Avacyn', 'language': 'French', 'multiverseid': 410731},
+        {'name': 'Arcangelo Avacyn', 'language': 'Italian', 'multiverseid': 411061},
+    ],
+    'printings': ['SOI'],
+    'originalText': 'Flash\nFlying, vigilance',
+    'originalType': 'Legendary Creature — Angel',
+    'legalities': [
+        {'format': 'Commander', 'legality': 'Legal'},
+        {'format': 'Legacy', 'legality': 'Legal'},
+        {'format': 'Modern', 'legality': 'Legal'},
+        {'format': 'Shadows over Innistrad Block', 'legality': 'Legal'},
+        {'format': 'Vintage', 'legality': 'Legal'},
+    ],
+    'id': '02ea5ddc89d7847abc77a0fbcbf2bc74e6456559',
+}
+
+
+def cards_page(size: int=100) -> bytes:
+    """Returns a page of the MTG API cards endpoint, with the given number of cards shaped like `card`.
+    """
+
+    cards = []
+    for i in range(size):
+        page_card = dict(card, id='{:040x}'.format(i), name='{} {}'.format(card['name'], i), cmc=i % 8 + 0.5 * (i % 2))
+        cards.append(page_card)
+    return json.dumps({'cards': cards}).encode()
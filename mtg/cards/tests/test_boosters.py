@@ -0,0 +1,28 @@
+from ..tasks import build_booster_slots
+
+
+def test_build_booster_slots():
+    """Asserts that identical slots are merged, and that slots with alternative rarities are kept apart.
+    """
+
+    booster = ['rare', 'uncommon', 'uncommon', 'common', 'common', 'common', ['rare', 'mythic rare'],
+               ['foil common', 'foil uncommon'], ['foil uncommon', 'foil common']]
+
+    assert build_booster_slots(booster) == [
+        ((('C', False),), 3),
+        ((('C', True), ('U', True)), 2),
+        ((('M', False), ('R', False)), 1),
+        ((('R', False),), 1),
+        ((('U', False),), 2),
+    ]
+
+
+def test_build_booster_slots_converted_rarities():
+    """Asserts that booster rarities converted to the same card rarity share a slot.
+    """
+
+    assert build_booster_slots(['power nine', 'rare', 'land', 'marketing']) == [
+        ((('B', False),), 1),
+        ((('R', False),), 2),
+        ((('S', False),), 1),
+    ]
@@ -0,0 +1,42 @@
+from ..models import Card, Color, Type
+
+
+def test_color_parse():
+    """Asserts that colors are parsed from their names or ids (blue and black both start with a B).
+    """
+
+    assert [Color.parse(c) for c in ('Blue', 'Black', 'U', 'b')] == ['U', 'B', 'U', 'B']
+
+
+def test_masks():
+    """Asserts that colors and types are converted to masks and back.
+    """
+
+    colors_mask = Color.to_mask(['R', 'W', 'R'])
+    types_mask = Type.to_mask(['creature', 'artifact', 'conspiracy'])
+
+    assert Color.from_mask(colors_mask) == ['W', 'R']
+    assert Type.from_mask(types_mask) == ['creature', 'artifact']
+    assert Color.from_mask(0) == Type.from_mask(0) == []
+
+
+def test_build_type_line():
+    """Asserts that type lines are built with supertypes first, types in the printed order, and subtypes.
+    """
+
+    assert Card.build_type_line(['legendary'], ['creature', 'enchantment'], ['god']) == \
+        'Legendary Enchantment Creature — God'
+    assert Card.build_type_line([], ['instant'], []) == 'Instant'
+
+
+def test_build_mkm_url():
+    """Asserts that magiccardmarket.eu urls are built from the mkm name, the names of split cards, or the card name.
+    """
+
+    base = 'http://www.magiccardmarket.eu/Products/Singles/'
+    assert Card.build_mkm_url('Aether Vial', 'normal', [], 'Æther Vial', 'Darksteel') == \
+        base + 'Darksteel/%C3%86ther+Vial'
+    assert Card.build_mkm_url('Dusk', 'split', ['Dusk', 'Dawn'], '', 'Amonkhet') == base + 'Amonkhet/Dawn+%2F%2F+Dusk'
+    assert Card.build_mkm_url('Delver of Secrets', 'double-faced', ['Insectile Aberration', 'Delver of Secrets'],
+                              '', 'Innistrad') == base + 'Innistrad/Delver+of+Secrets+%2F+Insectile+Aberration'
+    assert Card.build_mkm_url('Thoughtseize', 'normal', [], '', 'Theros') == base + 'Theros/Thoughtseize'
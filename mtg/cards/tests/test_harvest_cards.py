@@ -0,0 +1,51 @@
+from io import BytesIO
+import json
+
+from ..tasks import iter_cards, iter_mtgjson_sets
+from .mtg_api_fixtures import cards_page
+
+
+def test_iter_cards():
+    """Asserts that streamed cards are formatted like cards of a fully loaded page.
+    """
+
+    page = cards_page()
+
+    cards = list(iter_cards(BytesIO(page)))
+
+    assert len(cards) == 100
+    assert cards == [
+        {
+            'name': c['name'], 'names': c['names'], 'mana_cost': c['manaCost'], 'cmc': c['cmc'],
+            'colors': c['colors'], 'color_identity': c['colorIdentity'], 'type': c['type'],
+            'supertypes': c['supertypes'], 'types': c['types'], 'subtypes': c['subtypes'], 'rarity': c['rarity'],
+            'set': c['set'], 'set_name': c['setName'], 'text': c['text'], 'artist': c['artist'],
+            'number': c['number'], 'power': c['power'], 'toughness': c['toughness'], 'layout': c['layout'],
+            'multiverseid': c['multiverseid'], 'image_url': c['imageUrl'], 'rulings': c['rulings'],
+            'foreign_names': c['foreignNames'], 'printings': c['printings'], 'original_text': c['originalText'],
+            'original_type': c['originalType'], 'legalities': c['legalities'], 'id': c['id'],
+        }
+        for c in json.loads(page.decode())['cards']
+    ]
+
+
+def test_iter_cards_empty_page():
+    """Asserts that an empty page yields no card.
+    """
+
+    assert list(iter_cards(BytesIO(b'{"cards": []}'))) == []
+
+
+def test_iter_mtgjson_sets():
+    """Asserts that sets of a MTGJSON AllSets file are parsed one at a time, with their cards.
+    """
+
+    all_sets = {
+        'LEA': {'name': 'Limited Edition Alpha', 'code': 'LEA', 'booster': ['rare', ['uncommon', 'common']],
+                'cards': [{'id': 'a', 'name': 'Black Lotus', 'cmc': 0}]},
+        'LEB': {'name': 'Limited Edition Beta', 'code': 'LEB', 'cards': []},
+    }
+
+    sets = list(iter_mtgjson_sets(BytesIO(json.dumps(all_sets).encode())))
+
+    assert sorted(sets, key=lambda s: s['code']) == [all_sets['LEA'], all_sets['LEB']]
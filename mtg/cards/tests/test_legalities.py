@@ -0,0 +1,27 @@
+from ..legalities import diff_legalities
+
+
+def test_diff_legalities():
+    """Asserts that newly banned, restricted and unbanned card names are found, and that unchanged ones are skipped.
+    """
+
+    stored = {'Splinter Twin': 'banned', 'Bloodbraid Elf': 'banned', 'Lodestone Golem': 'banned'}
+    upstream = {'Splinter Twin': 'banned', 'Lodestone Golem': 'restricted', 'Gitaxian Probe': 'banned'}
+
+    assert diff_legalities(stored, upstream, {'Bloodbraid Elf': 'legal'}) == {
+        'Bloodbraid Elf': 'legal', 'Lodestone Golem': 'restricted', 'Gitaxian Probe': 'banned'
+    }
+    assert diff_legalities(stored, stored) == {}
+
+
+def test_diff_legalities_dropped():
+    """Asserts that card names which dropped off the lists only change to their confirmed legality.
+    """
+
+    stored = {'Smuggler\'s Copter': 'banned', 'Aetherworks Marvel': 'banned', 'Emrakul, the Promised End': 'banned'}
+    upstream = {}
+    confirmed = {'Smuggler\'s Copter': 'not_legal', 'Aetherworks Marvel': 'legal'}
+
+    assert diff_legalities(stored, upstream, confirmed) == {
+        'Smuggler\'s Copter': 'not_legal', 'Aetherworks Marvel': 'legal'
+    }
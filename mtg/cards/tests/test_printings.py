@@ -0,0 +1,25 @@
+from datetime import date
+
+from ..printings import summarize_printings
+
+
+def test_summarize_printings():
+    """Asserts that the rotation date follows the last standard release, and that reprints are counted.
+    """
+
+    summary = summarize_printings((3, date(2010, 10, 1), date(2017, 3, 17), date(2015, 10, 2)))
+
+    assert summary['rotation_date'] == date(2017, 4, 29)
+    assert summary['reprints'] == 2
+    assert summary['last_reprint'] == date(2017, 3, 17)
+
+
+def test_summarize_printings_without_reprint():
+    """Asserts that a card printed once outside of standard has no rotation date nor reprint.
+    """
+
+    summary = summarize_printings((1, date(2016, 8, 26), date(2016, 8, 26), None))
+
+    assert summary['rotation_date'] is None
+    assert summary['reprints'] == 0
+    assert summary['last_reprint'] is None
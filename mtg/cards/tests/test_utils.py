@@ -0,0 +1,17 @@
+import pytest
+
+from ..utils import normalize_card_name
+
+
+@pytest.mark.parametrize('name,expected', [
+    ('Aether Vial', 'aether vial'),
+    ('Æther Vial', 'aether vial'),
+    ('Ghirapur Æther Grid', 'ghirapur aether grid'),
+    ('Lim-Dûl\'s Vault', 'lim-dul\'s vault'),
+    ('  Jötun   Grunt ', 'jotun grunt'),
+])
+def test_normalize_card_name(name, expected):
+    """Asserts that card names are normalized regardless of case, accents and ligatures.
+    """
+
+    assert normalize_card_name(name) == expected
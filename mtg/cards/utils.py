@@ -0,0 +1,199 @@
+"""
+@author: Thomas PERROT
+
+Contains some utils for cards app
+"""
+
+
+from typing import Dict, Iterable, List, Tuple
+import time
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Case, CharField, F, QuerySet, Value, When
+
+from .models import Card, CardName, Color, Type, MkmNameOverride
+
+
+# Some ligatures are not decomposed by unicode normalization (e.g. 'Æther Vial').
+LIGATURES = str.maketrans({'æ': 'ae', 'œ': 'oe'})
+
+# Maps normalized card names to stored card names. Lazily built, and rebuilt when a name can not be found
+# (at most once every NORMALIZED_NAMES_TTL seconds, since unknown names such as tokens are common).
+NORMALIZED_NAMES_TTL = 600
+_normalized_names = {}
+_normalized_names_built_at = 0.
+
+# Maps (name, set code, number) to magiccardmarket.eu names, with empty set code or number for overrides that
+# apply to every set or number. Lazily built, and rebuilt every MKM_NAME_OVERRIDES_TTL seconds so that overrides
+# edited in the admin apply to every worker.
+MKM_NAME_OVERRIDES_TTL = 600
+_mkm_name_overrides = {}
+_mkm_name_overrides_built_at = 0.
+
+# Number of cards loaded at once when refreshing denormalized columns.
+REFRESH_CHUNK_SIZE = 1000
+# Denormalized columns stored by refresh_card_columns.
+REFRESHED_COLUMNS = ('type_line', 'types_mask', 'colors_mask')
+
+
+def normalize_card_name(name: str) -> str:
+    """Returns a case and accent insensitive version of the given card name.
+
+    e.g. `Æther Vial` and `aether vial` are both normalized to `aether vial`.
+    """
+
+    name = unicodedata.normalize('NFKD', name.lower().translate(LIGATURES))
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(name.split())
+
+
+def get_normalized_names(refresh: bool=False) -> Dict[str, str]:
+    """Returns the index mapping normalized card names to stored card names.
+    """
+
+    global _normalized_names_built_at
+
+    is_stale = time.monotonic() - _normalized_names_built_at > NORMALIZED_NAMES_TTL
+    if not _normalized_names or (refresh and is_stale):
+        _normalized_names_built_at = time.monotonic()
+        _normalized_names.clear()
+        for name in CardName.objects.values_list('name', flat=True):
+            _normalized_names.setdefault(normalize_card_name(name), name)
+    return _normalized_names
+
+
+def resolve_card_names(names: Iterable[str]) -> Dict[str, str]:
+    """Resolves the given card names to stored card names (i.e. CardName primary keys).
+
+    Exact matches are found with a single query. Remaining names are looked up in a case and accent insensitive
+    index, which is rebuilt if it is stale. Names that can not be resolved are missing from the result.
+    """
+
+    names = set(names)
+    resolved = {name: name for name in CardName.objects.filter(name__in=names).values_list('name', flat=True)}
+
+    missing = names - set(resolved)
+    for refresh in (False, True):
+        if not missing:
+            break
+        normalized_names = get_normalized_names(refresh=refresh)
+        for name in list(missing):
+            stored_name = normalized_names.get(normalize_card_name(name))
+            if stored_name:
+                resolved[name] = stored_name
+                missing.remove(name)
+
+    return resolved
+
+
+def get_mkm_name_overrides(refresh: bool=False) -> Dict[Tuple[str, str, str], str]:
+    """Returns the index of magiccardmarket.eu name overrides.
+    """
+
+    global _mkm_name_overrides_built_at
+
+    if refresh or time.monotonic() - _mkm_name_overrides_built_at > MKM_NAME_OVERRIDES_TTL:
+        _mkm_name_overrides_built_at = time.monotonic()
+        _mkm_name_overrides.clear()
+        for name, set_code, number, mkm_name in MkmNameOverride.objects.values_list(
+                'name', 'set_code', 'number', 'mkm_name'):
+            _mkm_name_overrides[(name, set_code, number)] = mkm_name
+    return _mkm_name_overrides
+
+
+def apply_mkm_name_overrides(cards: List[Dict]) -> None:
+    """Sets the magiccardmarket.eu name of the given cards (with `name`, `set` and `number` keys) which have an
+    override, from the most specific override to the most generic one.
+    """
+
+    overrides = get_mkm_name_overrides()
+    if not overrides:
+        return
+
+    for card in cards:
+        name, set_code, number = card['name'], card.get('set', ''), str(card.get('number', ''))
+        for key in ((name, set_code, number), (name, set_code, ''), (name, '', number), (name, '', '')):
+            if key in overrides:
+                card['mkm_name'] = overrides[key]
+                break
+
+
+def refresh_mkm_urls(cards: QuerySet) -> int:
+    """Recomputes the magiccardmarket.eu url of the given cards, and stores the ones that changed with a single UPDATE
+    per chunk of cards.
+
+    Returns the number of updated cards.
+    """
+
+    updated = 0
+    cards = cards.select_related('set').prefetch_related('names').order_by('id')
+
+    with transaction.atomic():
+        for start in range(0, cards.count(), REFRESH_CHUNK_SIZE):
+            mkm_urls = {}
+            for card in cards[start:start + REFRESH_CHUNK_SIZE]:
+                mkm_url = card.get_mkm_url()
+                if mkm_url != card.mkm_url:
+                    mkm_urls[card.id] = mkm_url
+
+            if mkm_urls:
+                updated += Card.objects.filter(id__in=list(mkm_urls)).update(mkm_url=Case(
+                    *[When(id=card_id, then=Value(mkm_url)) for card_id, mkm_url in mkm_urls.items()],
+                    output_field=CharField()
+                ))
+
+    return updated
+
+
+def filter_cards(cards: QuerySet, colors: Iterable[str]=(), types: Iterable[str]=()) -> QuerySet:
+    """Filters the given cards on their colors ids and type names with their masks, without joins.
+
+    Cards must have all the given colors and types, e.g. `filter_cards(cards, ['R'], ['creature'])` gives red
+    creatures (including multicolored ones).
+    """
+
+    colors_mask = Color.to_mask(colors)
+    if colors_mask:
+        cards = cards.annotate(colors_match=F('colors_mask').bitand(colors_mask)).filter(colors_match=colors_mask)
+
+    types_mask = Type.to_mask(types)
+    if types_mask:
+        cards = cards.annotate(types_match=F('types_mask').bitand(types_mask)).filter(types_match=types_mask)
+
+    return cards
+
+
+def refresh_card_columns(cards: QuerySet) -> int:
+    """Recomputes the type and color masks of the given cards from their types and colors, and their type line when it
+    is missing, and stores the ones that changed with a single UPDATE per chunk of cards.
+
+    Returns the number of updated cards.
+    """
+
+    updated = 0
+    cards = cards.prefetch_related('super_types', 'types', 'sub_types', 'colors').order_by('id')
+
+    with transaction.atomic():
+        for start in range(0, cards.count(), REFRESH_CHUNK_SIZE):
+            changed = {}
+            for card in cards[start:start + REFRESH_CHUNK_SIZE]:
+                types = [t.name for t in card.types.all()]
+                columns = {
+                    'type_line': card.type_line or Card.build_type_line(
+                        [t.name for t in card.super_types.all()], types, [t.name for t in card.sub_types.all()]),
+                    'types_mask': Type.to_mask(types),
+                    'colors_mask': Color.to_mask(c.color_id for c in card.colors.all()),
+                }
+                if any(getattr(card, column) != value for column, value in columns.items()):
+                    changed[card.id] = columns
+
+            if changed:
+                updated += Card.objects.filter(id__in=list(changed)).update(**{
+                    column: Case(*[When(id=card_id, then=Value(card_columns[column]))
+                                   for card_id, card_columns in changed.items()],
+                                 output_field=Card._meta.get_field(column))
+                    for column in REFRESHED_COLUMNS
+                })
+
+    return updated
@@ -13,29 +13,67 @@ from rest_framework import viewsets
 from rest_framework.decorators import list_route, detail_route
 from rest_framework.response import Response
 
+from . import legalities
+from . import search
 from . import serializers
 from . import tasks
+from . import utils
 from .models import CardName, Card
 import stats
 import tournaments
 
 
+AUTOCOMPLETE_SIZE = 10
+
+
 class CardNameViewSet(viewsets.ReadOnlyModelViewSet):
     """View for card names.
+
+    Names can be searched with `?search=`, by similarity or substring, from the most to the least similar.
     """
 
     queryset = CardName.objects.order_by('name')
     serializer_class = serializers.CardNameSerializer
-    search_fields = ('name',)
+
+    def get_queryset(self):
+        query = self.request.query_params.get('search')
+        if query:
+            return search.search_card_names(query)
+        return super().get_queryset()
+
+    @list_route()
+    def autocomplete(self, request) -> Response:
+        """Returns the first card names starting with `?q=`.
+        """
+
+        names = search.autocomplete_card_names(request.query_params.get('q', ''))
+        return Response(list(names.values_list('name', flat=True)[:AUTOCOMPLETE_SIZE]))
 
 
 class CardViewSet(viewsets.ReadOnlyModelViewSet):
     """View for cards.
+
+    Cards can be searched with `?search=` on their name, type line and text, from the most to the least relevant.
+    They can be filtered with `?colors=R,G`, `?types=creature`, `?cmc_lte=2` and `?legal_in=modern`.
     """
 
     queryset = Card.objects.order_by('name')
     serializer_class = serializers.CardSerializer
-    search_fields = ('name', 'set')
+
+    def get_queryset(self):
+        params = self.request.query_params
+
+        query = params.get('search')
+        cards = search.search_cards(query) if query else super().get_queryset()
+
+        cards = utils.filter_cards(cards, colors=[c for c in params.get('colors', '').upper().split(',') if c],
+                                   types=[t for t in params.get('types', '').lower().split(',') if t])
+        if params.get('cmc_lte', '').isdigit():
+            cards = cards.filter(cmc__lte=int(params['cmc_lte']))
+        if params.get('legal_in'):
+            cards = legalities.filter_legal_cards(cards, params['legal_in'].lower())
+
+        return cards
 
     @list_route()
     def get_failed_mkm(self, request) -> Response:
@@ -109,6 +147,28 @@ class CardViewSet(viewsets.ReadOnlyModelViewSet):
 
         return Response(features.features)
 
+    @detail_route()
+    def get_cooccurrences(self, request, pk=None) -> Response:
+        """Returns the cards most often played in the same decks as the given card.
+        """
+
+        card = get_object_or_404(Card, id=pk)
+        cooccurrences = card.name.cooccurrences.order_by('-score', 'other')
+
+        serializer = tournaments.serializers.CardCooccurrenceSerializer(cooccurrences, many=True)
+        return Response(serializer.data)
+
+    @detail_route()
+    def get_price_correlations(self, request, pk=None) -> Response:
+        """Returns the cards whose price moved the most like the price of the given card over last month.
+        """
+
+        card = get_object_or_404(Card, id=pk)
+        correlations = card.price_correlations.select_related('other__set').order_by('-correlation', 'other')
+
+        serializer = stats.serializers.PriceCorrelationSerializer(correlations, many=True)
+        return Response(serializer.data)
+
 
 def harvest_sets(request):
     """Temporary view to harvest all sets.
@@ -55,6 +55,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 MIDDLEWARE = [
@@ -124,6 +125,13 @@ USE_L10N = True
 USE_TZ = True
 
 
+# Columnar price store (see stats.store)
+PRICE_STORE_DIR = os.path.join(BASE_DIR, 'data', 'prices')
+
+# Card co-occurrence counts (see tournaments.cooccurrences)
+COOCCURRENCE_PATH = os.path.join(BASE_DIR, 'data', 'cooccurrences.npz')
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/1.10/howto/static-files/
 
@@ -140,11 +148,16 @@ CELERY_RABBIT_HOSTNAME = 'rabbit'
 CELERY_BROKER_POOL_LIMIT = 1
 CELERY_BROKER_CONNECTION_TIMEOUT = 10
 
-# configure queues, currently we have only one
-CELERY_DEFAULT_QUEUE = 'default'
-CELERY_QUEUES = (
+# configure queues: market events (see stats.events) have their own queue, so that they are not delayed by crawls.
+# Workers consume a single queue (see docker/resources/bin/run_celery.sh and run_celery_events.sh).
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_QUEUES = (
     Queue('default', Exchange('default'), routing_key='default'),
+    Queue('events', Exchange('events'), routing_key='events'),
 )
+CELERY_TASK_ROUTES = {
+    'Dispatch market events': {'queue': 'events', 'routing_key': 'events'},
+}
 
 # Sensible settings for celery
 CELERY_ALWAYS_EAGER = False
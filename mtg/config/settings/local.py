@@ -34,6 +34,9 @@ INSTALLED_APPS += [
     # 'django_extensions'
 ]
 
+# Watch notifications (see stats.watches) are printed by the worker instead of being sent
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_METHODS = ('GET',)
 
@@ -8,7 +8,7 @@ Contains admin settings for stats app
 from django.contrib import admin
 from django.utils.translation import ugettext_lazy as _
 
-from .models import Price, Statistics, Features
+from .models import Price, Statistics, Features, BoosterValue, PriceCorrelation, MarketEvent, Watch
 
 
 class PriceInline(admin.TabularInline):
@@ -60,3 +60,31 @@ class StatisticsAdmin(admin.ModelAdmin):
 class FeaturesAdmin(admin.ModelAdmin):
     exclude = ('card',)
     search_fields = ('date',)
+
+
+@admin.register(BoosterValue)
+class BoosterValueAdmin(admin.ModelAdmin):
+    list_display = ('set', 'date', 'expected_value')
+    search_fields = ('set__name', 'date')
+
+
+@admin.register(PriceCorrelation)
+class PriceCorrelationAdmin(admin.ModelAdmin):
+    list_display = ('card', 'other', 'date', 'correlation')
+    search_fields = ('card__name__name',)
+
+
+@admin.register(MarketEvent)
+class MarketEventAdmin(admin.ModelAdmin):
+    list_display = ('card_name', 'kind', 'date', 'created', 'dispatched')
+    list_filter = ('kind',)
+    search_fields = ('card_name__name',)
+    raw_id_fields = ('card_name', 'card')
+
+
+@admin.register(Watch)
+class WatchAdmin(admin.ModelAdmin):
+    list_display = ('user', 'card', 'metric', 'operator', 'threshold', 'is_active', 'triggered', 'last_triggered')
+    list_filter = ('metric', 'is_active', 'triggered')
+    search_fields = ('user__username', 'card__name__name')
+    raw_id_fields = ('card',)
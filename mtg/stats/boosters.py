@@ -0,0 +1,170 @@
+"""
+@author: Thomas PERROT
+
+Contains the booster value engine for stats app.
+
+The cards a slot can hold are gathered into one price array per rarity pool, so that the expected value of a booster
+is a few dot products, and that millions of boosters can be simulated with vectorized draws.
+"""
+
+
+from typing import Dict, List, Optional, Tuple
+from datetime import date
+
+import numpy as np
+from django.db import IntegrityError, transaction
+
+from .models import Price, BoosterValue
+from cards.models import Card
+from sets.models import Set, Slot
+
+
+# (rarity, foil) pairs, as used by Rarity.
+RarityKey = Tuple[str, bool]
+# Slots of a booster, as their rarities and their number of cards (see cards.tasks.build_booster_slots).
+Slots = List[Tuple[Tuple[RarityKey, ...], int]]
+Pools = Dict[RarityKey, np.ndarray]
+
+# Relative number of copies of each card on a print sheet, used to weigh the rarities of a slot which can hold
+# several rarities. e.g. a mythic rare is half as frequent as a given rare, so that a set with 53 rares and 15 mythic
+# rares has a mythic rare in ~1 rare slot out of 8.
+SHEET_COPIES = {'C': 10, 'U': 3, 'R': 2, 'M': 1, 'S': 1, 'B': 1}
+
+SIMULATED_BOOSTERS = 1000000
+# Number of boosters simulated at once, to bound the memory used by the draws.
+SIMULATION_BATCH_SIZE = 100000
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def get_slots(set_id: str) -> Slots:
+    """Returns the slots of the booster of the given set.
+    """
+
+    slots = Slot.objects.filter(booster__set_id=set_id).prefetch_related('rarities').order_by('id')
+    return [(tuple(sorted((r.rarity, r.foil) for r in slot.rarities.all())), slot.number) for slot in slots]
+
+
+def get_pools(set_id: str) -> Tuple[Pools, int]:
+    """Returns the latest prices of the cards of the given set, in one array per rarity pool, and the number of cards
+    with a price.
+
+    Non foil cards are valued at their mean price (or their minimum price if unknown), and foil cards at their minimum
+    foil price. Cards without price are counted as worthless.
+    """
+
+    latest_prices = Price.objects.filter(card__set_id=set_id).order_by('card_id', '-date').distinct('card_id')
+    prices = {card_id: (mean_price or min_price or 0., min_foil or 0.)
+              for card_id, mean_price, min_price, min_foil in latest_prices.values_list(
+                  'card_id', 'mean_price', 'min_price', 'min_foil')}
+
+    pools = {}
+    for card_id, rarity in Card.objects.filter(set_id=set_id).values_list('id', 'rarity__rarity').order_by('id'):
+        price, foil_price = prices.get(card_id, (0., 0.))
+        pools.setdefault((rarity, False), []).append(price)
+        pools.setdefault((rarity, True), []).append(foil_price)
+
+    return {key: np.array(pool, dtype='f8') for key, pool in pools.items()}, len(prices)
+
+
+def slot_distribution(rarities: Tuple[RarityKey, ...], pools: Pools) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the prices of the cards the given slot can hold, and the probability of each of them.
+    """
+
+    empty = np.empty(0, dtype='f8')
+    prices = np.concatenate([pools.get(key, empty) for key in rarities])
+    weights = np.concatenate([np.full(len(pools.get(key, empty)), SHEET_COPIES.get(key[0], 1), dtype='f8')
+                              for key in rarities])
+    total = weights.sum()
+    return prices, weights / total if total else weights
+
+
+def expected_value(slots: Slots, pools: Pools) -> List[float]:
+    """Returns the expected value of each slot of a booster (for all the cards of the slot).
+    """
+
+    values = []
+    for rarities, number in slots:
+        prices, probabilities = slot_distribution(rarities, pools)
+        values.append(number * float(prices.dot(probabilities)))
+    return values
+
+
+def simulate(slots: Slots, pools: Pools, boosters: int=SIMULATED_BOOSTERS,
+             random_state: Optional[np.random.RandomState]=None) -> np.ndarray:
+    """Returns the values of the given number of simulated boosters.
+
+    Cards of a slot are drawn independently, so a booster can hold the same card twice.
+    """
+
+    random_state = random_state or np.random.RandomState()
+    distributions = [(slot_distribution(rarities, pools), number) for rarities, number in slots]
+    values = np.zeros(boosters, dtype='f8')
+
+    for start in range(0, boosters, SIMULATION_BATCH_SIZE):
+        size = min(SIMULATION_BATCH_SIZE, boosters - start)
+        for (prices, probabilities), number in distributions:
+            if not len(prices):
+                continue
+            draws = random_state.choice(len(prices), size=(size, number), p=probabilities)
+            values[start:start + size] += prices[draws].sum(axis=1)
+
+    return values
+
+
+def summarize(values: np.ndarray) -> Dict:
+    """Returns the distribution of the given booster values.
+    """
+
+    return {
+        'boosters': len(values),
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'percentiles': {str(p): float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+    }
+
+
+def evaluate_booster(set_id: str, boosters: int=SIMULATED_BOOSTERS) -> Dict:
+    """Returns the expected value of a booster of the given set, per slot and in total, and the distribution of the
+    values of simulated boosters.
+    """
+
+    slots = get_slots(set_id)
+    pools, priced_cards = get_pools(set_id)
+    slot_values = expected_value(slots, pools)
+
+    return {
+        'expected_value': sum(slot_values),
+        'priced_cards': priced_cards,
+        'slots': [{'rarities': [rarity + (' (F)' if foil else '') for rarity, foil in rarities],
+                   'number': number,
+                   'expected_value': value}
+                  for (rarities, number), value in zip(slots, slot_values)],
+        'simulation': summarize(simulate(slots, pools, boosters)) if boosters and slots else None,
+    }
+
+
+def get_booster_value(set_id: str) -> BoosterValue:
+    """Returns the value of a booster of the given set for today, computing it if it has not been yet.
+    """
+
+    try:
+        return BoosterValue.objects.get(set_id=set_id, date=date.today())
+    except BoosterValue.DoesNotExist:
+        details = evaluate_booster(set_id)
+
+    try:
+        with transaction.atomic():
+            return BoosterValue.objects.create(set_id=set_id, date=date.today(),
+                                               expected_value=details['expected_value'], details=details)
+    except IntegrityError:
+        # Computed concurrently by another request or task
+        return BoosterValue.objects.get(set_id=set_id, date=date.today())
+
+
+def estimate_booster_value(set_: Set) -> BoosterValue:
+    """Returns today's value of a booster of the given set with its expected value only, without simulating boosters
+    nor storing it, so that it can be computed within a request.
+    """
+
+    details = evaluate_booster(set_.id, boosters=0)
+    return BoosterValue(set=set_, date=date.today(), expected_value=details['expected_value'], details=details)
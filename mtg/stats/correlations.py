@@ -0,0 +1,113 @@
+"""
+@author: Thomas PERROT
+
+Contains the card price correlations for stats app.
+
+Mean prices of relevant cards over a rolling window are read from the price store into a (days, cards) matrix, whose
+daily log returns are standardized, so that the correlation matrix is Z.T @ Z / n. It is computed by blocks of cards to
+bound memory, and only the most correlated cards of each card are stored in the PriceCorrelation table.
+"""
+
+
+from typing import Dict, List, Tuple
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+
+from . import store
+from .models import PriceCorrelation
+from cards.models import Card
+
+
+CORRELATION_WINDOW = 30
+# Cards with fewer daily returns in the window are not correlated
+MIN_RETURNS = 10
+# Number of correlated cards stored for each card
+TOP_CORRELATIONS = 20
+# Number of cards whose correlations are computed at once
+CORRELATION_BLOCK_SIZE = 1000
+
+
+def price_matrix(prices: Dict[str, np.ndarray], from_date: date, to_date: date) -> Tuple[List[str], np.ndarray]:
+    """Returns the card ids and the (days, cards) matrix of their mean prices between the given dates (included), as
+    read by store.read_prices.
+
+    Missing prices are filled with the previous known price of the card, and are NaN before the first one.
+    """
+
+    card_ids = sorted(prices)
+    days = (to_date - from_date).days + 1
+    matrix = np.full((days, len(card_ids)), np.nan)
+
+    start = np.datetime64(from_date, 'D')
+    for column, card_id in enumerate(card_ids):
+        card_prices = prices[card_id]
+        matrix[(card_prices['date'] - start).astype(int), column] = card_prices['mean_price']
+
+    # Forward fill: index of the last known price of each cell
+    known = np.where(np.isnan(matrix), 0, np.arange(days)[:, None])
+    np.maximum.accumulate(known, axis=0, out=known)
+    return card_ids, matrix[known, np.arange(len(card_ids))]
+
+
+def standardized_returns(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the standardized daily log returns of the given price matrix, for the columns with enough returns and
+    a non constant price, and the indices of these columns.
+
+    Missing returns are set to 0 (i.e. the mean), so that they do not contribute to correlations.
+    """
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(np.log(matrix), axis=0)
+    returns[~np.isfinite(returns)] = np.nan
+
+    observations = np.sum(~np.isnan(returns), axis=0)
+    std = np.nanstd(returns, axis=0) if len(returns) else np.zeros(matrix.shape[1])
+    columns = np.flatnonzero((observations >= MIN_RETURNS) & (std > 0))
+
+    returns = returns[:, columns]
+    z = (returns - np.nanmean(returns, axis=0)) / std[columns]
+    return np.nan_to_num(z), columns
+
+
+def top_correlations(z: np.ndarray, k: int=TOP_CORRELATIONS) -> List[List[Tuple[int, float]]]:
+    """Returns the k columns most correlated with each column of the given standardized returns, with their
+    correlation, from the most to the least correlated.
+    """
+
+    n, columns = z.shape
+    top = []
+    for start in range(0, columns, CORRELATION_BLOCK_SIZE):
+        block = z[:, start:start + CORRELATION_BLOCK_SIZE].T.dot(z) / n
+        block[np.arange(len(block)), np.arange(start, start + len(block))] = -np.inf
+
+        best = np.argsort(-block, axis=1, kind='mergesort')[:, :k]
+        top.extend([(int(j), float(row[j])) for j in row_best if np.isfinite(row[j])]
+                   for row, row_best in zip(block, best))
+    return top
+
+
+def compute_price_correlations(to_date: date=None, window: int=CORRELATION_WINDOW) -> int:
+    """Computes the correlations of the daily price returns of relevant cards over the given window, and replaces the
+    stored ones with the most correlated cards of each card.
+
+    Returns the number of cards whose correlations have been stored.
+    """
+
+    to_date = to_date or date.today()
+    from_date = to_date - timedelta(days=window - 1)
+
+    card_ids = Card.objects.filter(is_relevant=True).values_list('id', flat=True)
+    card_ids, matrix = price_matrix(store.read_prices(card_ids, from_date, to_date), from_date, to_date)
+    z, columns = standardized_returns(matrix)
+
+    with transaction.atomic():
+        PriceCorrelation.objects.all().delete()
+        PriceCorrelation.objects.bulk_create(
+            PriceCorrelation(card_id=card_ids[columns[i]], other_id=card_ids[columns[j]], date=to_date,
+                             correlation=correlation)
+            for i, correlated in enumerate(top_correlations(z)) for j, correlation in correlated
+        )
+
+    return len(columns)
@@ -0,0 +1,103 @@
+"""
+@author: Thomas PERROT
+
+Contains the market events for stats app.
+
+Events are detected incrementally where data changes, instead of scanning whole tables: legality changes come from the
+diffs applied by cards.legalities, and price shocks from the prices crawled in a chunk, compared with the previous
+price of the same cards.
+"""
+
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import date, timedelta
+from collections import defaultdict
+
+from .models import MarketEvent, Price
+from cards.models import Card
+from cards.legalities import NOT_LEGAL
+
+
+# A price shock is a change of the mean price of at least PRICE_SHOCK_THRESHOLD (e.g. 0.3 is ±30%) since the previous
+# price, for cards worth at least PRICE_SHOCK_MIN_PRICE, so that cheap cards do not flood the feed.
+PRICE_SHOCK_THRESHOLD = 0.3
+PRICE_SHOCK_MIN_PRICE = 1.
+# The previous price is looked up in the last days only (prices are crawled at most every week).
+PRICE_SHOCK_LOOKBACK = 7
+
+
+def price_shock(prices: List[Tuple[date, float]]) -> Optional[Dict]:
+    """Returns the details of the price shock between the two latest of the given (date, mean price) pairs, sorted from
+    the most recent, or None if there is no shock.
+    """
+
+    if len(prices) < 2:
+        return None
+
+    (d, price), (previous_date, previous_price) = prices[:2]
+    if max(price, previous_price) < PRICE_SHOCK_MIN_PRICE or not previous_price:
+        return None
+
+    change = price / previous_price - 1
+    if abs(change) < PRICE_SHOCK_THRESHOLD:
+        return None
+
+    return {'previous_date': previous_date.isoformat(), 'previous_price': previous_price, 'price': price,
+            'change': change}
+
+
+def detect_price_shocks(card_ids: Iterable[str], day: date=None) -> List[MarketEvent]:
+    """Creates the price shock events of the given cards whose price was crawled on the given day, and returns them.
+
+    Cards which already have a price shock event that day are skipped.
+    """
+
+    day = day or date.today()
+    card_ids = set(card_ids)
+    card_ids -= set(MarketEvent.objects.filter(
+        kind=MarketEvent.PRICE,
+        card_id__in=list(card_ids),
+        date=day
+    ).values_list(
+        'card_id', flat=True
+    ))
+
+    prices = defaultdict(list)
+    for card_id, d, mean_price in Price.objects.filter(
+        card_id__in=list(card_ids),
+        date__gte=day - timedelta(days=PRICE_SHOCK_LOOKBACK),
+        date__lte=day,
+        mean_price__isnull=False
+    ).order_by(
+        'card_id', '-date'
+    ).values_list(
+        'card_id', 'date', 'mean_price'
+    ):
+        prices[card_id].append((d, mean_price))
+
+    shocks = {card_id: price_shock(card_prices) for card_id, card_prices in prices.items()
+              if card_prices[0][0] == day}
+    shocks = {card_id: details for card_id, details in shocks.items() if details}
+    if not shocks:
+        return []
+
+    card_names = dict(Card.objects.filter(id__in=list(shocks)).values_list('id', 'name_id'))
+    return MarketEvent.objects.bulk_create(
+        MarketEvent(kind=MarketEvent.PRICE, card_name_id=card_names[card_id], card_id=card_id, date=day,
+                    details=details)
+        for card_id, details in sorted(shocks.items())
+    )
+
+
+def record_legality_changes(format_id: str, changes: Dict[str, Tuple[str, str]], day: date=None) -> List[MarketEvent]:
+    """Creates the legality change events of the given card names in the given format, from their (previous, new)
+    legalities, and returns them.
+
+    Cards which left the format (e.g. rotated out of standard) are not bans nor unbans, so they have no event.
+    """
+
+    return MarketEvent.objects.bulk_create(
+        MarketEvent(kind=MarketEvent.LEGALITY, card_name_id=name, date=day or date.today(),
+                    details={'format': format_id, 'previous_legality': previous, 'legality': legality})
+        for name, (previous, legality) in sorted(changes.items()) if NOT_LEGAL not in (previous, legality)
+    )
@@ -0,0 +1,37 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to export prices to the columnar price store
+"""
+
+
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand
+
+from stats import store
+from stats.models import Price
+
+
+class Command(BaseCommand):
+    help = 'Exports prices to the columnar price store, one file per month. Exports all the history by default.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='from_month', help='First month to export (YYYY-MM).')
+        parser.add_argument('--to', dest='to_month', help='Last month to export (YYYY-MM).')
+
+    def handle(self, *args, **options):
+        if options['from_month']:
+            from_date = datetime.strptime(options['from_month'], '%Y-%m').date()
+        else:
+            first_price = Price.objects.order_by('date').first()
+            from_date = first_price.date if first_price else date.today()
+
+        if options['to_month']:
+            to_date = datetime.strptime(options['to_month'], '%Y-%m').date()
+        else:
+            to_date = date.today()
+
+        for month in store.iter_months(from_date, to_date):
+            count = store.export_month(month)
+            self.stdout.write('Exported {} prices for month {:%Y-%m}'.format(count, month))
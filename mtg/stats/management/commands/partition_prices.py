@@ -0,0 +1,49 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to manage the Price table partitions
+
+The Price table is converted to a partitioned table by hand with this command, on PostgreSQL 11+. Its partitioned
+layout (primary key on (id, date), partitions, archived months) is then no longer managed by makemigrations: schema
+changes to the Price model have to be applied to the partitioned table by hand as well.
+"""
+
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from stats import partitions
+
+
+class Command(BaseCommand):
+    help = 'Partitions the Price table by month (converting it on first run), creates the partitions of the next ' \
+           'months, and archives old ones if --keep is given.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=partitions.MONTHS_AHEAD,
+                            help='Number of future months for which partitions are created.')
+        parser.add_argument('--keep', type=int,
+                            help='Number of past months kept attached. Older partitions are exported to the price '
+                                 'store, detached and moved to the "{}" schema.'.format(partitions.ARCHIVE_SCHEMA))
+
+    def handle(self, *args, **options):
+        if options['ahead'] < 0 or (options['keep'] is not None and options['keep'] < 0):
+            raise CommandError('--ahead and --keep must be positive')
+
+        try:
+            partitions.check_server_version()
+        except RuntimeError as err:
+            raise CommandError(err)
+
+        if not partitions.is_partitioned():
+            self.stdout.write('Converting Price table to a partitioned table...')
+            partitions.convert_table(options['ahead'])
+
+        for name in partitions.create_partitions(date.today(), partitions.add_months(date.today(), options['ahead'])):
+            self.stdout.write('Partition {} is ready'.format(name))
+
+        if options['keep'] is not None:
+            before = partitions.add_months(date.today(), -options['keep'])
+            for name in partitions.archive_partitions(before):
+                self.stdout.write('Archived partition {}'.format(name))
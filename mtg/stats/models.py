@@ -5,10 +5,11 @@ Contains models for stats app
 """
 
 
+from django.conf import settings
 from django.contrib.postgres.fields import JSONField
 from django.db import models
 
-from cards.models import Card
+from cards.models import Card, CardName, Set
 
 
 class Price(models.Model):
@@ -73,3 +74,106 @@ class Statistics(models.Model):
     class Meta:
         unique_together = ("card", "date")
         verbose_name_plural = "Statistics"
+
+
+class BoosterValue(models.Model):
+    """Class which stores the value of a booster of a given set on a given day, as computed by stats.boosters:
+    the expected value (in total and per slot) and the distribution of the values of simulated boosters.
+    """
+
+    set = models.ForeignKey(Set, on_delete=models.CASCADE, related_name='booster_values')
+    date = models.DateField()
+    expected_value = models.FloatField()
+    details = JSONField()
+
+    def __str__(self) -> str:
+        return '{} ({})'.format(self.set.name, self.date)
+
+    class Meta:
+        unique_together = ("set", "date")
+        get_latest_by = "date"
+
+
+class PriceCorrelation(models.Model):
+    """Class which stores a card whose price moves with the price of a given card: the correlation of their daily
+    price returns over the last days, as of a given date (see stats.correlations).
+    """
+
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='price_correlations')
+    other = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    correlation = models.FloatField()
+
+    def __str__(self) -> str:
+        return '{} <-> {} ({:.2f})'.format(self.card_id, self.other_id, self.correlation)
+
+    class Meta:
+        unique_together = ("card", "other")
+
+
+class MarketEvent(models.Model):
+    """Class which represents an event that moves the market of a card (see stats.events): a change of its legality in
+    a format, or a sudden change of its price. Events are dispatched to the `events` queue once created.
+    """
+
+    LEGALITY = 'legality'
+    PRICE = 'price'
+    KINDS = (
+        (LEGALITY, 'Legality change'),
+        (PRICE, 'Price shock'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    card_name = models.ForeignKey(CardName, on_delete=models.CASCADE, related_name='market_events')
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, blank=True, null=True, related_name='+')  # price events
+    date = models.DateField()
+    details = JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+    dispatched = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self) -> str:
+        return '{} ({}, {})'.format(self.card_name_id, self.get_kind_display(), self.date)
+
+    class Meta:
+        index_together = [("kind", "date")]
+        get_latest_by = "created"
+
+
+class Watch(models.Model):
+    """Class which represents a card watched by a user, who is notified when a metric of the card crosses a threshold
+    (see stats.watches): the price ratio of its latest statistics, or its latest mean price.
+
+    `triggered` is whether the threshold was crossed at the last evaluation, so that a user is notified once per
+    crossing, and not every day the threshold stays crossed.
+    """
+
+    PRICE_RATIO = 'price_ratio'
+    MEAN_PRICE = 'mean_price'
+    METRICS = (
+        (PRICE_RATIO, 'Price ratio'),
+        (MEAN_PRICE, 'Mean price'),
+    )
+
+    ABOVE = 'above'
+    BELOW = 'below'
+    OPERATORS = (
+        (ABOVE, 'Above'),
+        (BELOW, 'Below'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='watches')
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='watches')
+    metric = models.CharField(max_length=20, choices=METRICS)
+    operator = models.CharField(max_length=5, choices=OPERATORS)
+    threshold = models.FloatField()
+    is_active = models.BooleanField(default=True)
+    triggered = models.BooleanField(default=False)
+    last_triggered = models.DateTimeField(blank=True, null=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return '{} {} {} {}'.format(self.card, self.get_metric_display(), self.operator, self.threshold)
+
+    class Meta:
+        verbose_name_plural = 'Watches'
+        index_together = [("is_active", "metric")]
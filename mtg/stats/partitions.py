@@ -0,0 +1,169 @@
+"""
+@author: Thomas PERROT
+
+Contains the management of the Price table partitions for stats app.
+
+The Price table is range partitioned by month on PostgreSQL (10+ for declarative partitioning, 11+ for primary and
+foreign keys on partitioned tables). Recent months stay attached, so that time bounded queries only scan a few small
+partitions. Old months are exported to the columnar price store, detached and moved to an archive schema.
+"""
+
+
+from typing import List
+from datetime import date
+import re
+
+from django.db import connection, transaction
+
+from . import store
+from .models import Price
+from cards.models import Card
+
+
+ARCHIVE_SCHEMA = 'price_archive'
+
+# Partitioned tables with primary and foreign keys need PostgreSQL 11 (as given by server_version_num).
+MIN_SERVER_VERSION = 110000
+# Number of future months for which partitions are created in advance.
+MONTHS_AHEAD = 3
+PARTITION_NAME_REGEX = re.compile(r'_y(?P<year>\d{4})m(?P<month>\d{2})$')
+
+
+def partition_name(month: date) -> str:
+    """Returns the name of the partition storing prices of the given month.
+    """
+
+    return '{}_y{:%Y}m{:%m}'.format(Price._meta.db_table, month, month)
+
+
+def partition_month(name: str) -> date:
+    """Returns the month of the given partition name.
+    """
+
+    match = PARTITION_NAME_REGEX.search(name)
+    return date(int(match.group('year')), int(match.group('month')), 1)
+
+
+def check_server_version() -> None:
+    """Raises a RuntimeError if the PostgreSQL server is too old for the partitioned Price table.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW server_version_num')
+        version = int(cursor.fetchone()[0])
+
+    if version < MIN_SERVER_VERSION:
+        raise RuntimeError('Partitioning the Price table requires PostgreSQL 11+ (server_version_num {} < {})'.format(
+            version, MIN_SERVER_VERSION))
+
+
+def is_partitioned() -> bool:
+    """Returns whether the Price table is already partitioned.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [Price._meta.db_table])
+        return cursor.fetchone() is not None
+
+
+def get_partitions() -> List[str]:
+    """Returns the names of the partitions attached to the Price table.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass ORDER BY c.relname',
+            [Price._meta.db_table]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(month: date) -> str:
+    """Creates the partition of the given month if it does not already exist. Returns its name.
+    """
+
+    month = store.month_start(month)
+    name = partition_name(month)
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)'.format(
+            name, Price._meta.db_table), [month, store.next_month(month)])
+    return name
+
+
+def create_partitions(from_date: date, to_date: date) -> List[str]:
+    """Creates the partitions of every month between the given dates (included). Returns their names.
+    """
+
+    return [create_partition(month) for month in store.iter_months(from_date, to_date)]
+
+
+@transaction.atomic
+def convert_table(months_ahead: int) -> None:
+    """Converts the Price table to a table partitioned by month, keeping its rows, keys, indexes and sequence.
+
+    Partitions are created from the oldest price to months_ahead months after the current month.
+    Raises a RuntimeError if the PostgreSQL server is older than version 11.
+    """
+
+    check_server_version()
+
+    table = Price._meta.db_table
+    old_table = table + '_unpartitioned'
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(date) FROM {}'.format(table))
+        first_date = cursor.fetchone()[0] or date.today()
+
+        cursor.execute('ALTER TABLE {} RENAME TO {}'.format(table, old_table))
+        cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS) PARTITION BY RANGE (date)'.format(
+            table, old_table))
+        cursor.execute('ALTER TABLE {} ADD PRIMARY KEY (id, date)'.format(table))
+        cursor.execute('ALTER TABLE {} ADD UNIQUE (card_id, date)'.format(table))
+        cursor.execute('ALTER TABLE {} ADD FOREIGN KEY (card_id) REFERENCES {} (id) '
+                       'DEFERRABLE INITIALLY DEFERRED'.format(table, Card._meta.db_table))
+        cursor.execute('CREATE INDEX ON {} (card_id)'.format(table))
+        cursor.execute('ALTER SEQUENCE {}_id_seq OWNED BY {}.id'.format(table, table))
+
+    create_partitions(first_date, add_months(date.today(), months_ahead))
+
+    with connection.cursor() as cursor:
+        cursor.execute('INSERT INTO {} SELECT * FROM {}'.format(table, old_table))
+        cursor.execute('DROP TABLE {}'.format(old_table))
+
+
+def archive_partitions(before: date) -> List[str]:
+    """Archives the partitions of months before the given date. Returns their names.
+
+    Every partition is first exported to the columnar price store, then detached from the Price table, stripped of its
+    foreign keys and moved to the archive schema, where it can be dumped or dropped.
+    """
+
+    archived = []
+
+    for name in get_partitions():
+        month = partition_month(name)
+        if store.next_month(month) > before:
+            continue
+
+        store.export_month(month)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('CREATE SCHEMA IF NOT EXISTS {}'.format(ARCHIVE_SCHEMA))
+            cursor.execute('ALTER TABLE {} DETACH PARTITION {}'.format(Price._meta.db_table, name))
+            # Detached partitions keep the foreign key to cards, which would prevent deleting their cards
+            cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [name])
+            for constraint, in cursor.fetchall():
+                cursor.execute('ALTER TABLE {} DROP CONSTRAINT "{}"'.format(name, constraint))
+            cursor.execute('ALTER TABLE {} SET SCHEMA {}'.format(name, ARCHIVE_SCHEMA))
+        archived.append(name)
+
+    return archived
+
+
+def add_months(d: date, months: int) -> date:
+    """Returns the first day of the month which is the given number of months after (or before, if negative)
+    the given date.
+    """
+
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
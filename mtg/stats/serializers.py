@@ -7,7 +7,7 @@ Contains serializers for stats app
 
 from rest_framework import serializers
 
-from .models import Price, Statistics
+from .models import Price, Statistics, BoosterValue, PriceCorrelation, MarketEvent
 
 
 class PriceSerializer(serializers.HyperlinkedModelSerializer):
@@ -26,3 +26,30 @@ class StatisticsSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = Statistics
         fields = ('card_id', 'card_name', 'card_set', 'date', 'predicted_price', 'price_ratio', 'playing_ratio')
+
+
+class BoosterValueSerializer(serializers.ModelSerializer):
+    set_id = serializers.ReadOnlyField(source='set.id')
+    set_name = serializers.ReadOnlyField(source='set.name')
+
+    class Meta:
+        model = BoosterValue
+        fields = ('set_id', 'set_name', 'date', 'expected_value', 'details')
+
+
+class PriceCorrelationSerializer(serializers.ModelSerializer):
+    card_id = serializers.ReadOnlyField(source='other.id')
+    card_name = serializers.ReadOnlyField(source='other.name_id')
+    card_set = serializers.ReadOnlyField(source='other.set.name')
+
+    class Meta:
+        model = PriceCorrelation
+        fields = ('card_id', 'card_name', 'card_set', 'date', 'correlation')
+
+
+class MarketEventSerializer(serializers.ModelSerializer):
+    card_name = serializers.ReadOnlyField(source='card_name_id')
+
+    class Meta:
+        model = MarketEvent
+        fields = ('id', 'kind', 'card_name', 'card', 'date', 'details', 'created')
@@ -0,0 +1,162 @@
+"""
+@author: Thomas PERROT
+
+Contains the columnar price store for stats app.
+
+Prices are exported from the Price table into one NumPy file per month, sorted by card and date, so that analyses
+over long periods read memory-mapped arrays instead of instantiating millions of Price objects.
+"""
+
+
+from typing import Dict, Iterable, Iterator, List, Tuple
+from datetime import date
+import os
+
+import numpy as np
+from django.conf import settings
+
+from .models import Price
+
+
+PRICE_DTYPE = np.dtype([
+    ('card', 'U50'),
+    ('date', 'datetime64[D]'),
+    ('min_price', 'f8'),
+    ('mean_price', 'f8'),
+    ('available_items', 'i4'),
+    ('min_foil', 'f8'),
+    ('available_foils', 'i4'),
+])
+# Prices returned by the reader, without the card column.
+CARD_PRICE_DTYPE = np.dtype([(name, PRICE_DTYPE[name]) for name in PRICE_DTYPE.names[1:]])
+
+# Null prices are stored as NaN, null quantities as MISSING_ITEMS.
+MISSING_ITEMS = -1
+
+
+def month_start(d: date) -> date:
+    """Returns the first day of the month of the given date.
+    """
+
+    return d.replace(day=1)
+
+
+def next_month(d: date) -> date:
+    """Returns the first day of the month following the given date.
+    """
+
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def iter_months(from_date: date, to_date: date) -> Iterator[date]:
+    """Yields the first day of every month between the given dates (included).
+    """
+
+    month = month_start(from_date)
+    while month <= to_date:
+        yield month
+        month = next_month(month)
+
+
+def partition_path(month: date) -> str:
+    """Returns the path of the file storing prices of the given month.
+    """
+
+    return os.path.join(settings.PRICE_STORE_DIR, '{:%Y-%m}.npy'.format(month))
+
+
+def to_array(rows: Iterable[Tuple]) -> np.ndarray:
+    """Converts rows of (card id, date, min price, mean price, available items, min foil, available foils)
+    to a price array, sorted by card and date.
+    """
+
+    prices = np.array([
+        (
+            card_id, d,
+            np.nan if min_price is None else min_price,
+            np.nan if mean_price is None else mean_price,
+            MISSING_ITEMS if available_items is None else available_items,
+            np.nan if min_foil is None else min_foil,
+            MISSING_ITEMS if available_foils is None else available_foils
+        )
+        for card_id, d, min_price, mean_price, available_items, min_foil, available_foils in rows
+    ], dtype=PRICE_DTYPE)
+    prices.sort(order=['card', 'date'])
+    return prices
+
+
+def select(prices: np.ndarray, card_id: str, from_date: date=None, to_date: date=None) -> np.ndarray:
+    """Returns the prices of the given card between the given dates (included) from a price array.
+
+    The array being sorted by card and date, only a binary search is needed.
+    """
+
+    cards = prices['card']
+    start, end = np.searchsorted(cards, card_id, side='left'), np.searchsorted(cards, card_id, side='right')
+    dates = prices['date'][start:end]
+    if to_date:
+        end = start + np.searchsorted(dates, np.datetime64(to_date, 'D'), side='right')
+    if from_date:
+        start += np.searchsorted(dates, np.datetime64(from_date, 'D'), side='left')
+    return prices[start:end]
+
+
+def export_month(month: date) -> int:
+    """Exports the prices of the given month from the Price table to the store, replacing existing data.
+
+    Returns the number of exported prices.
+    """
+
+    month = month_start(month)
+
+    rows = Price.objects.filter(
+        date__gte=month,
+        date__lt=next_month(month)
+    ).values_list(
+        'card_id', 'date', 'min_price', 'mean_price', 'available_items', 'min_foil', 'available_foils'
+    )
+    prices = to_array(rows.iterator())
+
+    path = partition_path(month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, prices)
+    os.replace(tmp_path, path)
+
+    return len(prices)
+
+
+def load_month(month: date) -> np.ndarray:
+    """Returns the memory-mapped prices of the given month, or an empty array if the month was not exported.
+    """
+
+    path = partition_path(month_start(month))
+    if not os.path.exists(path):
+        return np.empty(0, dtype=PRICE_DTYPE)
+    return np.load(path, mmap_mode='r')
+
+
+def read_prices(card_ids: Iterable[str], from_date: date, to_date: date) -> Dict[str, np.ndarray]:
+    """Returns the prices of the given cards between the given dates (included).
+
+    Maps every card id with an array of (date, min_price, mean_price, available_items, min_foil, available_foils),
+    sorted by date.
+    """
+
+    card_ids = list(card_ids)
+    parts = {card_id: [] for card_id in card_ids}  # type: Dict[str, List[np.ndarray]]
+
+    for month in iter_months(from_date, to_date):
+        prices = load_month(month)
+        for card_id in card_ids:
+            parts[card_id].append(select(prices, card_id, from_date, to_date))
+
+    result = {}
+    for card_id, card_parts in parts.items():
+        card_prices = np.concatenate(card_parts) if card_parts else np.empty(0, dtype=PRICE_DTYPE)
+        result[card_id] = np.empty(len(card_prices), dtype=CARD_PRICE_DTYPE)
+        for name in CARD_PRICE_DTYPE.names:
+            result[card_id][name] = card_prices[name]
+
+    return result
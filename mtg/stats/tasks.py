@@ -5,21 +5,30 @@ Contains tasks for stats app
 """
 
 
-from typing import Dict
-from datetime import date, timedelta
+from typing import Dict, List
+from datetime import date, datetime, time, timedelta
+from collections import defaultdict
 import numbers
 import re
 
-from celery import shared_task
+from celery import shared_task, group
 from celery.utils.log import get_task_logger
 import requests
 from bs4 import BeautifulSoup
 from celery.exceptions import SoftTimeLimitExceeded
+from django.db.models import Q
 from django.utils import timezone
 
 from . import utils
-from .models import Features, Statistics, Price
+from . import store
+from . import partitions
+from . import boosters
+from . import correlations
+from . import events
+from . import watches
+from .models import Features, Statistics, Price, MarketEvent
 from cards.models import Card
+from sets.models import Booster
 from tournaments.models import Tournament
 
 
@@ -30,6 +39,7 @@ MKM_URL = 'http://www.magiccardmarket.eu/'
 MKM_BASE_CARD_URL = 'http://www.magiccardmarket.eu/Products/Singles/{set}/{card_name}'
 
 MAX_PAGES = 30
+PRICE_CHUNK_SIZE = 10
 DATE = re.compile(r"\w{1,10} \d{1,2}, \d{4}")
 
 
@@ -96,27 +106,18 @@ def parse_page(content: str) -> Dict[str, numbers.Real]:
     return parsed_response
 
 
-@shared_task(soft_time_limit=10,
-             autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
-             default_retry_delay=3,
-             retry_kwargs={'max_retries': 5},
-             name='Get card price',
-             ignore_result=True,
-             rate_limit='10/m')
-def get_price(card_id: str) -> None:
-    """Gets the prices and quantity for the given card and stores them in database.
+def store_price(card_id: str, url: str, layout: str, crawl_interval: int) -> None:
+    """Gets the prices and quantity for the given card from its magiccardmarket.eu url, and stores them in database.
     """
 
-    card = Card.objects.get(id=card_id)
-    logger.info('Getting price of card {} for set {}. Url: {}'.format(card.name, card.set, card.mkm_url))
+    logger.info('Getting price of card {}. Url: {}'.format(card_id, url))
 
-    url = card.mkm_url
     if not url:
         return
 
     r = requests.get(url)
     if 'The requested article does not exist.' in r.text:
-        if card.layout == 'double-faced':
+        if layout == 'double-faced':
             logger.warning('Unknown url for MKM: {} (double-faced card)'.format(url))
         else:
             logger.exception('Unknown url for MKM: {}'.format(url))
@@ -124,33 +125,144 @@ def get_price(card_id: str) -> None:
 
     parsed_prices = parse_page(r.text)
 
-    card = Card.objects.get(id=card_id)
-    price, created = Price.objects.get_or_create(card=card, date=timezone.now(), defaults=parsed_prices)
+    price, created = Price.objects.get_or_create(card_id=card_id, date=timezone.now(), defaults=parsed_prices)
 
     if created:
-        logger.debug('Inserted price {}'.format(price))
+        logger.debug('Inserted price for card {}'.format(card_id))
+
+    Card.objects.filter(id=card_id).update(next_crawl_at=next_crawl_at(crawl_interval))
+
+
+def next_crawl_at(interval: int) -> datetime:
+    """Returns the beginning of the day when a card crawled today has to be crawled again.
+    """
+
+    d = datetime.combine(date.today() + timedelta(days=interval), time())
+    return timezone.make_aware(d, timezone.get_current_timezone())
+
+
+@shared_task(soft_time_limit=10,
+             autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
+             default_retry_delay=3,
+             retry_kwargs={'max_retries': 5},
+             name='Get card price',
+             ignore_result=True,
+             rate_limit='10/m')
+def get_price(card_id: str) -> None:
+    """Gets the prices and quantity for the given card and stores them in database.
+    """
+
+    store_price(card_id, *Card.objects.filter(id=card_id).values_list('mkm_url', 'layout', 'crawl_interval').get())
+
+    emit_market_events(events.detect_price_shocks([card_id]))
+
+
+@shared_task(soft_time_limit=10 * PRICE_CHUNK_SIZE,
+             name='Get cards prices',
+             ignore_result=True,
+             rate_limit='1/m')
+def get_prices(cards: List[List]) -> None:
+    """Gets the prices and quantity for the given cards, one after the other, and stores them in database.
+
+    Cards are given as (id, magiccardmarket.eu url, layout, crawl interval).
+    The rate limit keeps the same pace on MKM as get_price for chunks of PRICE_CHUNK_SIZE cards. A card that fails
+    is skipped, and will be crawled again at the next harvest. Price shocks of the chunk are detected once it is
+    crawled.
+    """
+
+    for card_id, url, layout, crawl_interval in cards:
+        try:
+            store_price(card_id, url, layout, crawl_interval)
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as err:
+            logger.exception('Could not get price of card {}: {}'.format(card_id, err))
+
+    emit_market_events(events.detect_price_shocks(card_id for card_id, *_ in cards))
 
 
 @shared_task(name='Get relevant cards price',
              ignore_result=True)
 def harvest_prices() -> None:
     """Harvests all prices for relevant cards.
+
+    Cards lacking today's price and whose crawl is due are found with a single query, and are crawled by chunks of
+    PRICE_CHUNK_SIZE cards, most played cards of last two weeks first (as read from the card usages aggregate).
     """
 
-    relevant_cards = Card.objects.filter(is_relevant=True)
+    today = date.today()
+    played = Tournament.get_played_cards(today, today - timedelta(days=14))
 
-    for card in relevant_cards:
-        if Price.objects.filter(card=card, date=timezone.now()).exists():
-            logger.debug('Price already exists for card {}'.format(card))
-        else:
-            get_price.delay(card.id)
+    cards = sorted(Card.objects.filter(
+        Q(next_crawl_at__isnull=True) | Q(next_crawl_at__lte=timezone.now()),
+        is_relevant=True
+    ).exclude(
+        prices__date=today
+    ).values_list(
+        'id', 'mkm_url', 'layout', 'crawl_interval', 'name_id'
+    ), key=lambda card: (-played.get(card[4], 0), card[0]))
+    cards = [card[:4] for card in cards]
+
+    logger.info('Harvesting prices of {} cards'.format(len(cards)))
+
+    group(
+        get_prices.s(cards[i:i + PRICE_CHUNK_SIZE]) for i in range(0, len(cards), PRICE_CHUNK_SIZE)
+    )()
+
+
+@shared_task(name='Schedule price crawls',
+             ignore_result=True)
+def schedule_price_crawls() -> None:
+    """Assigns a price crawl interval to every relevant card, from its past week prices, sales volumes and usages.
+
+    Cards that became volatile are crawled again as soon as the next harvest.
+    """
+
+    today = date.today()
+
+    card_names = dict(Card.objects.filter(is_relevant=True).values_list('id', 'name_id'))
+
+    prices = defaultdict(list)
+    available_items = defaultdict(list)
+    for card_id, mean_price, items in Price.objects.filter(
+        card_id__in=card_names,
+        date__gte=today - timedelta(days=6),
+        mean_price__isnull=False
+    ).order_by(
+        '-date'
+    ).values_list(
+        'card_id', 'mean_price', 'available_items'
+    ):
+        prices[card_id].append(mean_price)
+        available_items[card_id].append(items)
+
+    last_week_usages = Tournament.get_played_cards(today, today - timedelta(days=6))
+    previous_week_usages = Tournament.get_played_cards(today - timedelta(days=7), today - timedelta(days=13))
+
+    card_ids_by_interval = defaultdict(list)
+    for card_id, card_name in card_names.items():
+        usages = last_week_usages.get(card_name, 0), previous_week_usages.get(card_name, 0)
+        interval = utils.crawl_interval(prices[card_id], available_items[card_id], usages)
+        card_ids_by_interval[interval].append(card_id)
+
+    for interval, card_ids in card_ids_by_interval.items():
+        Card.objects.filter(id__in=card_ids).update(crawl_interval=interval)
+        logger.info('{} cards will be crawled every {} days'.format(len(card_ids), interval))
+
+    Card.objects.filter(
+        id__in=card_ids_by_interval[utils.CRAWL_INTERVALS[0]],
+        next_crawl_at__gt=next_crawl_at(utils.CRAWL_INTERVALS[0])
+    ).update(
+        next_crawl_at=timezone.now()
+    )
 
 
 @shared_task(name='Compute statistics')
 def compute_statistics() -> None:
     """Compute all the statistics for every relevant cards.
 
-    This step needs to be done after all steps have finished.
+    This step needs to be done after all steps have finished. Watches are evaluated against the new statistics
+    afterwards.
     """
 
     logger.info('Computing cards statistics')
@@ -181,6 +293,8 @@ def compute_statistics() -> None:
         if created:
             logger.debug('Created statistics {}'.format(statistics))
 
+    evaluate_watches.delay()
+
 
 @shared_task(name='Compute all features',
              ignore_result=True)
@@ -203,13 +317,19 @@ def compute_features() -> None:
         logger.info('Computing feature for card {}'.format(card))
 
         try:
+            reprints, days_since_reprint = utils.reprint_feature(card_id)
             features = {
-                'usages': usages,
+                'usages': usages['usages'],
+                'weighted_usages': usages['weighted_usages'],
+                'format_usages': usages['format_usages'],
+                'format_weighted_usages': usages['format_weighted_usages'],
                 'prices': utils.price_feature(card_id, 0),
                 'price_differences': utils.price_difference_feature(card_id, 0),
                 'sales_volume': utils.sales_volume_feature(card_id, 0),
                 'mana_cost': utils.mana_cost_feature(card_id),
                 'tournament_legality': utils.tournament_legality_feature(card_id),
+                'reprints': reprints,
+                'days_since_reprint': days_since_reprint,
                 'price_variance': utils.price_variance_feature(card_id, 0),
                 'labels': utils.get_labels(card_id, 0)
             }
@@ -218,3 +338,99 @@ def compute_features() -> None:
         else:
             Features.objects.create(card=card, date=date.today(), features=features)
             logger.debug('Computed features for card {}'.format(card.name))
+
+
+@shared_task(name='Export prices to store',
+             ignore_result=True)
+def export_prices() -> None:
+    """Exports prices of the current month (and of the previous one on its first day) to the columnar price store.
+
+    It closes the pricing stage, so watches are evaluated against the new prices afterwards.
+    """
+
+    yesterday = date.today() - timedelta(days=1)
+    for month in store.iter_months(yesterday, date.today()):
+        count = store.export_month(month)
+        logger.info('Exported {} prices for month {:%Y-%m}'.format(count, month))
+
+    evaluate_watches.delay()
+
+
+@shared_task(name='Create price partitions',
+             ignore_result=True)
+def create_price_partitions() -> None:
+    """Creates the partitions of the Price table for the current month and the next ones, if it is partitioned.
+    """
+
+    if not partitions.is_partitioned():
+        logger.warning('Price table is not partitioned. Run the partition_prices command to convert it.')
+        return
+
+    names = partitions.create_partitions(date.today(), partitions.add_months(date.today(), partitions.MONTHS_AHEAD))
+    logger.info('Price partitions up to date: {}'.format(', '.join(names)))
+
+
+@shared_task(name='Compute booster values',
+             ignore_result=True)
+def compute_booster_values() -> None:
+    """Computes today's booster value of every set with a booster, once prices have been harvested.
+    """
+
+    for set_id in Booster.objects.filter(slot__isnull=False).values_list('set_id', flat=True).distinct():
+        booster_value = boosters.get_booster_value(set_id)
+        logger.info('Booster value of set {}: {:.2f}'.format(set_id, booster_value.expected_value))
+
+
+@shared_task(name='Compute booster value',
+             ignore_result=True)
+def compute_booster_value(set_id: str) -> None:
+    """Computes today's booster value of the given set, e.g. when it is requested before compute_booster_values ran.
+    """
+
+    booster_value = boosters.get_booster_value(set_id)
+    logger.info('Booster value of set {}: {:.2f}'.format(set_id, booster_value.expected_value))
+
+
+@shared_task(name='Compute price correlations',
+             ignore_result=True)
+def compute_price_correlations() -> None:
+    """Computes the price correlations of relevant cards over the last days, once prices have been exported.
+    """
+
+    cards = correlations.compute_price_correlations()
+    logger.info('Computed price correlations of {} cards'.format(cards))
+
+
+def emit_market_events(market_events: List[MarketEvent]) -> None:
+    """Sends the given market events to the `events` queue.
+    """
+
+    if market_events:
+        dispatch_market_events.delay([event.id for event in market_events])
+
+
+@shared_task(name='Dispatch market events',
+             ignore_result=True)
+def dispatch_market_events(event_ids: List[int]) -> None:
+    """Dispatches the given market events, which are routed to the `events` queue so that ban announcements are not
+    delayed by price crawls.
+
+    Events are only logged and marked as dispatched for now: clients get them by polling `/stats/alerts/`.
+    """
+
+    market_events = MarketEvent.objects.filter(id__in=event_ids, dispatched__isnull=True).order_by('id')
+    for event in market_events:
+        logger.info('Market event: {} {}'.format(event, event.details))
+
+    market_events.update(dispatched=timezone.now())
+
+
+@shared_task(name='Evaluate watches',
+             ignore_result=True)
+def evaluate_watches() -> None:
+    """Evaluates all the watches at once, and notifies users of the ones which have just been triggered, once prices
+    or statistics have been computed.
+    """
+
+    triggered = watches.notify_watches()
+    logger.info('Triggered {} watches'.format(triggered))
@@ -0,0 +1,52 @@
+import numpy as np
+
+from ..boosters import slot_distribution, expected_value, simulate
+
+
+pools = {
+    ('C', False): np.array([0.1, 0.1, 0.1, 0.3]),
+    ('R', False): np.array([2., 2.]),
+    ('M', False): np.array([10.]),
+    ('M', True): np.array([30.]),
+}
+
+
+def test_slot_distribution():
+    """Asserts that cards of a slot are weighted by their number of copies on a print sheet.
+    """
+
+    prices, probabilities = slot_distribution((('M', False), ('R', False)), pools)
+
+    assert list(prices) == [10., 2., 2.]
+    assert np.allclose(probabilities, [0.2, 0.4, 0.4])
+
+
+def test_slot_distribution_empty_pool():
+    """Asserts that a slot whose rarities have no cards has no value.
+    """
+
+    prices, probabilities = slot_distribution((('U', False),), pools)
+
+    assert len(prices) == len(probabilities) == 0
+
+
+def test_expected_value():
+    """Asserts that the expected value of a slot accounts for its number of cards.
+    """
+
+    slots = [((('C', False),), 10), ((('M', False), ('R', False)), 1), ((('U', False),), 3)]
+
+    assert np.allclose(expected_value(slots, pools), [1.5, 3.6, 0.])
+
+
+def test_simulate():
+    """Asserts that the mean value of simulated boosters converges to the expected value.
+    """
+
+    slots = [((('C', False),), 10), ((('M', False), ('R', False)), 1), ((('M', True),), 1)]
+
+    values = simulate(slots, pools, 200000, np.random.RandomState(0))
+
+    assert len(values) == 200000
+    assert values.min() >= 10 * 0.1 + 2. + 30.
+    assert abs(values.mean() - sum(expected_value(slots, pools))) < 0.05
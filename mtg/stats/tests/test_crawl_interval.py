@@ -0,0 +1,17 @@
+import pytest
+
+from ..utils import crawl_interval
+
+
+@pytest.mark.parametrize('prices,available_items,usages,expected', [
+    ([1.], [10], (0, 0), 1),
+    ([1., 1., 1., 1.], [10, 10, 10, 10], (5, 5), 7),
+    ([1., 1.04, 1., 0.97], [10, 10, 10, 10], (5, 5), 4),
+    ([1., 1., 1.], [12, 10, 10], (5, 5), 1),
+    ([1., 1., 1.], [10, 10, 10], (20, 5), 1),
+], ids=['no history', 'stable', 'slightly volatile', 'volume change', 'usage change'])
+def test_crawl_interval(prices, available_items, usages, expected):
+    """Asserts that cards whose price, sales volume or usage move are crawled more often.
+    """
+
+    assert crawl_interval(prices, available_items, usages) == expected
@@ -0,0 +1,23 @@
+from datetime import date
+
+from ..events import price_shock
+
+
+def test_price_shock():
+    """Asserts that price changes above the threshold are shocks, whether prices go up or down.
+    """
+
+    up = price_shock([(date(2017, 5, 3), 15.), (date(2017, 5, 1), 10.), (date(2017, 4, 30), 1.)])
+    down = price_shock([(date(2017, 5, 3), 6.), (date(2017, 5, 2), 10.)])
+
+    assert up == {'previous_date': '2017-05-01', 'previous_price': 10., 'price': 15., 'change': 0.5}
+    assert round(down['change'], 2) == -0.4
+
+
+def test_no_price_shock():
+    """Asserts that small changes, changes of cheap cards, and single prices are not shocks.
+    """
+
+    assert price_shock([(date(2017, 5, 3), 11.), (date(2017, 5, 2), 10.)]) is None
+    assert price_shock([(date(2017, 5, 3), 0.5), (date(2017, 5, 2), 0.1)]) is None
+    assert price_shock([(date(2017, 5, 3), 10.)]) is None
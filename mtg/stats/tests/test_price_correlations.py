@@ -0,0 +1,53 @@
+from datetime import date
+
+import numpy as np
+
+from ..correlations import price_matrix, standardized_returns, top_correlations
+from ..store import CARD_PRICE_DTYPE
+
+
+def card_prices(prices):
+    """Returns a price array as read from the store, from (date, mean price) pairs.
+    """
+
+    array = np.zeros(len(prices), dtype=CARD_PRICE_DTYPE)
+    array['date'] = [np.datetime64(d, 'D') for d, _ in prices]
+    array['mean_price'] = [price for _, price in prices]
+    return array
+
+
+def test_price_matrix():
+    """Asserts that missing prices are filled with the previous known price.
+    """
+
+    prices = {
+        'b': card_prices([(date(2017, 5, 2), 2.), (date(2017, 5, 4), 3.)]),
+        'a': card_prices([(date(2017, 5, 1), 1.), (date(2017, 5, 3), np.nan)]),
+    }
+
+    card_ids, matrix = price_matrix(prices, date(2017, 5, 1), date(2017, 5, 4))
+
+    assert card_ids == ['a', 'b']
+    assert np.array_equal(matrix[:, 0], [1., 1., 1., 1.])
+    assert np.isnan(matrix[0, 1])
+    assert np.array_equal(matrix[1:, 1], [2., 2., 3.])
+
+
+def test_top_correlations():
+    """Asserts that cards are correlated on their returns, and that cards without enough varying prices are skipped.
+    """
+
+    random_state = np.random.RandomState(0)
+    returns = random_state.normal(0, 0.05, size=(30, 2))
+    matrix = np.exp(np.cumsum(np.column_stack([
+        returns[:, 0], returns[:, 0] + random_state.normal(0, 0.01, 30), returns[:, 1], np.zeros(30)
+    ]), axis=0))
+    matrix[:25, 2] = np.nan
+
+    z, columns = standardized_returns(matrix)
+    top = top_correlations(z)
+
+    assert list(columns) == [0, 1]
+    assert [j for j, _ in top[0]] == [1]
+    assert top[0][0][1] > 0.9
+    assert np.isclose(top[0][0][1], top[1][0][1])
@@ -0,0 +1,46 @@
+from datetime import date
+
+import numpy as np
+
+from ..store import to_array, select, iter_months
+
+
+rows = [
+    ('b', date(2017, 5, 1), 0.5, 0.7, 12, None, None),
+    ('a', date(2017, 5, 2), 2., 2.5, 4, 3., 2),
+    ('a', date(2017, 5, 1), 1., None, 3, None, None),
+]
+
+
+def test_to_array():
+    """Asserts that price rows are sorted by card and date, and that null values are converted.
+    """
+
+    prices = to_array(rows)
+
+    assert list(prices['card']) == ['a', 'a', 'b']
+    assert list(prices['date']) == [np.datetime64('2017-05-01'), np.datetime64('2017-05-02'),
+                                    np.datetime64('2017-05-01')]
+    assert np.isnan(prices['mean_price'][0])
+    assert list(prices['available_foils']) == [-1, 2, -1]
+
+
+def test_select():
+    """Asserts that prices of a card are selected between the given dates.
+    """
+
+    prices = to_array(rows)
+
+    assert list(select(prices, 'a')['min_price']) == [1., 2.]
+    assert list(select(prices, 'a', from_date=date(2017, 5, 2))['min_price']) == [2.]
+    assert list(select(prices, 'a', to_date=date(2017, 5, 1))['min_price']) == [1.]
+    assert len(select(prices, 'c')) == 0
+
+
+def test_iter_months():
+    """Asserts that months are iterated across years.
+    """
+
+    assert list(iter_months(date(2017, 11, 15), date(2018, 1, 1))) == [
+        date(2017, 11, 1), date(2017, 12, 1), date(2018, 1, 1)
+    ]
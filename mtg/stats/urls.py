@@ -14,6 +14,8 @@ from . import views
 router = routers.DefaultRouter()
 router.register(r'^stats', views.StatisticsViewSet)
 router.register(r'^prices', views.PriceViewSet)
+router.register(r'^boosters', views.BoosterValueViewSet)
+router.register(r'^alerts', views.MarketEventViewSet)
 
 app_name = 'stats'
 urlpatterns = [
@@ -7,15 +7,21 @@ Contains some utils for stats app
 
 from typing import Dict, Iterator, Tuple, List
 from datetime import date, timedelta
-from statistics import variance, mean
+from statistics import variance, mean, pstdev
 from collections import defaultdict
 
 from .models import Price
-from sets.models import Set
 from cards.models import Card
 from tournaments.models import Tournament
 
 
+# Price crawl intervals (in days), from the most volatile cards to the most stable ones.
+CRAWL_INTERVALS = (1, 2, 4, 7)
+VOLATILITY_THRESHOLD = 0.05
+VOLUME_CHANGE_THRESHOLD = 0.2
+USAGE_CHANGE_THRESHOLD = 0.5
+
+
 def price_feature(card_id: str, d: int) -> List[float]:
     """Returns the mean prices of the card for day d and preceding week (features 1-7).
     """
@@ -40,41 +46,76 @@ def price_difference_feature(card_id: str, d: int) -> List[float]:
     return prices_difference
 
 
-def usage_feature(d: int) -> Iterator[Tuple[str, List[float]]]:
-    """Computes usage difference between day d and each of the previous 6 days (features 14-19).
+def usage_differences(usages: List[float]) -> List[float]:
+    """Returns the differences between the first usage and each of the following ones.
+    """
+
+    if len(usages) > 1:
+        return [usages[0] - usage for usage in usages[1:]]
+    return usages
+
+
+def usage_feature(d: int) -> Iterator[Tuple[str, Dict]]:
+    """Computes usage difference between day d and each of the previous 6 days (features 14-19), as `usages`, and the
+    same differences with copies weighted by finishing position, tournament size and format, as `weighted_usages`.
+    Both are also computed within each format, as `format_usages` and `format_weighted_usages`.
 
     Usage is defined as the ratio between the number of times it appears in every deck and the total of cards
-    that appears in every deck.
+    that appears in every deck (of the format, for format usages).
+
+    Card usages for two weeks are read at once (see Tournament.get_card_usages), and card ids with a single query.
 
     Simple stats: only about 1000 different cards are played in tournaments
     """
 
-    card_id_to_usages = defaultdict(list)
-
     # Gets all cards that have been played for two weeks.
-    all_cards = set(Tournament.get_played_cards(
-        date.today() - timedelta(days=d),
-        date.today() - timedelta(days=d + 13)
-    ))
+    daily_usages = [
+        (event_date, format_id, card_name, copies, weighted)
+        for (event_date, format_id, card_name), (copies, weighted) in Tournament.get_card_usages(
+            date.today() - timedelta(days=d), date.today() - timedelta(days=d + 13)).items()
+    ]
+    formats = sorted({format_id for _, format_id, _, _, _ in daily_usages})
+
+    card_ids = defaultdict(list)
+    for card_id, card_name in Card.objects.filter(
+            name_id__in={card_name for _, _, card_name, _, _ in daily_usages}
+    ).values_list('id', 'name_id'):
+        card_ids[card_name].append(card_id)
+
+    # Maps (Format id, or None for all formats, CardName id) to daily usages and weighted usages
+    series = defaultdict(lambda: ([], []))
 
     for i in range(7):
 
-        played_cards = Tournament.get_played_cards(
-            date.today() - timedelta(days=d + i),
-            date.today() - timedelta(days=d + i + 6)
-        )
-        total = sum(played_cards.values())
-
-        for card_name in all_cards:
-            usage = played_cards.get(card_name, 0) / total
-            for card in Card.objects.filter(name=card_name):
-                card_id_to_usages[card.id].append(usage)
-
-    for card_id, usages in card_id_to_usages.items():
-        if len(usages) > 1:
-            yield card_id, [usages[0] - usage for usage in usages[1:]]
-        else:
-            yield card_id, usages
+        to_date = date.today() - timedelta(days=d + i)
+        from_date = date.today() - timedelta(days=d + i + 6)
+        played_cards = defaultdict(lambda: [0, 0.])
+        totals = defaultdict(lambda: [0, 0.])
+        for event_date, format_id, card_name, copies, weighted in daily_usages:
+            if from_date <= event_date <= to_date:
+                for key in (None, format_id):
+                    played_cards[(key, card_name)][0] += copies
+                    played_cards[(key, card_name)][1] += weighted
+                    totals[key][0] += copies
+                    totals[key][1] += weighted
+
+        for format_id in [None] + formats:
+            total, weighted_total = totals.get(format_id, (0, 0.))
+            for card_name in card_ids:
+                copies, weighted = played_cards.get((format_id, card_name), (0, 0.))
+                series[(format_id, card_name)][0].append(copies / (total or 1))
+                series[(format_id, card_name)][1].append(weighted / (weighted_total or 1))
+
+    for card_name, ids in card_ids.items():
+        usages, weighted_usages = series[(None, card_name)]
+        features = {
+            'usages': usage_differences(usages),
+            'weighted_usages': usage_differences(weighted_usages),
+            'format_usages': {f: usage_differences(series[(f, card_name)][0]) for f in formats},
+            'format_weighted_usages': {f: usage_differences(series[(f, card_name)][1]) for f in formats},
+        }
+        for card_id in ids:
+            yield card_id, features
 
 
 def sales_volume_feature(card_id: str, d: int) -> List[int]:
@@ -103,27 +144,28 @@ def tournament_legality_feature(card_id: str) -> int:
     """Returns the number of days until card loses tournament legality in standard format (feature 27).
     Returns -1 if card is already banned in standard.
 
-    Their are 2 sets every year, and only the last 3 sets are legal at the same time in standard format.
-    To be exact, it is 575 days: Battle for Zendikar release date as October 2, 2015 and became illegal
-    for Amonkhet release on April 28, 2017.
+    The rotation date is the one of the last core set or expansion the card was printed in (see cards.printings).
     """
 
-    t2_rotation = 575
-    legal_types = ('core', 'expansion')
+    rotation_date = Card.objects.filter(id=card_id).values_list(
+        'name__printing_summary__rotation_date', flat=True).get()
+
+    if rotation_date:
+        day_before_exp = rotation_date - date.today()
+        return day_before_exp.days if day_before_exp.days >= 0 else -1
 
-    card_name = Card.objects.get(id=card_id).name
+    return -1
 
-    cards = Card.objects.filter(name=card_name)
-    sets = Set.objects.filter(id__in=[card.set.id for card in cards])
 
-    dates = [s.release_date for s in sets if s.type in legal_types]
+def reprint_feature(card_id: str) -> Tuple[int, int]:
+    """Returns the number of times the card has been reprinted (feature 29), and the number of days since its last
+    reprint, or -1 if it has never been reprinted (feature 30).
+    """
 
-    if dates:
-        most_recent = max(dates)
-        day_before_exp = most_recent + timedelta(t2_rotation) - date.today()
-        return day_before_exp.days if day_before_exp.days >= 0 else -1
+    reprints, last_reprint = Card.objects.filter(id=card_id).values_list(
+        'name__printing_summary__reprints', 'name__printing_summary__last_reprint').get()
 
-    return -1
+    return reprints or 0, (date.today() - last_reprint).days if last_reprint else -1
 
 
 def price_variance_feature(card_id: str, d: int) -> float:
@@ -136,6 +178,32 @@ def price_variance_feature(card_id: str, d: int) -> float:
     return variance(prices)
 
 
+def crawl_interval(prices: List[float], available_items: List[int], usages: Tuple[int, int]) -> int:
+    """Returns the number of days to wait before crawling again the price of a card.
+
+    Prices and available items are the ones of past week, most recent first, and usages the number of copies played
+    in tournaments during the last week and the previous one. Cards whose relative price variation, sales volume
+    change or usage change is high are crawled every day, stable ones down to once a week.
+    """
+
+    if len(prices) <= 1:
+        return CRAWL_INTERVALS[0]
+
+    volatility = pstdev(prices) / mean(prices) if mean(prices) else 0
+    volume_change = abs(available_items[0] - available_items[-1]) / max(available_items[-1], 1)
+    usage_change = abs(usages[0] - usages[1]) / max(usages[1], 1)
+
+    score = max(
+        volatility / VOLATILITY_THRESHOLD,
+        volume_change / VOLUME_CHANGE_THRESHOLD,
+        usage_change / USAGE_CHANGE_THRESHOLD
+    )
+    for interval, min_score in zip(CRAWL_INTERVALS, (1, 1 / 2, 1 / 4)):
+        if score >= min_score:
+            return interval
+    return CRAWL_INTERVALS[-1]
+
+
 def get_labels(card_id: str, d: int) -> Dict[int, bool]:
     """Returns the labels.
         - label_1: True if price on day d is less than average price over following week,
@@ -5,16 +5,19 @@ Contains views for stats app
 """
 
 
-from datetime import date
+from datetime import date, timedelta
 
 from django.http import HttpResponse
-from rest_framework import viewsets
+from django.shortcuts import get_object_or_404
+from rest_framework import status, viewsets
 from rest_framework.decorators import list_route
 from rest_framework.response import Response
 
 from . import serializers
 from . import tasks
-from .models import Price, Statistics
+from . import boosters
+from .models import Price, Statistics, BoosterValue, MarketEvent
+from sets.models import Booster
 
 
 class PriceViewSet(viewsets.ReadOnlyModelViewSet):
@@ -59,6 +62,58 @@ class StatisticsViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
+class BoosterValueViewSet(viewsets.ReadOnlyModelViewSet):
+    """A view that allow the user to get the value of the boosters of a set: the expected value of a booster, and the
+    distribution of the values of simulated boosters. Values are computed once per set per day, by a task.
+    """
+
+    queryset = BoosterValue.objects.select_related('set').order_by('-date', '-expected_value')
+    serializer_class = serializers.BoosterValueSerializer
+    lookup_field = 'set'
+
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        """Returns today's booster value of the given set (e.g. `/stats/boosters/MM3/`).
+
+        If it has not been computed yet, its computation is queued, and the expected value is returned without
+        simulation, with a 202 status.
+        """
+
+        booster = get_object_or_404(Booster.objects.filter(slot__isnull=False).select_related('set').distinct(),
+                                    set_id=kwargs['set'])
+        try:
+            booster_value = BoosterValue.objects.get(set_id=booster.set_id, date=date.today())
+        except BoosterValue.DoesNotExist:
+            tasks.compute_booster_value.delay(booster.set_id)
+            serializer = self.get_serializer(boosters.estimate_booster_value(booster.set))
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+        serializer = self.get_serializer(booster_value)
+        return Response(serializer.data)
+
+
+class MarketEventViewSet(viewsets.ReadOnlyModelViewSet):
+    """A view that allow the user to get the market alerts: legality changes and price shocks, from the most recent.
+
+    Alerts can be filtered by `?kind=legality` or `?kind=price`, and by dates with `?days=30` (defaults to 7 days).
+    They can be polled with `?after=<id>`, which only returns the alerts created after the given one.
+    """
+
+    queryset = MarketEvent.objects.order_by('-id')
+    serializer_class = serializers.MarketEventSerializer
+
+    def get_queryset(self):
+        params = self.request.query_params
+        market_events = super().get_queryset()
+
+        if params.get('kind'):
+            market_events = market_events.filter(kind=params['kind'])
+        if params.get('after', '').isdigit():
+            market_events = market_events.filter(id__gt=int(params['after']))
+
+        days = int(params['days']) if params.get('days', '').isdigit() else 7
+        return market_events.filter(date__gte=date.today() - timedelta(days=days))
+
+
 def harvest_prices(request):
     """Temporary view to get all cards prices.
     """
@@ -0,0 +1,96 @@
+"""
+@author: Thomas PERROT
+
+Contains the watch evaluation for stats app.
+
+All active watches are evaluated by a single UPDATE statement, which compares them with the latest price or statistics
+of their card, and flips the `triggered` flag of the watches whose threshold has just been crossed (or uncrossed).
+Users are then notified by email of the watches which have just been triggered.
+"""
+
+
+from typing import Dict, List, Tuple
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Watch
+
+
+EVALUATE_SQL = """
+    WITH latest_prices AS (
+        SELECT DISTINCT ON (card_id) card_id, mean_price AS value
+        FROM stats_price
+        WHERE card_id IN (SELECT card_id FROM stats_watch WHERE is_active AND metric = '{mean_price}')
+            AND mean_price IS NOT NULL
+        ORDER BY card_id, date DESC
+    ), latest_statistics AS (
+        SELECT DISTINCT ON (card_id) card_id, price_ratio AS value
+        FROM stats_statistics
+        WHERE card_id IN (SELECT card_id FROM stats_watch WHERE is_active AND metric = '{price_ratio}')
+        ORDER BY card_id, date DESC
+    ), metric_values AS (
+        SELECT '{mean_price}' AS metric, card_id, value FROM latest_prices
+        UNION ALL
+        SELECT '{price_ratio}' AS metric, card_id, value FROM latest_statistics
+    ), evaluated AS (
+        SELECT
+            w.id,
+            v.value,
+            (w.operator = '{above}' AND v.value > w.threshold) OR (w.operator = '{below}' AND v.value < w.threshold)
+                AS crossed
+        FROM stats_watch w
+        JOIN metric_values v ON v.card_id = w.card_id AND v.metric = w.metric
+        WHERE w.is_active
+    )
+    UPDATE stats_watch w
+    SET triggered = e.crossed, last_triggered = CASE WHEN e.crossed THEN %s ELSE w.last_triggered END
+    FROM evaluated e
+    WHERE w.id = e.id AND w.triggered <> e.crossed
+    RETURNING w.id, e.value, e.crossed
+""".format(mean_price=Watch.MEAN_PRICE, price_ratio=Watch.PRICE_RATIO, above=Watch.ABOVE, below=Watch.BELOW)
+
+EMAIL_SUBJECT = 'Your watched cards crossed their threshold'
+
+
+@transaction.atomic
+def evaluate_watches() -> Dict[int, float]:
+    """Evaluates every active watch against the latest value of its metric, and returns the value of the metric of
+    the watches which have just been triggered.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(EVALUATE_SQL, [timezone.now()])
+        return {watch_id: value for watch_id, value, crossed in cursor.fetchall() if crossed}
+
+
+def build_emails(triggered: Dict[int, float]) -> List[Tuple[str, str, str, List[str]]]:
+    """Returns one email per user (as expected by send_mass_mail), listing their triggered watches.
+
+    Users without email address are skipped.
+    """
+
+    lines = defaultdict(list)
+    for watch in Watch.objects.filter(id__in=list(triggered)).select_related('user', 'card__set').order_by('id'):
+        if watch.user.email:
+            lines[watch.user.email].append('- {} ({}): {} is {} {} ({:.2f})'.format(
+                watch.card.name_id, watch.card.set.name, watch.get_metric_display(), watch.operator,
+                watch.threshold, triggered[watch.id]))
+
+    return [(EMAIL_SUBJECT, '\n'.join(user_lines), settings.DEFAULT_FROM_EMAIL, [email])
+            for email, user_lines in sorted(lines.items())]
+
+
+def notify_watches() -> int:
+    """Evaluates the watches, and emails their users about the ones which have just been triggered.
+
+    Returns the number of triggered watches.
+    """
+
+    triggered = evaluate_watches()
+    if triggered:
+        send_mass_mail(build_emails(triggered))
+    return len(triggered)
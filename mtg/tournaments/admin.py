@@ -7,7 +7,8 @@ Contains admin settings for tournaments app
 
 from django.contrib import admin
 
-from .models import Tournament, Deck, DeckPosition, DeckToCard
+from .models import (Format, Tournament, Deck, DeckPosition, DeckToCard, BackfillCheckpoint, DeckSummary, Archetype,
+                     MetagameShare, CardUsage, CardCooccurrence)
 
 
 class DeckPositionInline(admin.TabularInline):
@@ -23,6 +24,12 @@ class DeckToCardInline(admin.TabularInline):
     extra = 1
 
 
+@admin.register(Format)
+class FormatAdmin(admin.ModelAdmin):
+    list_display = ('name', 'usage_weight', 'relevance_days', 'relevance_min_usage', 'relevance_rarities')
+    list_editable = ('usage_weight', 'relevance_days', 'relevance_min_usage', 'relevance_rarities')
+
+
 @admin.register(Tournament)
 class TournamentAdmin(admin.ModelAdmin):
     inlines = (DeckPositionInline,)
@@ -35,5 +42,38 @@ class DeckAdmin(admin.ModelAdmin):
     search_fields = ('id', 'name', 'owner', 'cards__name',)
 
 
+@admin.register(BackfillCheckpoint)
+class BackfillCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('format', 'from_date', 'to_date', 'page', 'done', 'updated')
+
+
+@admin.register(Archetype)
+class ArchetypeAdmin(admin.ModelAdmin):
+    list_display = ('name', 'format', 'created')
+    list_filter = ('format',)
+    search_fields = ('name',)
+    exclude = ('signature',)
+
+
+@admin.register(MetagameShare)
+class MetagameShareAdmin(admin.ModelAdmin):
+    list_display = ('format', 'date', 'name', 'decks', 'share', 'top8_share')
+    list_filter = ('format',)
+
+
+@admin.register(CardUsage)
+class CardUsageAdmin(admin.ModelAdmin):
+    list_display = ('date', 'format', 'card_name', 'copies', 'weighted')
+    list_filter = ('format',)
+    search_fields = ('card_name__name',)
+
+
+@admin.register(CardCooccurrence)
+class CardCooccurrenceAdmin(admin.ModelAdmin):
+    list_display = ('card_name', 'other', 'decks', 'score')
+    search_fields = ('card_name__name',)
+
+
 admin.site.register(DeckPosition)
 admin.site.register(DeckToCard)
+admin.site.register(DeckSummary)
@@ -0,0 +1,182 @@
+"""
+@author: Thomas PERROT
+
+Contains the deck archetype clustering for tournaments app.
+
+Main decks are seen as multisets of cards (e.g. 4 Tarmogoyf gives the tokens `Tarmogoyf#0` to `Tarmogoyf#3`), and
+summarized by MinHash signatures whose agreement estimates the Jaccard similarity of two decks. Locality sensitive
+hashing over bands of the signatures finds the archetypes a deck may belong to without comparing it to every archetype,
+so new decks are clustered incrementally: a deck joins the most similar archetype of its format, or founds a new one.
+"""
+
+
+from typing import Dict, Iterable, List, Tuple
+from collections import Counter, defaultdict
+import zlib
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Archetype, Deck, DeckPosition, DeckToCard, Format
+
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+# Decks share an archetype when the estimated Jaccard similarity of their main decks is above this threshold, which is
+# close to the similarity at which LSH finds half of the candidates ((1 / BANDS) ** (1 / ROWS)).
+SIMILARITY_THRESHOLD = 0.5
+
+# Permutations are (a * x + b) mod PRIME, with a fixed seed so that stored signatures stay comparable.
+PRIME = (1 << 31) - 1
+_random_state = np.random.RandomState(42)
+PERMUTATION_A = _random_state.randint(1, PRIME, NUM_PERMUTATIONS).astype(np.uint64)
+PERMUTATION_B = _random_state.randint(0, PRIME, NUM_PERMUTATIONS).astype(np.uint64)
+
+
+def deck_tokens(cards: Iterable[Tuple[str, int]]) -> List[str]:
+    """Returns the tokens of a main deck given as (card name, number) pairs, one per copy of a card.
+    """
+
+    return ['{}#{}'.format(name, i) for name, number in cards for i in range(number)]
+
+
+def minhash_signature(tokens: Iterable[str]) -> np.ndarray:
+    """Returns the MinHash signature of the given tokens.
+    """
+
+    hashes = np.array([zlib.crc32(token.encode()) % PRIME for token in tokens], dtype=np.uint64)
+    if not len(hashes):
+        return np.full(NUM_PERMUTATIONS, PRIME, dtype=np.uint64)
+    return ((PERMUTATION_A[:, None] * hashes[None, :] + PERMUTATION_B[:, None]) % PRIME).min(axis=1)
+
+
+def band_keys(signature: np.ndarray) -> List[Tuple[int, int]]:
+    """Returns the LSH bucket of the signature in each band, as (band, hash of the band rows) pairs.
+    """
+
+    return [(band, zlib.crc32(signature[band * ROWS:(band + 1) * ROWS].tobytes())) for band in range(BANDS)]
+
+
+def similarity(signature: np.ndarray, other: np.ndarray) -> float:
+    """Returns the Jaccard similarity estimated from two MinHash signatures.
+    """
+
+    return float(np.mean(signature == other))
+
+
+class ArchetypeIndex:
+    """LSH index of the archetypes of a format, which assigns decks to archetypes and creates the missing ones.
+    """
+
+    def __init__(self, format_id: str) -> None:
+        self.format_id = format_id
+        self.signatures = []
+        self.archetypes = []
+        self.buckets = defaultdict(list)
+        self.created = []
+        for archetype in Archetype.objects.filter(format_id=format_id).order_by('id'):
+            self.add(archetype, np.array(archetype.signature, dtype=np.uint64))
+
+    def add(self, archetype: Archetype, signature: np.ndarray) -> None:
+        for key in band_keys(signature):
+            self.buckets[key].append(len(self.archetypes))
+        self.archetypes.append(archetype)
+        self.signatures.append(signature)
+
+    def assign(self, signature: np.ndarray, deck_name: str) -> Archetype:
+        """Returns the most similar archetype to the given deck signature, or a new (unsaved) archetype if no one is
+        similar enough.
+        """
+
+        candidates = {i for key in band_keys(signature) for i in self.buckets.get(key, [])}
+        best = max(candidates, key=lambda i: similarity(signature, self.signatures[i]), default=None)
+        if best is not None and similarity(signature, self.signatures[best]) >= SIMILARITY_THRESHOLD:
+            return self.archetypes[best]
+
+        archetype = Archetype(format_id=self.format_id, name=deck_name,
+                              signature=[int(value) for value in signature])
+        self.add(archetype, signature)
+        self.created.append(archetype)
+        return archetype
+
+
+def name_archetypes(archetype_ids: Iterable[int]) -> None:
+    """Names the given archetypes after the most common name of their decks.
+    """
+
+    names = defaultdict(Counter)
+    for archetype_id, name, count in Deck.objects.filter(
+            archetype_id__in=list(archetype_ids)
+    ).exclude(
+        name=''
+    ).values_list(
+        'archetype_id', 'name'
+    ).annotate(
+        count=Count('id')
+    ):
+        names[archetype_id][name] = count
+
+    for archetype_id, counter in names.items():
+        Archetype.objects.filter(id=archetype_id).update(name=counter.most_common(1)[0][0])
+
+
+def cluster_decks(deck_ids: Iterable[int]=None) -> Dict[int, int]:
+    """Assigns an archetype to the given decks (or to every deck without archetype), creating archetypes as needed.
+
+    Decks of a format are clustered while holding a lock on the format, so that concurrent clusterings do not create
+    the same archetype twice. The lock is held until the end of the transaction, so this must not be called from a
+    transaction storing decks (see tournaments.tasks.process_new_decks). Returns the archetype id of each clustered
+    deck.
+    """
+
+    positions = DeckPosition.objects.filter(deck__archetype__isnull=True)
+    if deck_ids is not None:
+        positions = positions.filter(deck_id__in=list(deck_ids))
+    deck_formats = dict(positions.values_list('deck_id', 'tournament__format_id'))
+    if not deck_formats:
+        return {}
+
+    deck_names = dict(Deck.objects.filter(id__in=deck_formats).values_list('id', 'name'))
+    deck_cards = defaultdict(list)
+    for deck_id, card_name, number in DeckToCard.objects.filter(
+            deck_id__in=deck_formats,
+            sideboard=False
+    ).values_list(
+        'deck_id', 'card_name_id', 'number'
+    ).order_by(
+        'deck_id', 'card_name_id'
+    ):
+        deck_cards[deck_id].append((card_name, number))
+
+    format_decks = defaultdict(list)
+    for deck_id, format_id in deck_formats.items():
+        # Decks without cards yet are clustered once their cards are stored
+        if deck_cards[deck_id]:
+            format_decks[format_id].append(deck_id)
+
+    assigned = {}
+    with transaction.atomic():
+        list(Format.objects.select_for_update().filter(name__in=format_decks).order_by('name'))
+
+        for format_id, format_deck_ids in format_decks.items():
+            index = ArchetypeIndex(format_id)
+            deck_archetypes = {
+                deck_id: index.assign(minhash_signature(deck_tokens(deck_cards[deck_id])), deck_names[deck_id])
+                for deck_id in format_deck_ids
+            }
+
+            # Primary keys of bulk created objects are set on PostgreSQL
+            Archetype.objects.bulk_create(index.created)
+
+            archetype_decks = defaultdict(list)
+            for deck_id, archetype in deck_archetypes.items():
+                archetype_decks[archetype.pk].append(deck_id)
+                assigned[deck_id] = archetype.pk
+            for archetype_id, archetype_deck_ids in archetype_decks.items():
+                Deck.objects.filter(id__in=archetype_deck_ids).update(archetype_id=archetype_id)
+
+        name_archetypes(set(assigned.values()))
+
+    return assigned
@@ -0,0 +1,176 @@
+"""
+@author: Thomas PERROT
+
+Contains the card co-occurrence index for tournaments app.
+
+Decks are rows of a sparse binary matrix X over card names, so that X.T @ X counts the decks in which each pair of
+cards is played together. The counts are kept in a NumPy file and updated with the decks stored since the last update
+only. The most co-occurring cards of the cards whose counts changed, and of the cards played with them, are stored in
+the CardCooccurrence table.
+"""
+
+
+from typing import Dict, Iterable, List, Tuple
+from collections import defaultdict
+import os
+
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+from django.db import transaction
+
+from .models import CardCooccurrence, Deck, DeckToCard
+
+
+# Number of co-occurring cards stored for each card
+TOP_COOCCURRENCES = 20
+# Decks loaded at once when updating the index
+DECK_CHUNK_SIZE = 5000
+
+
+class CooccurrenceIndex:
+    """Co-occurrence counts of card names, with the ids of the decks they were computed from.
+
+    `counts[i, j]` is the number of decks playing both `names[i]` and `names[j]`, and `counts[i, i]` the number of
+    decks playing `names[i]`.
+    """
+
+    def __init__(self, names: List[str]=None, counts: sp.csr_matrix=None, deck_ids: Iterable[int]=()) -> None:
+        self.names = list(names or [])
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.counts = counts if counts is not None else sp.csr_matrix((0, 0), dtype=np.int32)
+        self.deck_ids = set(deck_ids)
+        self._diagonal = None
+
+    @property
+    def diagonal(self) -> np.ndarray:
+        """Number of decks playing each card name.
+        """
+
+        if self._diagonal is None:
+            self._diagonal = self.counts.diagonal()
+        return self._diagonal
+
+    @classmethod
+    def load(cls, path: str=None) -> 'CooccurrenceIndex':
+        """Loads the index from the given file, or returns an empty index if it does not exist yet.
+        """
+
+        path = path or settings.COOCCURRENCE_PATH
+        if not os.path.exists(path):
+            return cls()
+
+        with np.load(path) as f:
+            counts = sp.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+            return cls([str(name) for name in f['names']], counts, f['deck_ids'].tolist())
+
+    def save(self, path: str=None) -> None:
+        """Saves the index to the given file, atomically.
+        """
+
+        path = path or settings.COOCCURRENCE_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, names=np.array(self.names, dtype=str), data=self.counts.data, indices=self.counts.indices,
+                     indptr=self.counts.indptr, shape=np.array(self.counts.shape),
+                     deck_ids=np.array(sorted(self.deck_ids), dtype=np.int64))
+        os.replace(tmp_path, path)
+
+    def add_decks(self, decks: Dict[int, Iterable[str]]) -> List[int]:
+        """Adds the co-occurrences of the given decks, mapping deck ids to card names.
+
+        Returns the positions of the card names of the added decks.
+        """
+
+        decks = {deck_id: set(names) for deck_id, names in decks.items() if deck_id not in self.deck_ids}
+        for names in decks.values():
+            for name in sorted(names):
+                if name not in self.positions:
+                    self.positions[name] = len(self.names)
+                    self.names.append(name)
+
+        rows = [i for i, names in enumerate(decks.values()) for _ in names]
+        columns = [self.positions[name] for names in decks.values() for name in names]
+        x = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)), shape=(len(decks), len(self.names)))
+
+        counts = self.counts
+        if counts.shape[0] < len(self.names):
+            counts = sp.csr_matrix((counts.data, counts.indices, np.concatenate([
+                counts.indptr, np.full(len(self.names) - counts.shape[0], counts.indptr[-1], dtype=counts.indptr.dtype)
+            ])), shape=(len(self.names), len(self.names)))
+        self.counts = (counts + x.T.dot(x)).tocsr()
+        self.deck_ids |= set(decks)
+        self._diagonal = None
+
+        return sorted(set(columns))
+
+    def neighbours(self, positions: Iterable[int]) -> List[int]:
+        """Returns the given positions and the positions of the card names played with them, i.e. the card names
+        whose top co-occurrences may change when the given ones are played in new decks (since the Jaccard similarity
+        depends on the number of decks playing each card).
+        """
+
+        positions = sorted(set(positions))
+        if not positions:
+            return []
+        return sorted(set(positions) | set(self.counts[positions].indices.tolist()))
+
+    def top_cooccurrences(self, position: int, k: int=TOP_COOCCURRENCES) -> List[Tuple[str, int, float]]:
+        """Returns the k card names most often played with the card name at the given position, with the number of
+        decks playing both, and their Jaccard similarity (decks playing both over decks playing either).
+        """
+
+        row = self.counts.getrow(position)
+        others = row.indices != position
+        indices, decks = row.indices[others], row.data[others]
+        scores = decks / (self.diagonal[position] + self.diagonal[indices] - decks)
+
+        best = np.argsort(-scores, kind='mergesort')[:k]
+        return [(self.names[indices[i]], int(decks[i]), float(scores[i])) for i in best]
+
+
+def iter_new_decks(known_deck_ids: Iterable[int]) -> Iterable[Dict[int, List[str]]]:
+    """Yields the card names of the decks which are not known, by chunks of decks.
+    """
+
+    known_deck_ids = set(known_deck_ids)
+    new_deck_ids = sorted(set(Deck.objects.values_list('id', flat=True)) - known_deck_ids)
+
+    for start in range(0, len(new_deck_ids), DECK_CHUNK_SIZE):
+        decks = defaultdict(list)
+        for deck_id, card_name in DeckToCard.objects.filter(
+                deck_id__in=new_deck_ids[start:start + DECK_CHUNK_SIZE]
+        ).values_list('deck_id', 'card_name_id'):
+            decks[deck_id].append(card_name)
+        yield decks
+
+
+def update_cooccurrences(path: str=None) -> int:
+    """Adds the decks stored since the last update to the co-occurrence index, and stores the top co-occurrences of
+    the cards they play and of the cards played with them.
+
+    Returns the number of cards whose top co-occurrences have been stored.
+    """
+
+    index = CooccurrenceIndex.load(path)
+    positions = set()
+    for decks in iter_new_decks(index.deck_ids):
+        positions.update(index.add_decks(decks))
+
+    positions = index.neighbours(positions)
+    if not positions:
+        return 0
+
+    names = [index.names[position] for position in positions]
+    with transaction.atomic():
+        CardCooccurrence.objects.filter(card_name_id__in=names).delete()
+        CardCooccurrence.objects.bulk_create(
+            CardCooccurrence(card_name_id=index.names[position], other_id=other, decks=decks, score=score)
+            for position in positions for other, decks, score in index.top_cooccurrences(position)
+        )
+
+    # Saved once the table is up to date, so that a failure replays the same decks
+    index.save(path)
+
+    return len(positions)
@@ -0,0 +1,45 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to backfill historical tournaments
+"""
+
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tournaments.tasks import FORMATS, backfill_tournaments, retry_backfill_tournaments
+
+
+class Command(BaseCommand):
+    help = 'Harvests the mtgtop8 tournaments archive between two dates (YYYY-MM-DD). Resumes from the last ' \
+           'checkpoint of each format unless --restart is given.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('from_date')
+        parser.add_argument('to_date')
+        parser.add_argument('--format', dest='formats', action='append', choices=list(FORMATS),
+                            help='Format to backfill. Can be repeated. Defaults to all formats.')
+        parser.add_argument('--restart', action='store_true', help='Starts again from the first archive page.')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Only crawls again the backfilled tournaments whose decks were not stored.')
+
+    def handle(self, *args, **options):
+        try:
+            from_date = datetime.strptime(options['from_date'], '%Y-%m-%d').date()
+            to_date = datetime.strptime(options['to_date'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Dates must be formatted as YYYY-MM-DD')
+        if from_date > to_date:
+            raise CommandError('from_date must be before to_date')
+
+        for tournament_format in options['formats'] or FORMATS:
+            if options['retry_failed']:
+                retry_backfill_tournaments.delay(tournament_format, from_date.isoformat(), to_date.isoformat())
+                self.stdout.write('Retrying failed tournaments of format {}...'.format(tournament_format))
+                continue
+
+            page = 1 if options['restart'] else None
+            backfill_tournaments.delay(tournament_format, from_date.isoformat(), to_date.isoformat(), page)
+            self.stdout.write('Backfilling format {}...'.format(tournament_format))
@@ -0,0 +1,43 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to cluster decks into archetypes
+"""
+
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tournaments.archetypes import cluster_decks
+from tournaments.metagame import refresh_decks_metagame, refresh_format_metagame
+from tournaments.models import Archetype, Deck, Format
+
+
+class Command(BaseCommand):
+    help = 'Assigns an archetype to every deck without one. With --reset, archetypes (and metagame shares) are ' \
+           'built again from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Deletes existing archetypes first.')
+        parser.add_argument('--format', dest='formats', action='append',
+                            help='Only resets archetypes of the given format (can be repeated).')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            archetypes = Archetype.objects.all()
+            if options['formats']:
+                archetypes = archetypes.filter(format_id__in=options['formats'])
+            with transaction.atomic():
+                Deck.objects.filter(archetype__in=archetypes).update(archetype=None)
+                archetypes.delete()
+
+        assigned = cluster_decks()
+        self.stdout.write('Assigned {} decks to {} archetypes'.format(len(assigned), len(set(assigned.values()))))
+
+        if options['reset']:
+            for format_id in options['formats'] or Format.objects.values_list('name', flat=True):
+                count = refresh_format_metagame(format_id)
+                self.stdout.write('Refreshed {} metagame shares for format {}'.format(count, format_id))
+        else:
+            count = refresh_decks_metagame(assigned)
+            self.stdout.write('Refreshed {} metagame shares'.format(count))
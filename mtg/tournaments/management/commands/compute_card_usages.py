@@ -0,0 +1,49 @@
+"""
+@author: Thomas PERROT
+
+Contains the command to compute the card usage aggregate
+"""
+
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from tournaments.models import CardUsage, Tournament
+from tournaments.usages import refresh_card_usages
+
+
+class Command(BaseCommand):
+    help = 'Computes the card usages of every format between two dates (YYYY-MM-DD, included, defaults to the whole ' \
+           'tournament history), replacing the existing ones. It has to be run once on deployment to backfill the ' \
+           'aggregate, which is what --if-empty does.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('from_date', nargs='?')
+        parser.add_argument('to_date', nargs='?')
+        parser.add_argument('--format', dest='format_id', help='Only computes card usages of the given format.')
+        parser.add_argument('--if-empty', action='store_true',
+                            help='Only computes card usages if none has been computed yet.')
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and CardUsage.objects.exists():
+            self.stdout.write('Card usages already computed')
+            return
+
+        dates = Tournament.objects.aggregate(first=Min('event_date'), last=Max('event_date'))
+        try:
+            from_date = datetime.strptime(options['from_date'], '%Y-%m-%d').date() \
+                if options['from_date'] else dates['first']
+            to_date = datetime.strptime(options['to_date'], '%Y-%m-%d').date() \
+                if options['to_date'] else dates['last']
+        except ValueError as err:
+            raise CommandError(err)
+        if from_date is None or to_date is None:
+            self.stdout.write('No tournament')
+            return
+        if from_date > to_date:
+            raise CommandError('from_date must be before to_date')
+
+        count = refresh_card_usages(from_date, to_date, options['format_id'])
+        self.stdout.write('Computed {} card usages'.format(count))
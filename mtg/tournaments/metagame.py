@@ -0,0 +1,112 @@
+"""
+@author: Thomas PERROT
+
+Contains the metagame computation for tournaments app.
+
+The share of each archetype (or deck name, for decks without archetype) among the decks of a format on a given day
+is computed by PostgreSQL with window functions, and stored in the MetagameShare table.
+"""
+
+
+from typing import Dict, Iterable, List
+from collections import OrderedDict
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Max, Min, QuerySet
+
+from .models import DeckPosition, MetagameShare, Tournament
+
+
+# Positions counted as top 8 finishes
+TOP8_POSITION = 8
+
+DELETE_SQL = """
+    DELETE FROM tournaments_metagameshare WHERE format_id = %s AND date BETWEEN %s AND %s
+"""
+
+INSERT_SQL = """
+    INSERT INTO tournaments_metagameshare (format_id, date, archetype_id, name, decks, top8_decks, share, top8_share)
+    SELECT
+        format_id, date, archetype_id, name, decks, top8_decks,
+        decks::float / SUM(decks) OVER day,
+        COALESCE(top8_decks::float / NULLIF(SUM(top8_decks) OVER day, 0), 0)
+    FROM (
+        SELECT
+            t.format_id,
+            t.event_date AS date,
+            d.archetype_id,
+            COALESCE(a.name, d.name) AS name,
+            COUNT(*) AS decks,
+            COUNT(*) FILTER (WHERE p.position <= %s) AS top8_decks
+        FROM tournaments_deckposition p
+        JOIN tournaments_tournament t ON t.id = p.tournament_id
+        JOIN tournaments_deck d ON d.id = p.deck_id
+        LEFT JOIN tournaments_archetype a ON a.id = d.archetype_id
+        WHERE t.format_id = %s AND t.event_date BETWEEN %s AND %s
+        GROUP BY t.format_id, t.event_date, d.archetype_id, COALESCE(a.name, d.name)
+    ) counts
+    WINDOW day AS (PARTITION BY format_id, date)
+"""
+
+
+@transaction.atomic
+def refresh_metagame(format_id: str, from_date: date, to_date: date) -> int:
+    """Recomputes the metagame shares of the given format between the given dates (included).
+
+    Returns the number of stored shares.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(DELETE_SQL, [format_id, from_date, to_date])
+        cursor.execute(INSERT_SQL, [TOP8_POSITION, format_id, from_date, to_date])
+        return cursor.rowcount
+
+
+def refresh_tournament_metagame(tournament_id: int) -> int:
+    """Recomputes the metagame shares of the day and format of the given tournament.
+    """
+
+    format_id, event_date = Tournament.objects.values_list('format_id', 'event_date').get(id=tournament_id)
+    return refresh_metagame(format_id, event_date, event_date)
+
+
+def refresh_format_metagame(format_id: str) -> int:
+    """Recomputes all the metagame shares of the given format (e.g. after its archetypes have been rebuilt).
+    """
+
+    dates = Tournament.objects.filter(format_id=format_id).aggregate(first=Min('event_date'), last=Max('event_date'))
+    if dates['first'] is None:
+        return 0
+    return refresh_metagame(format_id, dates['first'], dates['last'])
+
+
+def refresh_decks_metagame(deck_ids: Iterable[int]) -> int:
+    """Recomputes the metagame shares of the days and formats of the tournaments the given decks were played in (e.g.
+    once they have been assigned an archetype).
+    """
+
+    days = DeckPosition.objects.filter(
+        deck_id__in=list(deck_ids)
+    ).values_list(
+        'tournament__format_id', 'tournament__event_date'
+    ).distinct()
+    return sum(refresh_metagame(format_id, event_date, event_date) for format_id, event_date in days)
+
+
+def time_series(shares: QuerySet) -> List[Dict]:
+    """Groups the given metagame shares by archetype (or deck name), as lists of daily points.
+
+    Series are sorted by decreasing number of decks.
+    """
+
+    series = OrderedDict()
+    for share in shares.order_by('date').values('archetype_id', 'name', 'date', 'decks', 'share', 'top8_share'):
+        key = share['archetype_id'] or share['name']
+        if key not in series:
+            series[key] = {'archetype': share['archetype_id'], 'name': share['name'], 'decks': 0, 'points': []}
+        series[key]['decks'] += share['decks']
+        series[key]['points'].append({'date': share['date'], 'share': share['share'],
+                                      'top8_share': share['top8_share']})
+
+    return sorted(series.values(), key=lambda s: -s['decks'])
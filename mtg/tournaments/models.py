@@ -5,10 +5,12 @@ Contains models for tournaments app
 """
 
 
-from typing import Dict
+from typing import Dict, Tuple
 from collections import defaultdict
 from datetime import date
+import math
 
+from django.contrib.postgres.fields import ArrayField, JSONField
 from django.db import models
 
 from cards.models import Card, CardName
@@ -27,6 +29,13 @@ class Format(models.Model):
     )
 
     name = models.CharField(max_length=100, primary_key=True, choices=FORMATS)
+    usage_weight = models.FloatField(default=1.)  # weight of the cards played in this format in weighted usages
+
+    # Relevance rules: cards of the given rarities whose share of the copies played in this format for the last
+    # relevance_days days is at least relevance_min_usage are relevant.
+    relevance_days = models.PositiveSmallIntegerField(default=14)
+    relevance_min_usage = models.FloatField(default=0.)
+    relevance_rarities = models.CharField(max_length=6, default='RM')
     legalities = models.ManyToManyField(
         Card,
         through='Legality',
@@ -37,6 +46,20 @@ class Format(models.Model):
         return self.name.capitalize()
 
 
+class Archetype(models.Model):
+    """Class which represents a deck archetype of a format, i.e. a cluster of similar decks (see
+    tournaments.archetypes). It is named after the most common name of its decks.
+    """
+
+    format = models.ForeignKey(Format, on_delete=models.CASCADE, related_name='archetypes')
+    name = models.CharField(max_length=50, blank=True)
+    signature = ArrayField(models.BigIntegerField())  # MinHash signature of the deck which founded the archetype
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return '{} ({})'.format(self.name, self.format)
+
+
 class Deck(models.Model):
     """Class which represents a deck.
     """
@@ -45,6 +68,7 @@ class Deck(models.Model):
     name = models.CharField(max_length=50, blank=True)
     owner = models.CharField(max_length=50, blank=True)
     cards = models.ManyToManyField(CardName, through='DeckToCard')
+    archetype = models.ForeignKey(Archetype, on_delete=models.SET_NULL, blank=True, null=True, related_name='decks')
 
     def __str__(self) -> str:
         return '{} ({})'.format(self.name, self.owner)
@@ -54,6 +78,9 @@ class Tournament(models.Model):
     """Class which represents a tournament.
     """
 
+    # Number of decks of a tournament whose cards have a usage weight of 1 (for the winner)
+    REFERENCE_SIZE = 8
+
     id = models.SmallIntegerField(primary_key=True)
     name = models.CharField(max_length=100)
     event_date = models.DateField()
@@ -67,9 +94,13 @@ class Tournament(models.Model):
         ordering = ['-event_date']
 
     @classmethod
-    def get_played_cards(cls, to_date: date=None, from_date: date=None) -> Dict[str, int]:
-        """Gets all cards that have been played in tournaments between date_1 and date_2.
-        Returns a dictionary mapping CardName id with the number of times it has been played.
+    def compute_card_usages(cls, to_date: date=None, from_date: date=None,
+                            format_id: str=None) -> Dict[Tuple[date, str, str], Tuple[int, float]]:
+        """Aggregates the cards played in tournaments between from_date and to_date (of the given format only if set),
+        with two queries. Decks without tournament are skipped.
+
+        Returns a dictionary mapping (event date, Format id, CardName id) to the number of times the card has been
+        played, and to its weighted number of plays (see usage_weight).
         """
 
         kwargs = {}
@@ -77,17 +108,93 @@ class Tournament(models.Model):
             kwargs['event_date__lte'] = to_date
         if from_date:
             kwargs['event_date__gte'] = from_date
-        tournaments = cls.objects.filter(**kwargs)
+        if format_id:
+            kwargs['format_id'] = format_id
+
+        tournaments = {
+            tournament_id: (event_date, tournament_format, size, format_weight)
+            for tournament_id, event_date, tournament_format, size, format_weight in cls.objects.filter(
+                **kwargs
+            ).annotate(
+                size=models.Count('deckposition')
+            ).values_list(
+                'id', 'event_date', 'format_id', 'size', 'format__usage_weight'
+            )
+        }
+
+        usages = defaultdict(lambda: [0, 0.])
+        for card_name, tournament_id, position, number in DeckToCard.objects.filter(
+                deck__deckposition__isnull=False,
+                **{'deck__deckposition__tournament__' + key: value for key, value in kwargs.items()}
+        ).values_list(
+            'card_name_id', 'deck__deckposition__tournament_id', 'deck__deckposition__position'
+        ).annotate(
+            number=models.Sum('number')
+        ):
+            event_date, tournament_format, size, format_weight = tournaments[tournament_id]
+            usage = usages[(event_date, tournament_format, card_name)]
+            usage[0] += number
+            usage[1] += number * cls.usage_weight(position, size, format_weight)
+
+        return {key: tuple(usage) for key, usage in usages.items()}
 
-        played_cards = defaultdict(int)
+    @classmethod
+    def get_card_usages(cls, to_date: date=None, from_date: date=None,
+                        format_id: str=None) -> Dict[Tuple[date, str, str], Tuple[int, float]]:
+        """Returns the card usages between from_date and to_date (of the given format only if set), in the same shape
+        as compute_card_usages.
 
-        for tournament in tournaments:
-            for deck in tournament.results.all():
-                for deck_to_card in DeckToCard.objects.filter(deck=deck):
-                    played_cards[deck_to_card.card_name.name] += deck_to_card.number
+        Usages are read from the CardUsage aggregate. If it is empty (i.e. it has not been backfilled yet, see the
+        compute_card_usages command), they are computed from the decks instead. A period without usage is empty.
+        """
+
+        kwargs = {}
+        if to_date:
+            kwargs['date__lte'] = to_date
+        if from_date:
+            kwargs['date__gte'] = from_date
+        if format_id:
+            kwargs['format_id'] = format_id
+
+        usages = {
+            (usage_date, usage_format, card_name): (copies, weighted)
+            for usage_date, usage_format, card_name, copies, weighted in CardUsage.objects.filter(
+                **kwargs
+            ).values_list(
+                'date', 'format_id', 'card_name_id', 'copies', 'weighted'
+            )
+        }
+        if usages or CardUsage.objects.exists():
+            return usages
+        return cls.compute_card_usages(to_date, from_date, format_id)
+
+    @classmethod
+    def get_played_cards(cls, to_date: date=None, from_date: date=None, weighted: bool=False,
+                         format_id: str=None) -> Dict[str, float]:
+        """Gets all cards that have been played in tournaments between date_1 and date_2 (of the given format only if
+        set), from the card usages (see get_card_usages).
+        Returns a dictionary mapping CardName id with the number of times it has been played (weighted by finishing
+        position, tournament size and format if weighted is set to True).
+        """
+
+        played_cards = defaultdict(int)
+        for (_, _, card_name), (copies, weighted_copies) in cls.get_card_usages(to_date, from_date, format_id).items():
+            played_cards[card_name] += weighted_copies if weighted else copies
 
         return played_cards
 
+    @staticmethod
+    def usage_weight(position: int, size: int, format_weight: float) -> float:
+        """Returns the weight of a card copy played by a deck which finished at the given position of a tournament
+        with the given number of decks.
+
+        The winner of a tournament of REFERENCE_SIZE decks weighs 1, and weights decrease with the square root of the
+        position, and increase with the logarithm of the tournament size.
+        """
+
+        size_weight = math.log2(size + 1) / math.log2(Tournament.REFERENCE_SIZE + 1)
+        return format_weight * size_weight / math.sqrt(max(position, 1))
+
 
 class DeckToCard(models.Model):
     """Class which represents the relation between a deck and its cards.
@@ -112,13 +219,25 @@ class Legality(models.Model):
     LEGALITY = (
         ('legal', 'Legal'),
         ('banned', 'Banned'),
-        ('restricted', 'Restricted')
+        ('restricted', 'Restricted'),
+        ('not_legal', 'Not legal')  # e.g. rotated out of standard
     )
 
     card = models.ForeignKey(Card, on_delete=models.CASCADE)
     format = models.ForeignKey(Format, on_delete=models.CASCADE)
     legality = models.CharField(max_length=20, choices=LEGALITY)
 
+    class Meta:
+        verbose_name_plural = 'Legalities'
+        index_together = [("format", "legality")]
+
+    @staticmethod
+    def parse(legality: str) -> str:
+        """Returns the legality matching the given MTG API legality (e.g. `Banned` gives `banned`).
+        """
+
+        return legality.lower()
+
 
 class DeckPosition(models.Model):
     """Class which links a tournament and the results, which are the positions of the decks.
@@ -133,3 +252,94 @@ class DeckPosition(models.Model):
 
     class Meta:
         unique_together = ("deck", "tournament")
+
+
+class BackfillCheckpoint(models.Model):
+    """Class which stores the progress of the historical tournaments backfill for a given format.
+    """
+
+    format = models.OneToOneField(Format, on_delete=models.CASCADE, primary_key=True)
+    from_date = models.DateField()
+    to_date = models.DateField()
+    page = models.PositiveSmallIntegerField(default=1)
+    done = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return '{} ({} - {}): page {}'.format(self.format, self.from_date, self.to_date, self.page)
+
+
+class DeckSummary(models.Model):
+    """Class which stores the precomputed detail of a deck, as returned by the API (see tournaments.summaries): its
+    main deck and sideboard, type breakdown, colors, mana curve and price.
+    """
+
+    deck = models.OneToOneField(Deck, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    summary = JSONField()
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return str(self.deck)
+
+    class Meta:
+        verbose_name_plural = 'Deck summaries'
+
+
+class MetagameShare(models.Model):
+    """Class which stores the share of an archetype among the decks of a format on a given day, and among its top 8
+    decks (see tournaments.metagame). Decks without archetype are grouped by name.
+    """
+
+    format = models.ForeignKey(Format, on_delete=models.CASCADE)
+    date = models.DateField()
+    archetype = models.ForeignKey(Archetype, on_delete=models.SET_NULL, blank=True, null=True)
+    name = models.CharField(max_length=50, blank=True)
+    decks = models.PositiveIntegerField()
+    top8_decks = models.PositiveIntegerField()
+    share = models.FloatField()
+    top8_share = models.FloatField()
+
+    def __str__(self) -> str:
+        return '{} {} {} ({:.1%})'.format(self.format, self.date, self.name, self.share)
+
+    class Meta:
+        index_together = [('format', 'date')]
+
+
+class CardUsage(models.Model):
+    """Class which stores the number of copies of a card played in the tournaments of a format on a given day, and
+    their weighted number (see Tournament.usage_weight).
+
+    It is the aggregate read by usage features and relevance, refreshed when tournaments are ingested (see
+    tournaments.usages).
+    """
+
+    date = models.DateField()
+    format = models.ForeignKey(Format, on_delete=models.CASCADE)
+    card_name = models.ForeignKey(CardName, on_delete=models.CASCADE)
+    copies = models.PositiveIntegerField()
+    weighted = models.FloatField()
+
+    def __str__(self) -> str:
+        return '{} {} {} ({})'.format(self.format, self.date, self.card_name, self.copies)
+
+    class Meta:
+        unique_together = ("date", "format", "card_name")
+        index_together = [("format", "date")]
+
+
+class CardCooccurrence(models.Model):
+    """Class which stores a card often played with a given card: the number of decks playing both, and their Jaccard
+    similarity (see tournaments.cooccurrences).
+    """
+
+    card_name = models.ForeignKey(CardName, on_delete=models.CASCADE, related_name='cooccurrences')
+    other = models.ForeignKey(CardName, on_delete=models.CASCADE, related_name='+')
+    decks = models.PositiveIntegerField()
+    score = models.FloatField()
+
+    def __str__(self) -> str:
+        return '{} <-> {} ({:.2f})'.format(self.card_name_id, self.other_id, self.score)
+
+    class Meta:
+        unique_together = ("card_name", "other")
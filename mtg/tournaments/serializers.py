@@ -5,68 +5,11 @@ Contains serializers for tournaments app
 """
 
 
-from typing import Dict
 from operator import itemgetter
 
 from rest_framework import serializers
 
-from .models import Tournament, Deck, DeckPosition, DeckToCard
-from cards.serializers import CardTypeSerializer
-
-
-class DeckToCardSerializer(serializers.ModelSerializer):
-    card_name = serializers.ReadOnlyField(source='card_name.name')
-    card_type = CardTypeSerializer(source='card_name.card_set', many=True, read_only=True)
-
-    class Meta:
-        model = DeckToCard
-        fields = ('card_name', 'card_type', 'number', 'sideboard')
-
-
-class DeckDetailSerializer(serializers.ModelSerializer):
-    """Returns the detail content of a deck (with cards).
-    """
-
-    cards = DeckToCardSerializer(source='decktocard_set', many=True, read_only=True)
-
-    class Meta:
-        model = Deck
-        fields = ('id', 'name', 'owner', 'cards')
-
-    def to_representation(self, instance) -> Dict:
-        """Converts the deck to a correct representation for API.
-
-        A conversion needs to be done with "card_type" attribute, which has the following shape at first.
-        [
-            OrderedDict([('types', ['land'])]),
-            OrderedDict([('types', ['land'])]),
-            ...
-        ]
-        """
-
-        data = super().to_representation(instance)
-        cards = data.pop('cards')
-
-        main_deck, sideboard = [], []
-        for card in cards:
-
-            card_types = set()
-            for types in card.pop('card_type'):
-                card_types |= {k for v in types.values() for k in v}
-            card['types'] = list(card_types)
-
-            in_sideboard = card.pop('sideboard')
-            if in_sideboard:
-                sideboard.append(card)
-            else:
-                main_deck.append(card)
-
-        data['cards'] = {
-            'main_deck': main_deck,
-            'sideboard': sideboard
-        }
-
-        return data
+from .models import Tournament, Deck, DeckPosition, MetagameShare, CardCooccurrence
 
 
 class DeckListSerializer(serializers.ModelSerializer):
@@ -75,7 +18,7 @@ class DeckListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Deck
-        fields = ('id', 'name', 'owner')
+        fields = ('id', 'name', 'owner', 'archetype')
 
 
 class DeckPositionSerializer(serializers.ModelSerializer):
@@ -100,3 +43,19 @@ class TournamentSerializer(serializers.ModelSerializer):
         data = super().to_representation(instance)
         data['decks'] = sorted(data['decks'], key=itemgetter('position'))
         return data
+
+
+class MetagameShareSerializer(serializers.ModelSerializer):
+    format_name = serializers.ReadOnlyField(source='format.name')
+
+    class Meta:
+        model = MetagameShare
+        fields = ('format_name', 'date', 'archetype', 'name', 'decks', 'top8_decks', 'share', 'top8_share')
+
+
+class CardCooccurrenceSerializer(serializers.ModelSerializer):
+    card_name = serializers.ReadOnlyField(source='other_id')
+
+    class Meta:
+        model = CardCooccurrence
+        fields = ('card_name', 'decks', 'score')
@@ -0,0 +1,132 @@
+"""
+@author: Thomas PERROT
+
+Contains the deck summaries for tournaments app.
+
+A deck summary is the whole detail of a deck as returned by the API. It is computed with a few aggregate queries for
+many decks at once when decks are ingested, so that reading a deck is a single primary key lookup.
+"""
+
+
+from typing import Dict, Iterable
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.contrib.postgres.aggregates import BitOr
+from django.db import transaction
+from django.db.models import Min
+
+from .models import Deck, DeckToCard, DeckSummary
+from cards.models import Color, Type
+from stats.models import Price
+
+
+# Prices older than PRICE_WINDOW days are ignored, and cards costing MAX_CURVE_CMC or more share a curve bucket.
+PRICE_WINDOW = 7
+MAX_CURVE_CMC = 7
+
+
+def get_card_prices(card_names: Iterable[str]) -> Dict[str, float]:
+    """Returns the lowest recent mean price among the printings of each given card name.
+    """
+
+    return dict(Price.objects.filter(
+        card__name_id__in=set(card_names),
+        date__gte=date.today() - timedelta(days=PRICE_WINDOW),
+        mean_price__isnull=False
+    ).values(
+        'card__name_id'
+    ).annotate(
+        price=Min('mean_price')
+    ).values_list(
+        'card__name_id', 'price'
+    ))
+
+
+def build_deck_summaries(deck_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Builds the summaries of the given decks, with one query for the decks, one for their cards and one for prices.
+    """
+
+    summaries = {}
+    for deck in Deck.objects.filter(id__in=list(deck_ids)).values('id', 'name', 'owner', 'archetype_id'):
+        summaries[deck['id']] = dict(deck, cards={'main_deck': [], 'sideboard': []}, types=defaultdict(int),
+                                     colors=0, mana_curve=defaultdict(int), price=0., unpriced_cards=0,
+                                     price_date=date.today().isoformat())
+
+    # Printings of a card share types and colors
+    deck_cards = list(DeckToCard.objects.filter(
+        deck_id__in=summaries
+    ).values(
+        'deck_id', 'card_name_id', 'number', 'sideboard'
+    ).annotate(
+        types_mask=BitOr('card_name__card__types_mask'),
+        colors_mask=BitOr('card_name__card__colors_mask'),
+        cmc=Min('card_name__card__cmc')
+    ).order_by(
+        'id'
+    ))
+    prices = get_card_prices(card['card_name_id'] for card in deck_cards)
+
+    for card in deck_cards:
+        summary = summaries[card['deck_id']]
+        types = Type.from_mask(card['types_mask'] or 0)
+        price = prices.get(card['card_name_id'])
+
+        summary['cards']['sideboard' if card['sideboard'] else 'main_deck'].append({
+            'card_name': card['card_name_id'],
+            'number': card['number'],
+            'types': types,
+            'colors': Color.from_mask(card['colors_mask'] or 0),
+            'cmc': card['cmc'],
+            'price': price,
+        })
+
+        if price is None:
+            summary['unpriced_cards'] += 1
+        else:
+            summary['price'] += card['number'] * price
+
+        if card['sideboard']:
+            continue
+        summary['colors'] |= card['colors_mask'] or 0
+        for card_type in types:
+            summary['types'][card_type] += card['number']
+        if 'land' not in types:
+            summary['mana_curve'][str(min(card['cmc'] or 0, MAX_CURVE_CMC))] += card['number']
+
+    for summary in summaries.values():
+        summary['colors'] = Color.from_mask(summary['colors'])
+        summary['types'] = dict(summary['types'])
+        summary['mana_curve'] = dict(summary['mana_curve'])
+        summary['price'] = round(summary['price'], 2)
+
+    return summaries
+
+
+def store_deck_summaries(deck_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Builds and stores (or replaces) the summaries of the given decks, and returns them.
+    """
+
+    summaries = build_deck_summaries(deck_ids)
+    with transaction.atomic():
+        DeckSummary.objects.filter(deck_id__in=summaries).delete()
+        DeckSummary.objects.bulk_create(
+            DeckSummary(deck_id=deck_id, summary=summary) for deck_id, summary in summaries.items()
+        )
+    return summaries
+
+
+def get_deck_summary(deck_id: int) -> Dict:
+    """Returns the summary of the given deck, building it if it has not been yet.
+
+    Raises Deck.DoesNotExist if the deck does not exist.
+    """
+
+    try:
+        return DeckSummary.objects.values_list('summary', flat=True).get(deck_id=deck_id)
+    except DeckSummary.DoesNotExist:
+        summaries = store_deck_summaries([deck_id])
+
+    if deck_id not in summaries:
+        raise Deck.DoesNotExist
+    return summaries[deck_id]
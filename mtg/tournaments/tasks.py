@@ -5,32 +5,48 @@ Contains tasks for tournaments app
 """
 
 
-from typing import Generator
+from typing import Generator, Dict, List, Set
 import re
+import time
 from datetime import datetime, date, timedelta
 
 import requests
 import bs4.element
 from bs4 import BeautifulSoup
 from django.utils import timezone
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from celery import shared_task, group
 from celery.utils.log import get_task_logger
 from celery.exceptions import SoftTimeLimitExceeded
 
-from .models import Tournament, Deck, Format, DeckToCard, DeckPosition
-from cards.models import CardName, Card
+from .models import Tournament, Deck, Format, DeckToCard, DeckPosition, BackfillCheckpoint
+from .summaries import store_deck_summaries
+from .archetypes import cluster_decks
+from .metagame import refresh_metagame, refresh_decks_metagame
+from .usages import get_relevant_card_names, refresh_card_usages, refresh_decks_card_usages
+from .cooccurrences import update_cooccurrences
+from cards.models import Card
+from cards.search import fuzzy_resolve_card_names
+from cards.utils import resolve_card_names
 
 
 logger = get_task_logger(__name__)
 
 MTG_TOP8_URL = 'http://mtgtop8.com/'
 MTGO_URL = 'http://mtgtop8.com/mtgo?d={}'
+MTG_TOP8_ARCHIVE_URL = 'http://mtgtop8.com/format?f={format}&cp={page}'
+TOURNAMENT_URL = MTG_TOP8_URL + 'event?e={id}&f={format}'
 
 TOURNAMENT_URL_REGEX = re.compile(r'event\?e=(?P<tournament_id>\d{1,5})&f=(?P<format_id>[A-Z]{2})')
 DECK_URL_REGEX = re.compile(r'\?e=(?P<tournament_id>\d{1,5})&d=(?P<deck_id>\d{1,6})&f=(?P<format_id>[A-Z]{2})')
 MTGO_CARD_LINE_REGEX = re.compile(r'(?P<number>\d) (?P<name>.{1,100})')
 
+# Delay between two requests to mtgtop8 within a single task, in seconds.
+MTG_TOP8_REQUEST_INTERVAL = 1
+
+# Pooled HTTP client, which keeps connections to mtgtop8 alive between requests.
+session = requests.Session()
+
 FORMATS = {
     'VI': 'vintage',
     'LE': 'legacy',
@@ -44,22 +60,26 @@ FORMATS = {
 def update_relevance() -> None:
     """Updates relevance of cards in database.
 
-    All rare and mythic cards that has been played in last two weeks tournaments, and whose set
-    is relevant (i.e is not only online) are considered as relevant.
+    Cards are relevant when they are relevant in one format according to its rules (by default, all rare and mythic
+    cards that has been played in last two weeks tournaments of the format), and their set is relevant (i.e is not
+    only online).
     """
 
     logger.info('Updating cards relevance in database...')
 
-    Card.objects.update(is_relevant=False)
-
-    for card_name in Tournament.get_played_cards(date.today(), date.today() - timedelta(days=14)):
-        Card.objects.filter(
-            name__name=card_name,
-            rarity__rarity__in=('R', 'M'),
-            set__is_relevant=True
-        ).update(
-            is_relevant=True
-        )
+    with transaction.atomic():
+        Card.objects.update(is_relevant=False)
+
+        for tournament_format in Format.objects.all():
+            card_names = get_relevant_card_names(tournament_format, date.today())
+            count = Card.objects.filter(
+                name_id__in=card_names,
+                rarity__rarity__in=list(tournament_format.relevance_rarities),
+                set__is_relevant=True
+            ).update(
+                is_relevant=True
+            )
+            logger.info('Relevant cards in format {}: {}'.format(tournament_format, count))
 
     logger.info('Relevant cards: {}'.format(Card.objects.filter(is_relevant=True).count()))
 
@@ -88,6 +108,25 @@ def parse_mtgo_deck(content: str) -> Generator:
             sideboard = True
 
 
+def parse_tournament(tournament_tag: bs4.element.Tag) -> Dict:
+    """Parses the soup element representing a tournament row of a format page.
+    Returns data about the tournament.
+    """
+
+    a_tag = tournament_tag.find("a")
+    href = a_tag['href']
+    tournament = {
+        'name': a_tag.text,
+        'url': MTG_TOP8_URL + href,
+        'id': TOURNAMENT_URL_REGEX.match(href).group('tournament_id')
+    }
+    t_date = tournament_tag.find("td", {"class": "S10"}).text
+    tournament['date'] = timezone.make_aware(
+        datetime.strptime(t_date, '%d/%m/%y'), timezone.get_current_timezone())
+
+    return tournament
+
+
 def parse_tournaments(soup: bs4.BeautifulSoup) -> Generator:
     """Parses the soup element representing the last 10 tournaments for a format.
     Yields data about each tournament.
@@ -95,18 +134,24 @@ def parse_tournaments(soup: bs4.BeautifulSoup) -> Generator:
 
     for tournament_tag in soup.find("tr", text="Last 10 events").next_siblings:
         if tournament_tag.find("td") != -1:
+            yield parse_tournament(tournament_tag)
+
+
+def parse_archive_tournaments(soup: bs4.BeautifulSoup) -> Generator:
+    """Parses the soup element representing a page of the tournaments archive for a format.
+    Yields data about each tournament, once, from the most recent to the oldest.
+    """
+
+    tournament_ids = set()
 
-            a_tag = tournament_tag.find("a")
-            href = tournament_tag.find("a")['href']
-            tournament = {
-                'name': a_tag.text,
-                'url': MTG_TOP8_URL + href,
-                'id': TOURNAMENT_URL_REGEX.match(href).group('tournament_id')
-            }
-            t_date = tournament_tag.find("td", {"class": "S10"}).text
-            tournament['date'] = timezone.make_aware(
-                datetime.strptime(t_date, '%d/%m/%y'), timezone.get_current_timezone())
+    for tournament_tag in soup.find_all("tr", {"class": "hover_tr"}):
+        a_tag = tournament_tag.find("a", href=TOURNAMENT_URL_REGEX)
+        if a_tag is None or not tournament_tag.find("td", {"class": "S10"}):
+            continue
 
+        tournament = parse_tournament(tournament_tag)
+        if tournament['id'] not in tournament_ids:
+            tournament_ids.add(tournament['id'])
             yield tournament
 
 
@@ -142,6 +187,70 @@ def parse_decks(soup: bs4.BeautifulSoup) -> Generator:
         yield deck
 
 
+def store_deck_cards(decks: Dict[int, List[Dict]]) -> Set[str]:
+    """Bulk stores the cards of the given decks, mapping deck ids to parsed MTGO exports.
+
+    Card names of all decks are resolved at once, misspelled names being matched to the most similar card name, and
+    DeckToCards are created in a single transaction. Cards already stored for a deck are left untouched, and only the
+    first occurrence of a card in a deck part is kept. Decks are processed by a follow-up task once the transaction is
+    committed (see process_new_decks).
+    Returns the card names that could not be resolved.
+    """
+
+    names = {card_dict['name'] for cards in decks.values() for card_dict in cards}
+    resolved_names = resolve_card_names(names)
+    resolved_names.update(fuzzy_resolve_card_names(names - set(resolved_names)))
+
+    with transaction.atomic():
+        existing = set(DeckToCard.objects.filter(
+            deck_id__in=decks
+        ).values_list(
+            'deck_id', 'card_name_id', 'sideboard'
+        ))
+
+        deck_to_cards = []
+        for deck_id, cards in decks.items():
+            for card_dict in cards:
+                card_name = resolved_names.get(card_dict['name'])
+                key = (int(deck_id), card_name, card_dict['sideboard'])
+                if card_name is None or key in existing:
+                    continue
+                existing.add(key)
+                deck_to_cards.append(DeckToCard(
+                    deck_id=deck_id,
+                    card_name_id=card_name,
+                    sideboard=card_dict['sideboard'],
+                    number=card_dict['number']
+                ))
+
+        DeckToCard.objects.bulk_create(deck_to_cards)
+
+        deck_ids = [int(deck_id) for deck_id in decks]
+        if deck_ids:
+            transaction.on_commit(lambda: process_new_decks.delay(deck_ids))
+
+    logger.debug('Successfully inserted {} DeckToCards'.format(len(deck_to_cards)))
+
+    return names - set(resolved_names)
+
+
+@shared_task(soft_time_limit=300,
+             name='Process new decks',
+             ignore_result=True)
+def process_new_decks(deck_ids: List[int]) -> None:
+    """Assigns an archetype to the given decks, builds their summaries, and refreshes the metagame and the card usages
+    of their tournament days, once their cards are stored.
+
+    This runs outside of the transaction storing the cards, so that the lock clustering holds on the format is not
+    held while decks are ingested.
+    """
+
+    cluster_decks(deck_ids)
+    store_deck_summaries(deck_ids)
+    refresh_decks_metagame(deck_ids)
+    refresh_decks_card_usages(deck_ids)
+
+
 @shared_task(soft_time_limit=5,
              autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
              default_retry_delay=3,
@@ -162,23 +271,8 @@ def get_deck(deck_id: str) -> None:
     r = requests.get(export_deck_url)
 
     logger.debug('Instantiating Django objects...')
-    deck = Deck.objects.get(id=deck_id)
-
-    for card_dict in parse_mtgo_deck(r.text):
-        try:
-            card_name_obj = CardName.objects.get(name=card_dict['name'])
-        except ObjectDoesNotExist:
-            logger.error('Unknown card name: {}'.format(card_dict['name']))
-        else:
-
-            deck_to_card, created = DeckToCard.objects.get_or_create(
-                deck=deck,
-                card_name=card_name_obj,
-                sideboard=card_dict['sideboard'],
-                defaults={'number': card_dict['number']}
-            )
-            if created:
-                logger.debug('Successfully inserted DeckToCard {}'.format(deck_to_card))
+    for name in store_deck_cards({int(deck_id): list(parse_mtgo_deck(r.text))}):
+        logger.error('Unknown card name: {}'.format(name))
 
 
 @shared_task(soft_time_limit=5,
@@ -217,6 +311,73 @@ def get_tournament(url: str) -> None:
             get_deck.delay(deck['deck_id'])
 
 
+@shared_task(soft_time_limit=120,
+             autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
+             default_retry_delay=3,
+             retry_kwargs={'max_retries': 5},
+             name='Harvest tournament with decks',
+             ignore_result=True,
+             rate_limit='10/m')
+def harvest_tournament(url: str) -> Dict:
+    """Gets a tournament and all its decks within a single task.
+
+    Fetches the tournament detail page and the MTGO exports of every deck that is unknown for that tournament with
+    the pooled HTTP client, then bulk stores Decks, DeckPositions and DeckToCards in a single transaction. The
+    metagame and card usages of the tournament day are refreshed once decks are processed (see process_new_decks).
+    The tournament url must have the following shape: http://mtgtop8.com/event?e=15191&f=MO
+    Returns a summary of the harvested tournament.
+    """
+
+    logger.info('Extracting data for tournament {}'.format(url))
+
+    tournament_id = int(TOURNAMENT_URL_REGEX.search(url).group('tournament_id'))
+
+    logger.debug('Fetching tournament page {}...'.format(url))
+    r = session.get(url)
+    r.raise_for_status()
+
+    logger.debug('Parsing tournament {}...'.format(url))
+    decks = {int(deck['deck_id']): deck for deck in parse_decks(BeautifulSoup(r.text, 'html.parser'))}
+
+    known_deck_ids = set(DeckPosition.objects.filter(
+        tournament_id=tournament_id,
+        deck_id__in=decks
+    ).values_list('deck_id', flat=True))
+    new_deck_ids = [deck_id for deck_id in decks if deck_id not in known_deck_ids]
+
+    deck_contents = {}
+    for deck_id in new_deck_ids:
+        time.sleep(MTG_TOP8_REQUEST_INTERVAL)
+        logger.debug('Fetching deck {}...'.format(deck_id))
+        r = session.get(MTGO_URL.format(deck_id))
+        r.raise_for_status()
+        deck_contents[deck_id] = list(parse_mtgo_deck(r.text))
+
+    with transaction.atomic():
+        stored_deck_ids = set(Deck.objects.filter(id__in=new_deck_ids).values_list('id', flat=True))
+        Deck.objects.bulk_create(
+            Deck(id=deck_id, name=decks[deck_id]['deck_name'], owner=decks[deck_id]['player'])
+            for deck_id in new_deck_ids if deck_id not in stored_deck_ids
+        )
+        DeckPosition.objects.bulk_create(
+            DeckPosition(deck_id=deck_id, tournament_id=tournament_id, position=decks[deck_id]['position'])
+            for deck_id in new_deck_ids
+        )
+        unknown_cards = store_deck_cards(deck_contents)
+
+    summary = {
+        'tournament': tournament_id,
+        'decks': len(decks),
+        'new_decks': len(new_deck_ids),
+        'cards': sum(len(cards) for cards in deck_contents.values()),
+        'unknown_cards': sorted(unknown_cards)
+    }
+    logger.info('Harvested tournament {tournament}: {new_decks}/{decks} new decks, {cards} cards, '
+                'unknown cards: {unknown_cards}'.format(**summary))
+
+    return summary
+
+
 @shared_task(soft_time_limit=5,
              autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
              default_retry_delay=3,
@@ -224,10 +385,11 @@ def get_tournament(url: str) -> None:
              name='Harvest all tournaments in format',
              ignore_result=True,
              rate_limit='10/m')
-def get_last_tournaments(tournament_format: str, force: bool=False) -> None:
+def get_last_tournaments(tournament_format: str, force: bool=False, batched: bool=True) -> None:
     """Gets the last tournaments that where published on mtgtop8 for the given format.
 
     Harvests the last tournaments url from every format main page. Crawl them if they are not already in database.
+    If batched is set to True, each tournament is crawled with all its decks in a single task.
     """
 
     if tournament_format not in FORMATS:
@@ -269,7 +431,10 @@ def get_last_tournaments(tournament_format: str, force: bool=False) -> None:
             if created or force:
                 logger.info('Tournament {} ({}) does not exists yet. Crawling it...'.format(
                     tournament['id'], tournament['url']))
-                get_tournament.delay(tournament['url'])
+                if batched:
+                    harvest_tournament.delay(tournament['url'])
+                else:
+                    get_tournament.delay(tournament['url'])
             else:
                 logger.info('Tournament {} ({}) already exists. Skipping'.format(tournament['id'], tournament['url']))
 
@@ -277,10 +442,165 @@ def get_last_tournaments(tournament_format: str, force: bool=False) -> None:
 @shared_task(soft_time_limit=5,
              name='Harvest all tournaments',
              ignore_result=True)
-def harvest_formats(force: bool=False) -> None:
+def harvest_formats(force: bool=False, batched: bool=True) -> None:
     """Main function to crawl the last tournament. Simple calls get_last_tournaments on main formats.
 
     If force is set to False, tournaments already in database will not be crawled.
+    If batched is set to True, each tournament is crawled with all its decks in a single task.
+    """
+
+    group(get_last_tournaments.s(f, force, batched) for f in FORMATS)()
+
+
+@shared_task(soft_time_limit=30,
+             autoretry_for=(ConnectionError, SoftTimeLimitExceeded),
+             default_retry_delay=3,
+             retry_kwargs={'max_retries': 5},
+             name='Backfill tournaments in format',
+             ignore_result=True,
+             rate_limit='10/m')
+def backfill_tournaments(tournament_format: str, from_date: str, to_date: str, page: int=None) -> None:
+    """Harvests the tournaments of the mtgtop8 archive for the given format, between the given dates (YYYY-MM-DD).
+
+    Crawls one archive page, then schedules the next one until tournaments are older than from_date. Unknown
+    tournaments are created and crawled in parallel with harvest_tournament, whose rate limit applies.
+    Progress is stored in a checkpoint, so that the backfill resumes from the last crawled page if page is not given.
+    Tournaments whose decks are not stored are crawled again when their page is, or by retry_backfill_tournaments.
+    """
+
+    if tournament_format not in FORMATS:
+        logger.error('Tournament format must be ({})'.format('|'.join(FORMATS)))
+        return
+
+    start = datetime.strptime(from_date, '%Y-%m-%d').date()
+    end = datetime.strptime(to_date, '%Y-%m-%d').date()
+
+    format_obj, _ = Format.objects.get_or_create(name=FORMATS[tournament_format])
+    checkpoint, created = BackfillCheckpoint.objects.get_or_create(
+        format=format_obj, defaults={'from_date': start, 'to_date': end})
+
+    if page is None:
+        if created or checkpoint.done or (checkpoint.from_date, checkpoint.to_date) != (start, end):
+            page = 1
+        else:
+            page = checkpoint.page
+            logger.info('Resuming backfill of format {} from page {}'.format(tournament_format, page))
+
+    url = MTG_TOP8_ARCHIVE_URL.format(format=tournament_format, page=page)
+    logger.debug('Fetching archive page {}...'.format(url))
+    r = session.get(url)
+    r.raise_for_status()
+
+    tournaments = list(parse_archive_tournaments(BeautifulSoup(r.text, 'html.parser')))
+    known_tournament_ids = set(Tournament.objects.values_list('id', flat=True))
+    # Tournaments without decks have not been stored yet (e.g. their harvest failed), so they are crawled again.
+    stored_tournament_ids = set(DeckPosition.objects.values_list('tournament_id', flat=True).distinct())
+
+    new_tournaments = [
+        t for t in tournaments
+        if int(t['id']) not in stored_tournament_ids and start <= t['date'].date() <= end
+    ]
+    Tournament.objects.bulk_create(
+        Tournament(id=t['id'], name=t['name'], format=format_obj, event_date=t['date']) for t in new_tournaments
+        if int(t['id']) not in known_tournament_ids
+    )
+    group(harvest_tournament.s(t['url']) for t in new_tournaments)()
+
+    logger.info('Backfilled page {} of format {}: {} new tournaments out of {}'.format(
+        page, tournament_format, len(new_tournaments), len(tournaments)))
+
+    done = not tournaments or min(t['date'].date() for t in tournaments) < start
+
+    checkpoint.from_date, checkpoint.to_date = start, end
+    checkpoint.page = page + 1
+    checkpoint.done = done
+    checkpoint.save()
+
+    if not done:
+        backfill_tournaments.delay(tournament_format, from_date, to_date, page + 1)
+
+
+@shared_task(soft_time_limit=30,
+             name='Retry backfilled tournaments',
+             ignore_result=True)
+def retry_backfill_tournaments(tournament_format: str, from_date: str, to_date: str) -> int:
+    """Crawls again the tournaments of the given format between the given dates (YYYY-MM-DD) which were created by
+    backfill_tournaments but whose decks were never stored, e.g. because their harvest failed.
+
+    Returns the number of retried tournaments.
+    """
+
+    if tournament_format not in FORMATS:
+        logger.error('Tournament format must be ({})'.format('|'.join(FORMATS)))
+        return 0
+
+    tournament_ids = list(Tournament.objects.filter(
+        format__name=FORMATS[tournament_format],
+        event_date__gte=datetime.strptime(from_date, '%Y-%m-%d').date(),
+        event_date__lte=datetime.strptime(to_date, '%Y-%m-%d').date(),
+        deckposition__isnull=True
+    ).values_list('id', flat=True))
+
+    group(harvest_tournament.s(TOURNAMENT_URL.format(id=tournament_id, format=tournament_format))
+          for tournament_id in tournament_ids)()
+
+    logger.info('Retrying {} backfilled tournaments of format {}'.format(len(tournament_ids), tournament_format))
+    return len(tournament_ids)
+
+
+@shared_task(name='Refresh deck summaries',
+             ignore_result=True)
+def refresh_deck_summaries(days: int=30) -> None:
+    """Rebuilds the summaries of the decks played in tournaments for the last given days, so that their prices follow
+    card prices.
+    """
+
+    deck_ids = DeckPosition.objects.filter(
+        tournament__event_date__gte=date.today() - timedelta(days=days)
+    ).values_list('deck_id', flat=True).distinct()
+
+    summaries = store_deck_summaries(deck_ids)
+    logger.info('Refreshed {} deck summaries'.format(len(summaries)))
+
+
+@shared_task(name='Cluster decks',
+             ignore_result=True)
+def cluster_unassigned_decks() -> None:
+    """Assigns an archetype to every deck which does not have one yet (e.g. decks stored before their position).
+    """
+
+    assigned = cluster_decks()
+    logger.info('Assigned an archetype to {} decks'.format(len(assigned)))
+
+    refresh_decks_metagame(assigned)
+
+
+@shared_task(name='Refresh metagame',
+             ignore_result=True)
+def refresh_metagames(days: int=30) -> None:
+    """Recomputes the metagame shares of every format for the last given days.
+    """
+
+    for format_id in Format.objects.values_list('name', flat=True):
+        count = refresh_metagame(format_id, date.today() - timedelta(days=days), date.today())
+        logger.info('Refreshed {} metagame shares for format {}'.format(count, format_id))
+
+
+@shared_task(name='Refresh card usages',
+             ignore_result=True)
+def refresh_recent_card_usages(days: int=30) -> None:
+    """Recomputes the card usages of every format for the last given days.
+    """
+
+    count = refresh_card_usages(date.today() - timedelta(days=days), date.today())
+    logger.info('Refreshed {} card usages'.format(count))
+
+
+@shared_task(name='Update card co-occurrences',
+             ignore_result=True)
+def update_card_cooccurrences() -> None:
+    """Adds the decks stored since the last update to the card co-occurrences.
     """
 
-    group(get_last_tournaments.s(f, force) for f in FORMATS)()
+    count = update_cooccurrences()
+    logger.info('Updated co-occurrences of {} cards'.format(count))
@@ -0,0 +1,43 @@
+from ..archetypes import deck_tokens, minhash_signature, band_keys, similarity, BANDS, NUM_PERMUTATIONS
+
+
+burn = [('Lightning Bolt', 4), ('Lava Spike', 4), ('Rift Bolt', 4), ('Goblin Guide', 4), ('Monastery Swiftspear', 4),
+        ('Eidolon of the Great Revel', 4), ('Skullcrack', 4), ('Searing Blaze', 4), ('Boros Charm', 4),
+        ('Mountain', 12), ('Inspiring Vantage', 4), ('Sacred Foundry', 4), ('Wooded Foothills', 4)]
+burn_variant = burn[:-2] + [('Bloodstained Mire', 4), ('Lightning Helix', 4)]
+tron = [('Karn Liberated', 4), ('Wurmcoil Engine', 3), ('Ancient Stirrings', 4), ('Expedition Map', 4),
+        ('Urza\'s Tower', 4), ('Urza\'s Mine', 4), ('Urza\'s Power Plant', 4), ('Forest', 3), ('Sylvan Scrying', 4),
+        ('Oblivion Stone', 2), ('Chromatic Sphere', 4), ('Chromatic Star', 4), ('Relic of Progenitus', 4),
+        ('Ulamog, the Ceaseless Hunger', 1), ('Thragtusk', 2), ('World Breaker', 1), ('Grove of the Burnwillows', 4),
+        ('Pulse of Murasa', 2)]
+
+
+def test_deck_tokens():
+    """Asserts that a deck gives one token per copy of a card.
+    """
+
+    assert deck_tokens([('Tarmogoyf', 2), ('Thoughtseize', 1)]) == ['Tarmogoyf#0', 'Tarmogoyf#1', 'Thoughtseize#0']
+
+
+def test_minhash_signature():
+    """Asserts that signatures do not depend on the order of the cards, and estimate the Jaccard similarity.
+    """
+
+    signature = minhash_signature(deck_tokens(burn))
+
+    assert len(signature) == NUM_PERMUTATIONS
+    assert list(signature) == list(minhash_signature(deck_tokens(reversed(burn))))
+    # 52 common tokens out of 68
+    assert similarity(signature, minhash_signature(deck_tokens(burn_variant))) > 0.5
+    assert similarity(signature, minhash_signature(deck_tokens(tron))) < 0.2
+
+
+def test_band_keys():
+    """Asserts that similar decks share LSH buckets, and that different decks do not.
+    """
+
+    keys = set(band_keys(minhash_signature(deck_tokens(burn))))
+
+    assert len(keys) == BANDS
+    assert keys & set(band_keys(minhash_signature(deck_tokens(burn_variant))))
+    assert not keys & set(band_keys(minhash_signature(deck_tokens(tron))))
@@ -0,0 +1,67 @@
+from ..cooccurrences import CooccurrenceIndex
+
+
+decks = {
+    1: ['Tarmogoyf', 'Thoughtseize', 'Liliana of the Veil'],
+    2: ['Tarmogoyf', 'Thoughtseize', 'Scavenging Ooze'],
+    3: ['Lightning Bolt', 'Goblin Guide'],
+}
+
+
+def test_add_decks():
+    """Asserts that co-occurrences are counted per deck, and that known decks are skipped.
+    """
+
+    index = CooccurrenceIndex()
+    index.add_decks({1: decks[1], 2: decks[2]})
+    positions = index.add_decks({2: decks[2], 3: decks[3] + ['Lightning Bolt']})
+
+    goyf, bolt = index.positions['Tarmogoyf'], index.positions['Lightning Bolt']
+    assert sorted(index.names[p] for p in positions) == ['Goblin Guide', 'Lightning Bolt']
+    assert index.counts[goyf, goyf] == 2
+    assert index.counts[goyf, index.positions['Thoughtseize']] == 2
+    assert index.counts[goyf, index.positions['Liliana of the Veil']] == 1
+    assert index.counts[goyf, bolt] == 0
+    assert index.counts[bolt, bolt] == 1
+    assert index.deck_ids == {1, 2, 3}
+
+
+def test_top_cooccurrences():
+    """Asserts that co-occurring cards are sorted by Jaccard similarity.
+    """
+
+    index = CooccurrenceIndex()
+    index.add_decks(decks)
+
+    assert index.top_cooccurrences(index.positions['Tarmogoyf']) == [
+        ('Thoughtseize', 2, 1.), ('Liliana of the Veil', 1, 0.5), ('Scavenging Ooze', 1, 0.5)
+    ]
+    assert index.top_cooccurrences(index.positions['Tarmogoyf'], k=1) == [('Thoughtseize', 2, 1.)]
+
+
+def test_neighbours():
+    """Asserts that the card names played with the given ones are included, since their scores change too.
+    """
+
+    index = CooccurrenceIndex()
+    index.add_decks(decks)
+
+    positions = index.neighbours([index.positions['Scavenging Ooze']])
+    assert sorted(index.names[p] for p in positions) == ['Scavenging Ooze', 'Tarmogoyf', 'Thoughtseize']
+    assert index.neighbours([]) == []
+
+
+def test_save_load(tmpdir):
+    """Asserts that the index is saved and loaded without loss.
+    """
+
+    path = str(tmpdir.join('cooccurrences.npz'))
+    index = CooccurrenceIndex()
+    index.add_decks(decks)
+    index.save(path)
+
+    loaded = CooccurrenceIndex.load(path)
+
+    assert loaded.names == index.names
+    assert loaded.deck_ids == index.deck_ids
+    assert (loaded.counts != index.counts).nnz == 0
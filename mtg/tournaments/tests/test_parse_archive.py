@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+from django.utils import timezone
+
+from ..tasks import parse_archive_tournaments
+
+
+archive_page = """<table>
+<tr><td class="S14">Events</td></tr>
+<tr height="30" class="hover_tr">
+<td width="70%"><a href="event?e=15191&amp;f=MO">MTGO Competitive Modern Constructed League</a></td>
+<td width="15%" class="O16" align="center"><img src="graph/star.png"></td>
+<td align="right" width="15%" class="S10">06/04/17</td>
+</tr>
+<tr height="30" class="hover_tr">
+<td width="70%"><a href="event?e=15102&amp;f=MO">Grand Prix Brisbane</a></td>
+<td width="15%" class="O16" align="center"><img src="graph/bigstar.png"></td>
+<td align="right" width="15%" class="S10">26/03/17</td>
+</tr>
+<tr height="30" class="hover_tr">
+<td width="70%"><a href="event?e=15191&amp;f=MO">MTGO Competitive Modern Constructed League</a></td>
+<td width="15%" class="O16" align="center"><img src="graph/star.png"></td>
+<td align="right" width="15%" class="S10">06/04/17</td>
+</tr>
+<tr class="hover_tr"><td><a href="format?f=MO&amp;cp=2">Next</a></td></tr>
+</table>"""
+
+
+def test_parse_archive_tournaments():
+    """Asserts that tournaments of an archive page are parsed once, ignoring navigation rows.
+    """
+
+    parsed = list(parse_archive_tournaments(BeautifulSoup(archive_page, 'html.parser')))
+
+    assert [t['id'] for t in parsed] == ['15191', '15102']
+    assert parsed[1] == {
+        'id': '15102',
+        'name': 'Grand Prix Brisbane',
+        'url': 'http://mtgtop8.com/event?e=15102&f=MO',
+        'date': timezone.make_aware(datetime(year=2017, month=3, day=26))
+    }
@@ -0,0 +1,14 @@
+import pytest
+
+from ..models import Tournament
+
+
+def test_usage_weight():
+    """Asserts that usage weights decrease with the finishing position and increase with the tournament size.
+    """
+
+    assert Tournament.usage_weight(1, Tournament.REFERENCE_SIZE, 1.) == pytest.approx(1.)
+    assert Tournament.usage_weight(4, Tournament.REFERENCE_SIZE, 1.) == pytest.approx(0.5)
+    assert Tournament.usage_weight(4, Tournament.REFERENCE_SIZE, 0.5) == pytest.approx(0.25)
+    assert Tournament.usage_weight(1, 32, 1.) > Tournament.usage_weight(1, 8, 1.)
+    assert Tournament.usage_weight(0, 8, 1.) == Tournament.usage_weight(1, 8, 1.)
@@ -14,6 +14,7 @@ from . import views
 router = routers.DefaultRouter()
 router.register(r'^tournaments', views.TournamentViewSet)
 router.register(r'^decks', views.DeckViewSet)
+router.register(r'^metagame', views.MetagameViewSet)
 # router.register(r'^crawl', views.harvest_formats, base_name='crawl')
 
 app_name = 'tournaments'
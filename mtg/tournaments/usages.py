@@ -0,0 +1,72 @@
+"""
+@author: Thomas PERROT
+
+Contains the card usage aggregate for tournaments app.
+
+The copies of each card played in each format are aggregated by day into the CardUsage table, so that usages over a
+period (for features, relevance or crawl frequency) are read with an indexed query instead of walking decks.
+"""
+
+
+from typing import Iterable, Set
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from .models import CardUsage, DeckPosition, Format, Tournament
+
+
+def refresh_card_usages(from_date: date, to_date: date, format_id: str=None) -> int:
+    """Recomputes the card usages between the given dates (included), of the given format only if set.
+
+    Returns the number of stored card usages.
+    """
+
+    usages = Tournament.compute_card_usages(to_date, from_date, format_id)
+
+    with transaction.atomic():
+        stale_usages = CardUsage.objects.filter(date__gte=from_date, date__lte=to_date)
+        if format_id:
+            stale_usages = stale_usages.filter(format_id=format_id)
+        stale_usages.delete()
+
+        CardUsage.objects.bulk_create(
+            CardUsage(date=event_date, format_id=usage_format, card_name_id=card_name, copies=copies, weighted=weighted)
+            for (event_date, usage_format, card_name), (copies, weighted) in usages.items()
+        )
+
+    return len(usages)
+
+
+def refresh_tournament_card_usages(tournament_id: int) -> int:
+    """Recomputes the card usages of the day and format of the given tournament.
+    """
+
+    format_id, event_date = Tournament.objects.values_list('format_id', 'event_date').get(id=tournament_id)
+    return refresh_card_usages(event_date, event_date, format_id)
+
+
+def refresh_decks_card_usages(deck_ids: Iterable[int]) -> int:
+    """Recomputes the card usages of the days and formats of the tournaments the given decks were played in (e.g. once
+    their cards have been stored).
+    """
+
+    days = DeckPosition.objects.filter(
+        deck_id__in=list(deck_ids)
+    ).values_list(
+        'tournament__format_id', 'tournament__event_date'
+    ).distinct()
+    return sum(refresh_card_usages(event_date, event_date, format_id) for format_id, event_date in days)
+
+
+def get_relevant_card_names(tournament_format: Format, to_date: date) -> Set[str]:
+    """Returns the names of the cards which are relevant according to the rules of the given format (see Format).
+    """
+
+    played_cards = Tournament.get_played_cards(to_date, to_date - timedelta(days=tournament_format.relevance_days),
+                                                format_id=tournament_format.name)
+    total = sum(played_cards.values())
+    if not total:
+        return set()
+    return {card_name for card_name, copies in played_cards.items()
+            if copies / total >= tournament_format.relevance_min_usage}
@@ -5,12 +5,18 @@ Contains views for tournaments app
 """
 
 
-from django.http import HttpResponse
+from datetime import date, timedelta
+
+from django.http import Http404, HttpResponse
 from rest_framework import viewsets
+from rest_framework.decorators import list_route
+from rest_framework.response import Response
 
 from . import serializers
 from . import tasks
-from .models import Tournament, Deck
+from .models import Tournament, Deck, MetagameShare
+from .metagame import time_series
+from .summaries import get_deck_summary
 
 
 class TournamentViewSet(viewsets.ReadOnlyModelViewSet):
@@ -26,17 +32,46 @@ class TournamentViewSet(viewsets.ReadOnlyModelViewSet):
 
 class DeckViewSet(viewsets.ReadOnlyModelViewSet):
     """API endpoint that allows decks to be viewed.
-    Decks can either be viewed as list (without cards list), or detailed (with cards list)
+    Decks can either be viewed as list (without cards list), or detailed (with cards list, from their summary)
     """
 
     queryset = Deck.objects.all()
     search_fields = ('name', 'owner')
+    serializer_class = serializers.DeckListSerializer
+
+    def retrieve(self, request, *args, **kwargs) -> Response:
+        try:
+            return Response(get_deck_summary(int(kwargs['pk'])))
+        except (ValueError, Deck.DoesNotExist):
+            raise Http404
+
+
+class MetagameViewSet(viewsets.ReadOnlyModelViewSet):
+    """API endpoint that allows metagame shares to be viewed.
+    Shares can be filtered by `?format=modern`, `?archetype=12` and by dates with `?days=30` (defaults to 90 days).
+    """
+
+    queryset = MetagameShare.objects.order_by('-date', '-share')
+    serializer_class = serializers.MetagameShareSerializer
+
+    def get_queryset(self):
+        params = self.request.query_params
+        shares = super().get_queryset()
+
+        if params.get('format'):
+            shares = shares.filter(format_id=params['format'])
+        if params.get('archetype', '').isdigit():
+            shares = shares.filter(archetype_id=int(params['archetype']))
+
+        days = int(params['days']) if params.get('days', '').isdigit() else 90
+        return shares.filter(date__gte=date.today() - timedelta(days=days))
+
+    @list_route()
+    def time_series(self, request) -> Response:
+        """Returns the daily shares of each archetype, from the most to the least played.
+        """
 
-    def get_serializer_class(self):
-        if self.action == 'list':
-            return serializers.DeckListSerializer
-        if self.action == 'retrieve':
-            return serializers.DeckDetailSerializer
+        return Response(time_series(self.get_queryset()))
 
 
 def harvest_formats(request):